@@ -8,11 +8,23 @@ if _APP_DIR not in sys.path:
 
 import streamlit as st
 
-from backend.config import CSS_PATH, TRAINING_THRESHOLD
-from backend.annotation_service import save_cold_start, count_cold_start_submissions
+from backend.config import (
+    CSS_PATH, TRAINING_THRESHOLD, TRAINING_AUTO_FINETUNE, MODEL_WARMUP_ON_LAUNCH,
+)
+from backend.annotation_service import (
+    StaleAnnotationError, annotation_version, count_cold_start_submissions, save_cold_start,
+)
+from backend.model_warmup import start_warmup
+from backend.training_job import maybe_start_finetune
+from backend.tracing import span
+from frontend.admin import admin_enabled, profile_if_requested, render_admin_panel
+from frontend.components import current_annotator
 from frontend.sidebar import render_sidebar
 from frontend.mode_a import render_mode_a
-from frontend.mode_b import render_mode_b
+
+# ── Model warm-up (background thread; idempotent across reruns) ────────
+if MODEL_WARMUP_ON_LAUNCH:
+    start_warmup()
 
 # ── Page config ────────────────────────────────────────────────────────
 st.set_page_config(
@@ -25,23 +37,49 @@ st.set_page_config(
 # ── Process pending save (before sidebar so count is current) ─────────
 _pending = st.session_state.pop("_pending_save", None)
 if _pending:
-    save_cold_start(_pending["stem"], _pending["boxes"])
+    # Reject the save if the annotation changed since this session opened it
+    _annotator, _stem = current_annotator(), _pending["stem"]
+    _seen = st.session_state.get("_seen_version")
+    _expected = _seen[2] if _seen and _seen[:2] == (_annotator, _stem) else None
+    try:
+        save_cold_start(_stem, _pending["boxes"], _annotator, _expected)
+    except StaleAnnotationError:
+        st.session_state["_save_conflict"] = (
+            f"{_stem} was saved from another session while you were reviewing it — "
+            "your change was not saved. Go back to it to see the latest version."
+        )
+        st.session_state.pop("_seen_version", None)
+        _pending = None
+    else:
+        if _expected is not None:
+            st.session_state["_seen_version"] = (_annotator, _stem, annotation_version(_stem, _annotator))
+if _pending:
     st.session_state["_counts_version"] = st.session_state.get("_counts_version", 0) + 1
     count = count_cold_start_submissions()
     st.toast(f"{_pending['toast']} — {count}/{TRAINING_THRESHOLD}")
     st.session_state["_just_saved"] = _pending["toast"]
     if _pending.get("check_threshold") and count >= TRAINING_THRESHOLD:
         st.session_state["_show_threshold"] = True
+    if TRAINING_AUTO_FINETUNE:
+        maybe_start_finetune(count)
 
 # ── Load CSS ───────────────────────────────────────────────────────────
 if CSS_PATH.exists():
     st.markdown(f"<style>{CSS_PATH.read_text()}</style>", unsafe_allow_html=True)
 
-# ── Sidebar ────────────────────────────────────────────────────────────
-mode = render_sidebar()
+with profile_if_requested():
+    # ── Sidebar ────────────────────────────────────────────────────────
+    with span("rerun.sidebar"):
+        mode = render_sidebar()
+    if admin_enabled():
+        render_admin_panel()
 
-# ── Main content ───────────────────────────────────────────────────────
-if mode == "Manual":
-    render_mode_a()
-else:
-    render_mode_b()
+    # ── Main content ───────────────────────────────────────────────────
+    if mode == "Manual":
+        with span("rerun.manual"):
+            render_mode_a()
+    else:
+        # Imported lazily so Manual-only sessions never load the éo-Assisted UI
+        from frontend.mode_b import render_mode_b
+        with span("rerun.assisted"):
+            render_mode_b()
@@ -0,0 +1,436 @@
+"""SQLite index over the cold-start annotation files.
+
+The YOLO .txt files stay the source of truth and the exportable view. Each
+annotator has a namespace: DEFAULT_ANNOTATOR's files live directly in
+COLD_START_DIR (the single-user layout), and every other annotator's live in
+ANNOTATORS_DIR/<name>/. This index mirrors per-(annotator, stem) status (box
+counts, CSP flag) so counts and lookups never walk the directories.
+
+When several annotators reviewed a stem, the most recent save is the
+stem's effective annotation: it decides the stem's CSP status in counts,
+queues and the dataset export.
+
+An in-memory copy of the table answers reads in O(1). It is reloaded when
+another process commits, and a namespace is reconciled against its
+directory when that directory's mtime changes.
+
+The index also holds per-(annotator, stem) save versions for optimistic
+concurrency (see next_version()). Unlike the rest of the index, these are
+not rebuilt from the files.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+
+from backend.config import ANNOTATION_INDEX_PATH, ANNOTATORS_DIR, COLD_START_DIR, DEFAULT_ANNOTATOR
+from backend.tracing import traced
+
+_SCHEMA_VERSION = 2
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS annotations (
+    annotator  TEXT NOT NULL,
+    stem       TEXT NOT NULL,
+    n_boxes    INTEGER NOT NULL,
+    n_csp      INTEGER NOT NULL,
+    n_thalamus INTEGER NOT NULL,
+    mtime_ns   INTEGER NOT NULL,
+    PRIMARY KEY (annotator, stem)
+);
+CREATE TABLE IF NOT EXISTS versions (
+    annotator TEXT NOT NULL,
+    stem      TEXT NOT NULL,
+    version   INTEGER NOT NULL,
+    PRIMARY KEY (annotator, stem)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class StaleAnnotationError(Exception):
+    """A save was based on an older version of the annotation than the current one."""
+
+
+_lock = threading.RLock()
+_conn: sqlite3.Connection | None = None
+_data_version: int | None = None
+# namespace → directory mtime the entries were reconciled against
+_dir_mtimes: dict[str, int] = {}
+# stem → {annotator: (n_boxes, n_csp, n_thalamus, mtime_ns)}
+_entries: dict[str, dict[str, tuple[int, int, int, int]]] = {}
+# annotator → number of stems in the namespace (and how many have boxes)
+_ns_totals: dict[str, list[int]] = {}
+_csp_found = 0
+# Bumped whenever annotations disappear (see removals())
+_removals = 0
+# Bumped on every change to _entries (see snapshot())
+_generation = 0
+
+
+def namespace_dir(annotator: str) -> Path:
+    """Directory holding an annotator's label files."""
+    return COLD_START_DIR if annotator == DEFAULT_ANNOTATOR else ANNOTATORS_DIR / annotator
+
+
+def label_path(stem: str, annotator: str = DEFAULT_ANNOTATOR) -> Path:
+    """Path of an annotator's label file for stem (it may not exist)."""
+    return namespace_dir(annotator) / f"{stem}.txt"
+
+
+def _summarize(boxes: list[dict]) -> tuple[int, int, int]:
+    """Return (n_boxes, n_csp, n_thalamus) for a list of box dicts."""
+    n_csp = sum(1 for b in boxes if b["class_id"] == 0)
+    n_thalamus = sum(1 for b in boxes if b["class_id"] == 1)
+    return len(boxes), n_csp, n_thalamus
+
+
+def _effective(annotations: dict[str, tuple]) -> tuple[str, tuple] | None:
+    """(annotator, entry) of the most recent save among a stem's annotations."""
+    if not annotations:
+        return None
+    return max(annotations.items(), key=lambda item: item[1][3])
+
+
+def _current_dir_mtimes() -> dict[str, int]:
+    """mtime of every namespace directory (the default one is COLD_START_DIR)."""
+    mtimes = {DEFAULT_ANNOTATOR: COLD_START_DIR.stat().st_mtime_ns}
+    if ANNOTATORS_DIR.is_dir():
+        with os.scandir(ANNOTATORS_DIR) as it:
+            for e in it:
+                if e.is_dir() and e.name != DEFAULT_ANNOTATOR:
+                    mtimes[e.name] = e.stat().st_mtime_ns
+    return mtimes
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        ANNOTATION_INDEX_PATH, check_same_thread=False, isolation_level=None, timeout=30,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+        # Pre-namespace index: it is rebuildable, so start over
+        conn.executescript("DROP TABLE IF EXISTS annotations; DROP TABLE IF EXISTS meta;")
+        conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _set_entry(stem: str, annotator: str, entry: tuple[int, int, int, int] | None) -> None:
+    """Update the in-memory mirror and running totals for one (annotator, stem)."""
+    global _csp_found, _removals, _generation
+    _generation += 1
+    annotations = _entries.get(stem, {})
+    before = _effective(annotations)
+    old = annotations.pop(annotator, None)
+    ns = _ns_totals.setdefault(annotator, [0, 0])
+    if old is not None:
+        ns[0] -= 1
+        ns[1] -= old[0] > 0
+        if entry is None:
+            _removals += 1
+    if entry is not None:
+        annotations[annotator] = entry
+        ns[0] += 1
+        ns[1] += entry[0] > 0
+    if annotations:
+        _entries[stem] = annotations
+    else:
+        _entries.pop(stem, None)
+    after = _effective(annotations)
+    _csp_found += (after is not None and after[1][0] > 0) - (before is not None and before[1][0] > 0)
+
+
+def _load_rows() -> None:
+    global _data_version, _csp_found, _removals
+    before = {(stem, a) for stem, annotations in _entries.items() for a in annotations}
+    _entries.clear()
+    _ns_totals.clear()
+    _csp_found = 0
+    rows = _conn.execute(
+        "SELECT annotator, stem, n_boxes, n_csp, n_thalamus, mtime_ns FROM annotations"
+    )
+    for annotator, stem, *entry in rows:
+        _set_entry(stem, annotator, tuple(entry))
+    if any(stem not in _entries or a not in _entries[stem] for stem, a in before):
+        _removals += 1
+    _data_version = _conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _stored_dir_mtimes() -> dict[str, int]:
+    row = _conn.execute("SELECT value FROM meta WHERE key = 'dir_mtimes'").fetchone()
+    return json.loads(row[0]) if row else {}
+
+
+def _store_dir_mtimes(mtimes: dict[str, int]) -> None:
+    global _dir_mtimes
+    _conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES ('dir_mtimes', ?)",
+        (json.dumps(mtimes),),
+    )
+    _dir_mtimes = dict(mtimes)
+
+
+@traced("annotations.reconcile")
+def _reconcile(current: dict[str, int]) -> None:
+    """Bring changed namespaces in line with their directories, re-reading only changed files."""
+    from backend.annotation_service import parse_yolo_labels
+
+    changed = [ns for ns in set(current) | set(_dir_mtimes) if current.get(ns) != _dir_mtimes.get(ns)]
+    _conn.execute("BEGIN")
+    try:
+        for annotator in changed:
+            on_disk = {}
+            if annotator in current:
+                with os.scandir(namespace_dir(annotator)) as it:
+                    for e in it:
+                        if e.name.endswith(".txt") and e.is_file():
+                            on_disk[e.name[:-4]] = e.stat().st_mtime_ns
+            indexed = [stem for stem, annotations in _entries.items() if annotator in annotations]
+            for stem in indexed:
+                if stem not in on_disk:
+                    _conn.execute(
+                        "DELETE FROM annotations WHERE annotator = ? AND stem = ?", (annotator, stem),
+                    )
+                    _set_entry(stem, annotator, None)
+            for stem, mtime_ns in on_disk.items():
+                known = _entries.get(stem, {}).get(annotator)
+                if known is not None and known[3] == mtime_ns:
+                    continue
+                boxes = parse_yolo_labels(label_path(stem, annotator))
+                entry = (*_summarize(boxes), mtime_ns)
+                _conn.execute(
+                    "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)",
+                    (annotator, stem, *entry),
+                )
+                _set_entry(stem, annotator, entry)
+        _store_dir_mtimes(current)
+        _conn.execute("COMMIT")
+    except Exception:
+        _conn.execute("ROLLBACK")
+        raise
+
+
+def _ensure() -> None:
+    """Open the index on first use and refresh it if anything changed underneath."""
+    global _conn, _dir_mtimes
+    if _conn is None:
+        _conn = _connect()
+        _load_rows()
+        _dir_mtimes = _stored_dir_mtimes()
+    else:
+        version = _conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != _data_version:
+            _load_rows()
+            _dir_mtimes = _stored_dir_mtimes()
+    current = _current_dir_mtimes()
+    if current != _dir_mtimes:
+        _reconcile(current)
+
+
+def record(stem: str, boxes: list[dict], mtime_ns: int, annotator: str = DEFAULT_ANNOTATOR) -> None:
+    """Record a freshly written annotation file in the index."""
+    with _lock:
+        _ensure()
+        entry = (*_summarize(boxes), mtime_ns)
+        _conn.execute("BEGIN")
+        _conn.execute(
+            "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)",
+            (annotator, stem, *entry),
+        )
+        # Our own write may have added a directory entry — don't treat
+        # that as an external change on the next lookup.
+        mtimes = dict(_dir_mtimes)
+        mtimes[annotator] = namespace_dir(annotator).stat().st_mtime_ns
+        if annotator != DEFAULT_ANNOTATOR and ANNOTATORS_DIR.is_dir():
+            mtimes[DEFAULT_ANNOTATOR] = COLD_START_DIR.stat().st_mtime_ns
+        _store_dir_mtimes(mtimes)
+        _conn.execute("COMMIT")
+        _set_entry(stem, annotator, entry)
+
+
+def clear(annotator: str | None = None) -> None:
+    """Drop every entry, or one annotator's (used after their files are deleted)."""
+    global _removals, _generation
+    with _lock:
+        _ensure()
+        _conn.execute("BEGIN")
+        if annotator is None:
+            _conn.execute("DELETE FROM annotations")
+        else:
+            _conn.execute("DELETE FROM annotations WHERE annotator = ?", (annotator,))
+        _store_dir_mtimes(_current_dir_mtimes())
+        _conn.execute("COMMIT")
+        for stem in list(_entries):
+            for a in list(_entries.get(stem, {})):
+                if annotator is None or a == annotator:
+                    _set_entry(stem, a, None)
+        _removals += 1
+        _generation += 1
+
+
+def rebuild() -> None:
+    """Discard the index and rescan every namespace directory."""
+    global _csp_found, _removals, _generation, _dir_mtimes
+    with _lock:
+        _ensure()
+        _conn.execute("DELETE FROM annotations")
+        _entries.clear()
+        _ns_totals.clear()
+        _csp_found = 0
+        _removals += 1
+        _generation += 1
+        _dir_mtimes = {}
+        _reconcile(_current_dir_mtimes())
+
+
+def contains(stem: str, annotator: str | None = None) -> bool:
+    """Return True if stem is annotated by annotator (by anyone if None)."""
+    with _lock:
+        _ensure()
+        annotations = _entries.get(stem)
+        if annotations is None:
+            return False
+        return annotator is None or annotator in annotations
+
+
+def annotators(stem: str) -> list[str]:
+    """Annotators who have saved stem, most recent first."""
+    with _lock:
+        _ensure()
+        annotations = _entries.get(stem, {})
+        return sorted(annotations, key=lambda a: -annotations[a][3])
+
+
+def get_entry(stem: str, annotator: str | None = None) -> dict | None:
+    """Return the indexed status for stem, or None if not annotated.
+
+    With annotator=None this is the effective (most recent) annotation.
+    """
+    with _lock:
+        _ensure()
+        annotations = _entries.get(stem, {})
+        if annotator is None:
+            found = _effective(annotations)
+        else:
+            found = (annotator, annotations[annotator]) if annotator in annotations else None
+    if found is None:
+        return None
+    owner, (n_boxes, n_csp, n_thalamus, mtime_ns) = found
+    return {
+        "annotator": owner,
+        "n_boxes": n_boxes,
+        "n_csp": n_csp,
+        "n_thalamus": n_thalamus,
+        "csp_found": n_boxes > 0,
+        "mtime_ns": mtime_ns,
+    }
+
+
+def effective() -> dict[str, tuple[str, int]]:
+    """stem → (annotator, mtime_ns) of its effective annotation, for every annotated stem."""
+    with _lock:
+        _ensure()
+        result = {}
+        for stem, annotations in _entries.items():
+            annotator, entry = _effective(annotations)
+            result[stem] = (annotator, entry[3])
+        return result
+
+
+def first_missing(stems: Sequence[str], start: int = 0) -> int:
+    """Return the first index >= start whose stem nobody has annotated (len(stems) if none)."""
+    with _lock:
+        _ensure()
+        i = start
+        while i < len(stems) and stems[i] in _entries:
+            i += 1
+        return i
+
+
+def generation() -> int:
+    """Counter bumped on every change to the index."""
+    with _lock:
+        _ensure()
+        return _generation
+
+
+def snapshot() -> tuple[int, dict[str, tuple[bool, frozenset[str]]]]:
+    """Return (generation, stem → (csp_found, annotators)) for every annotated stem.
+
+    csp_found is that of the effective annotation. The generation (see
+    generation()) changes whenever any entry does, so callers can cache
+    whatever they derive from the mapping.
+    """
+    with _lock:
+        _ensure()
+        return _generation, {
+            stem: (_effective(annotations)[1][0] > 0, frozenset(annotations))
+            for stem, annotations in _entries.items()
+        }
+
+
+def removals() -> int:
+    """Counter bumped whenever annotations disappear (reset, deleted files).
+
+    While it is unchanged the annotated set has only grown, so callers that
+    cache "first unannotated" positions only ever need to move them forward.
+    """
+    with _lock:
+        _ensure()
+        return _removals
+
+
+def counts(annotator: str | None = None) -> tuple[int, int, int]:
+    """Return (total, csp_found, no_csp) over effective annotations, or one annotator's."""
+    with _lock:
+        _ensure()
+        if annotator is None:
+            total, found = len(_entries), _csp_found
+        else:
+            total, found = _ns_totals.get(annotator, (0, 0))
+        return total, found, total - found
+
+
+def version(stem: str, annotator: str = DEFAULT_ANNOTATOR) -> int:
+    """Current save version of an annotator's annotation for stem (0 = never saved)."""
+    with _lock:
+        _ensure()
+        row = _conn.execute(
+            "SELECT version FROM versions WHERE annotator = ? AND stem = ?", (annotator, stem),
+        ).fetchone()
+        return row[0] if row else 0
+
+
+def next_version(stem: str, annotator: str = DEFAULT_ANNOTATOR, expected: int | None = None) -> int:
+    """Atomically bump the save version, across processes; returns the new version.
+
+    Raises StaleAnnotationError if expected is given and another session
+    saved the annotation since that version was read.
+    """
+    with _lock:
+        _ensure()
+        _conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = _conn.execute(
+                "SELECT version FROM versions WHERE annotator = ? AND stem = ?", (annotator, stem),
+            ).fetchone()
+            current = row[0] if row else 0
+            if expected is not None and expected != current:
+                raise StaleAnnotationError(
+                    f"{stem} was saved elsewhere (version {current}, this edit started from {expected})"
+                )
+            _conn.execute(
+                "INSERT OR REPLACE INTO versions VALUES (?, ?, ?)", (annotator, stem, current + 1),
+            )
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
+        return current + 1
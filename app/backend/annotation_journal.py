@@ -0,0 +1,220 @@
+"""Write-behind persistence for cold-start annotations.
+
+save_cold_start() hands its boxes to append() and returns, so a save on
+the request path costs a dict insert. A writer thread then runs each batch
+of saves through three steps:
+
+1. It appends the batch to this process's journal and fsyncs once
+   (group commit).
+2. It materializes each label file atomically (temp file + fsync + rename)
+   and records it in annotation_index.
+3. It truncates the journal, since everything in it is now on disk.
+
+Saves are keyed by (annotator, stem). Saves of the same key that arrive
+before the writer runs are coalesced, and only the latest boxes are written.
+Until a save is materialized, pending() returns it, so reads in
+annotation_service see it straight away.
+
+Each process start has its own journal, JOURNAL_DIR/<pid>-<token>.jsonl,
+and holds an exclusive flock on it while running. A journal nobody holds
+was left behind by a process that died between steps 1 and 3 (a restarted
+container often reuses the PID, hence the token). It is replayed the next
+time a process starts using the journal; the replayer keeps the lock until
+the file is unlinked, so each orphan is replayed once. Saves from the last
+JOURNAL_FLUSH_INTERVAL before a crash can be lost, but a label file is
+never left half-written.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections.abc import Iterable
+from contextlib import contextmanager
+
+from backend.config import DEFAULT_ANNOTATOR, JOURNAL_DIR, JOURNAL_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_cond = threading.Condition()
+_write_lock = threading.Lock()   # held while a batch is journaled/materialized
+# (annotator, stem) → boxes, saved but not yet materialized
+_pending: dict[tuple[str, str], list[dict]] = {}
+# keys saved since the last batch (ordered set)
+_dirty: dict[tuple[str, str], None] = {}
+_thread: threading.Thread | None = None
+_journal = None
+_journal_path = None
+
+
+def _materialize(key: tuple[str, str], boxes: list[dict]) -> None:
+    from backend.annotation_service import materialize
+
+    annotator, stem = key
+    materialize(stem, boxes, annotator)
+
+
+def _replay_orphans() -> None:
+    """Materialize journals left by processes that are no longer running."""
+    for path in JOURNAL_DIR.glob("*.jsonl"):
+        if path == _journal_path:
+            continue
+        try:
+            f = open(path)
+        except FileNotFoundError:
+            continue    # replayed by another process meanwhile
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue    # its process is running (or another one is replaying it)
+            if os.fstat(f.fileno()).st_nlink == 0:
+                continue    # replayed and unlinked before we got the lock
+            latest = {}
+            for line in f.read().splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break    # torn final line: that batch was never acknowledged
+                key = (entry.get("annotator", DEFAULT_ANNOTATOR), entry["stem"])
+                latest[key] = entry["boxes"]
+            for key, boxes in latest.items():
+                _materialize(key, boxes)
+            path.unlink(missing_ok=True)
+        if latest:
+            logger.info("Replayed %d journaled annotations from %s", len(latest), path.name)
+
+
+def _open_journal():
+    """Create this process's journal, locked before replayers can see it."""
+    global _journal_path
+    JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+    path = JOURNAL_DIR / f"{os.getpid()}-{uuid.uuid4().hex[:12]}.jsonl"
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    journal = open(tmp_path, "a")
+    fcntl.flock(journal, fcntl.LOCK_EX)
+    os.replace(tmp_path, path)
+    _journal_path = path
+    return journal
+
+
+def _flush_batch() -> bool:
+    """Journal and materialize everything saved so far; False if there was nothing."""
+    global _journal
+    with _write_lock:
+        with _cond:
+            batch = {key: _pending[key] for key in _dirty}
+            _dirty.clear()
+        if not batch:
+            return False
+        if _journal is None:
+            _journal = _open_journal()
+        now = round(time.time(), 3)
+        _journal.write("".join(
+            json.dumps({"ts": now, "annotator": annotator, "stem": stem, "boxes": boxes}) + "\n"
+            for (annotator, stem), boxes in batch.items()
+        ))
+        _journal.flush()
+        os.fsync(_journal.fileno())
+
+        for key, boxes in batch.items():
+            _materialize(key, boxes)
+
+        with _cond:
+            for key, boxes in batch.items():
+                # A newer save of the key stays pending (and dirty)
+                if _pending.get(key) is boxes:
+                    del _pending[key]
+            _cond.notify_all()
+        _journal.truncate(0)
+        _journal.seek(0)
+        return True
+
+
+def _run() -> None:
+    while True:
+        with _cond:
+            _cond.wait_for(lambda: _dirty)
+        # Let a burst of saves share one fsync
+        time.sleep(JOURNAL_FLUSH_INTERVAL)
+        try:
+            _flush_batch()
+        except Exception as exc:
+            # Keep the saves pending and retry; reads keep serving them meanwhile.
+            logger.warning("annotation writer failed, retrying: %s", exc)
+            with _cond:
+                _dirty.update(dict.fromkeys(_pending))
+            time.sleep(1.0)
+
+
+def _ensure_started() -> None:
+    global _thread
+    with _cond:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_run, name="annotation-writer", daemon=True)
+    with _write_lock:
+        try:
+            _replay_orphans()
+        except Exception as exc:
+            logger.warning("could not replay annotation journals: %s", exc)
+    _thread.start()
+    atexit.register(flush)
+
+
+def append(stem: str, boxes: list[dict], annotator: str = DEFAULT_ANNOTATOR) -> None:
+    """Queue boxes as the annotator's new annotation for stem (replacing any unwritten save)."""
+    _ensure_started()
+    boxes = [dict(b) for b in boxes]
+    key = (annotator, stem)
+    with _cond:
+        _pending[key] = boxes
+        _dirty.pop(key, None)
+        _dirty[key] = None
+        _cond.notify_all()
+
+
+def pending(stem: str, annotator: str = DEFAULT_ANNOTATOR) -> list[dict] | None:
+    """The annotator's saved-but-unwritten boxes for stem, or None if nothing is pending."""
+    _ensure_started()
+    with _cond:
+        boxes = _pending.get((annotator, stem))
+    return None if boxes is None else [dict(b) for b in boxes]
+
+
+def pending_items() -> list[tuple[str, str, list[dict]]]:
+    """Every saved-but-unwritten (annotator, stem, boxes)."""
+    _ensure_started()
+    with _cond:
+        return [(annotator, stem, boxes) for (annotator, stem), boxes in _pending.items()]
+
+
+def flush() -> None:
+    """Write every pending save now (blocks until they are on disk)."""
+    while _flush_batch():
+        pass
+
+
+@contextmanager
+def exclusive(discard_pending: bool = False, annotator: str | None = None,
+              stems: Iterable[str] | None = None):
+    """Hold the writer off for the block, optionally dropping unwritten saves.
+
+    With annotator and/or stems given, only the unwritten saves of that
+    annotator and/or those stems are dropped.
+    """
+    stems = None if stems is None else set(stems)
+    with _write_lock:
+        if discard_pending:
+            with _cond:
+                for key in [k for k in _pending
+                            if (annotator is None or k[0] == annotator)
+                            and (stems is None or k[1] in stems)]:
+                    del _pending[key]
+                    _dirty.pop(key, None)
+                _cond.notify_all()
+        yield
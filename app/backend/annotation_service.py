@@ -1,5 +1,10 @@
+import os
+import threading
 from pathlib import Path
-from backend.config import COLD_START_DIR
+from backend import annotation_index, annotation_journal, work_leases
+from backend.annotation_index import StaleAnnotationError
+from backend.config import DEFAULT_ANNOTATOR
+from backend.tracing import traced
 
 
 def parse_yolo_labels(label_path: Path) -> list[dict]:
@@ -30,46 +35,130 @@ def parse_yolo_labels(label_path: Path) -> list[dict]:
     return boxes
 
 
-def write_yolo_labels(label_path: Path, boxes: list[dict]) -> None:
-    """Write a list of box dicts to a YOLO annotation file."""
+def write_yolo_labels(label_path: Path, boxes: list[dict], fsync: bool = False) -> None:
+    """Write a list of box dicts to a YOLO annotation file.
+
+    The file is written via temp + rename, so readers never see half of it.
+    """
     lines = []
     for b in boxes:
         lines.append(f"{b['class_id']} {b['cx']:.6f} {b['cy']:.6f} {b['w']:.6f} {b['h']:.6f}")
-    label_path.write_text("\n".join(lines) + "\n" if lines else "")
+    tmp_path = label_path.with_name(f".{label_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n" if lines else "")
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, label_path)
+
+
+@traced("annotations.save")
+def save_cold_start(
+    image_stem: str,
+    boxes: list[dict],
+    annotator: str = DEFAULT_ANNOTATOR,
+    expected_version: int | None = None,
+) -> Path:
+    """Save cold-start annotations for a given image. Returns the label path.
+
+    The save goes into the annotator's namespace. If expected_version is
+    given (the annotation_version() the edit started from) and someone
+    has saved this annotator's annotation since, StaleAnnotationError is
+    raised and nothing is written.
+
+    The save is write-behind (see backend.annotation_journal): it is visible
+    to every read here immediately, and the file lands shortly after.
+    """
+    annotation_index.next_version(image_stem, annotator, expected_version)
+    annotation_journal.append(image_stem, boxes, annotator)
+    return annotation_index.label_path(image_stem, annotator)
 
 
-def save_cold_start(image_stem: str, boxes: list[dict]) -> Path:
-    """Save cold-start annotations for a given image. Returns the saved path."""
-    out_path = COLD_START_DIR / f"{image_stem}.txt"
-    write_yolo_labels(out_path, boxes)
+def materialize(image_stem: str, boxes: list[dict], annotator: str = DEFAULT_ANNOTATOR) -> Path:
+    """Durably write the label file and index it (called by the journal writer)."""
+    out_path = annotation_index.label_path(image_stem, annotator)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    write_yolo_labels(out_path, boxes, fsync=True)
+    annotation_index.record(image_stem, boxes, out_path.stat().st_mtime_ns, annotator)
     return out_path
 
 
-def count_cold_start_submissions() -> int:
-    """Count how many cold-start annotation files exist."""
-    return len(list(COLD_START_DIR.glob("*.txt")))
+def annotation_version(image_stem: str, annotator: str = DEFAULT_ANNOTATOR) -> int:
+    """Version of the annotator's annotation for an image.
 
+    Pass it back as save_cold_start(expected_version=...) to detect a
+    concurrent edit.
+    """
+    return annotation_index.version(image_stem, annotator)
 
-def count_csp_breakdown() -> tuple[int, int]:
-    """Count annotations with CSP found vs no CSP.
 
-    Returns (csp_found, no_csp) based on whether .txt files have content.
+def reset_cold_start(annotator: str = DEFAULT_ANNOTATOR) -> None:
+    """Delete the annotator's annotation files (and unwritten saves) and release their leases.
+
+    Other annotators' namespaces are left alone.
+    """
+    with annotation_journal.exclusive(discard_pending=True, annotator=annotator):
+        ns_dir = annotation_index.namespace_dir(annotator)
+        if ns_dir.is_dir():
+            for f in ns_dir.glob("*.txt"):
+                f.unlink()
+        annotation_index.clear(annotator)
+    work_leases.release_all(annotator)
+
+
+def _counts(annotator: str | None = None) -> tuple[int, int, int]:
+    """(total, csp_found, no_csp) from the index, adjusted for unwritten saves.
+
+    Counts are over effective annotations (the team's progress), or over
+    one annotator's namespace.
     """
-    csp_found = 0
-    no_csp = 0
-    for f in COLD_START_DIR.glob("*.txt"):
-        if f.read_text().strip():
+    total, csp_found, no_csp = annotation_index.counts(annotator)
+    latest = {}
+    for owner, stem, boxes in annotation_journal.pending_items():
+        if annotator is None or owner == annotator:
+            latest[stem] = boxes
+    for stem, boxes in latest.items():
+        entry = annotation_index.get_entry(stem, annotator)
+        if entry is None:
+            total += 1
+        elif entry["csp_found"]:
+            csp_found -= 1
+        else:
+            no_csp -= 1
+        if boxes:
             csp_found += 1
         else:
             no_csp += 1
+    return total, csp_found, no_csp
+
+
+def count_cold_start_submissions(annotator: str | None = None) -> int:
+    """Count how many images have a cold-start annotation (by anyone, or by annotator)."""
+    return _counts(annotator)[0]
+
+
+def count_csp_breakdown(annotator: str | None = None) -> tuple[int, int]:
+    """Count annotations with CSP found vs no CSP.
+
+    Returns (csp_found, no_csp) based on whether the annotation has any boxes.
+    """
+    _, csp_found, no_csp = _counts(annotator)
     return csp_found, no_csp
 
 
-def is_annotated(image_stem: str) -> bool:
-    """Check whether a cold-start annotation exists for a given image."""
-    return (COLD_START_DIR / f"{image_stem}.txt").exists()
+def is_annotated(image_stem: str, annotator: str = DEFAULT_ANNOTATOR) -> bool:
+    """Check whether the annotator has a cold-start annotation for a given image."""
+    return (
+        annotation_journal.pending(image_stem, annotator) is not None
+        or annotation_index.contains(image_stem, annotator)
+    )
 
 
-def load_annotation(image_stem: str) -> list[dict]:
-    """Load a previously saved cold-start annotation for an image."""
-    return parse_yolo_labels(COLD_START_DIR / f"{image_stem}.txt")
+def load_annotation(image_stem: str, annotator: str = DEFAULT_ANNOTATOR) -> list[dict]:
+    """Load the annotator's previously saved cold-start annotation for an image."""
+    boxes = annotation_journal.pending(image_stem, annotator)
+    if boxes is not None:
+        return boxes
+    if not annotation_index.contains(image_stem, annotator):
+        return []
+    return parse_yolo_labels(annotation_index.label_path(image_stem, annotator))
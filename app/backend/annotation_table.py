@@ -0,0 +1,285 @@
+"""Columnar (NumPy structured array) view of annotations for corpus-wide work.
+
+A table is a pair (stems, rows). stems is a sorted array of unique stems.
+rows has one record per box, with the columns of DTYPE: a stem code (an
+index into stems), class_id, cx, cy, w, h and confidence (NaN for reviewed
+boxes, which carry no score). Each stem is stored once, so a row is 26
+bytes whatever the stem's length. Rows are kept sorted by stem code, so a
+stem's boxes are one contiguous slice (see by_stem()).
+
+load_all() returns every effective annotation (see annotation_index) as
+one table. It is backed by a snapshot at ANNOTATION_TABLE_PATH: only label
+files that changed since the snapshot are re-read, so statistics, exports
+and dataset builds cost one np.load instead of a file open per stem.
+
+Its stems are every reviewed stem, including reviewed images with no boxes
+(no CSP), which have no rows. The YOLO .txt files remain the source of
+truth: from_yolo(), to_yolo_lines(), read_yolo_dir() and write_yolo_dir()
+convert both ways.
+"""
+
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import numpy as np
+
+from backend import annotation_index, annotation_journal
+from backend.annotation_service import write_yolo_labels
+from backend.config import ANNOTATION_TABLE_PATH, DEFAULT_ANNOTATOR
+from backend.tracing import traced
+
+DTYPE = np.dtype([
+    ("stem", np.int32),
+    ("class_id", np.int16),
+    ("cx", np.float32),
+    ("cy", np.float32),
+    ("w", np.float32),
+    ("h", np.float32),
+    ("confidence", np.float32),
+])
+COORDS = ["cx", "cy", "w", "h"]
+
+# (stems, rows)
+Table = tuple[np.ndarray, np.ndarray]
+
+_lock = threading.Lock()
+# (index generation, table) of the last load_all()
+_cached: tuple[int, Table] | None = None
+
+
+def _stem_array(stems: Iterable[str]) -> np.ndarray:
+    # Sized to the longest stem, so there is no length limit
+    return np.array(list(stems), dtype=str).reshape(-1)
+
+
+def empty() -> Table:
+    """A table with no stems and no rows."""
+    return _stem_array([]), np.empty(0, dtype=DTYPE)
+
+
+def from_boxes(stem: str, boxes: list[dict]) -> Table:
+    """Table for a list of box dicts (annotation_service / inference_service format)."""
+    rows = np.empty(len(boxes), dtype=DTYPE)
+    rows["stem"] = 0
+    rows["class_id"] = [b["class_id"] for b in boxes]
+    for col in COORDS:
+        rows[col] = [b[col] for b in boxes]
+    rows["confidence"] = [b.get("confidence", np.nan) for b in boxes]
+    return _stem_array([stem]), rows
+
+
+def to_boxes(rows: np.ndarray) -> list[dict]:
+    """Box dicts {class_id, cx, cy, w, h[, confidence]} for rows (confidence only if scored)."""
+    boxes = []
+    for class_id, cx, cy, w, h, conf in zip(
+        rows["class_id"].tolist(), rows["cx"].tolist(), rows["cy"].tolist(),
+        rows["w"].tolist(), rows["h"].tolist(), rows["confidence"].tolist(),
+    ):
+        box = {"class_id": class_id, "cx": cx, "cy": cy, "w": w, "h": h}
+        if conf == conf:    # not NaN
+            box["confidence"] = conf
+        boxes.append(box)
+    return boxes
+
+
+def from_yolo(stem: str, text: str) -> Table:
+    """Table for the contents of a YOLO label file (malformed lines are skipped)."""
+    fields = [parts for parts in (line.split() for line in text.splitlines()) if len(parts) == 5]
+    try:
+        values = np.array(fields, dtype=np.float64).reshape(-1, 5)
+    except ValueError:
+        # A non-numeric field somewhere: fall back to line-by-line filtering
+        values = []
+        for parts in fields:
+            try:
+                values.append([float(v) for v in parts])
+            except ValueError:
+                continue
+        values = np.array(values, dtype=np.float64).reshape(-1, 5)
+    rows = np.empty(len(values), dtype=DTYPE)
+    rows["stem"] = 0
+    rows["class_id"] = values[:, 0]
+    for i, col in enumerate(COORDS, start=1):
+        rows[col] = values[:, i]
+    rows["confidence"] = np.nan
+    return _stem_array([stem]), rows
+
+
+def to_yolo_lines(rows: np.ndarray) -> list[str]:
+    """YOLO label lines for rows, formatted like annotation_service.write_yolo_labels()."""
+    return [
+        f"{c} {x:.6f} {y:.6f} {w:.6f} {h:.6f}"
+        for c, x, y, w, h in zip(
+            rows["class_id"].tolist(), rows["cx"].tolist(), rows["cy"].tolist(),
+            rows["w"].tolist(), rows["h"].tolist(),
+        )
+    ]
+
+
+def by_stem(table: Table) -> Iterator[tuple[str, np.ndarray]]:
+    """Yield (stem, rows of that stem) for each stem that has rows."""
+    stems, rows = table
+    if not len(rows):
+        return
+    codes = rows["stem"]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        yield str(stems[codes[start]]), rows[start:end]
+
+
+def concat(tables: Iterable[Table]) -> Table:
+    """Merge tables into one, sorted by stem (stable, so box order is kept)."""
+    tables = list(tables) or [empty()]
+    stems, codes = np.unique(np.concatenate([t[0] for t in tables]), return_inverse=True)
+    parts, offset = [], 0
+    for table_stems, table_rows in tables:
+        part = table_rows.copy()
+        part["stem"] = codes[offset:offset + len(table_stems)][table_rows["stem"]]
+        parts.append(part)
+        offset += len(table_stems)
+    rows = np.concatenate(parts)
+    return stems, rows[np.argsort(rows["stem"], kind="stable")]
+
+
+def _select(table: Table, stems: Iterable[str]) -> Table:
+    """The part of table for the given stems (stems missing from table are ignored)."""
+    table_stems, rows = table
+    keep = np.isin(table_stems, _stem_array(stems))
+    codes = np.cumsum(keep) - 1
+    rows = rows[keep[rows["stem"]]]
+    rows["stem"] = codes[rows["stem"]]
+    return table_stems[keep], rows
+
+
+def read_yolo_dir(directory: Path, stems: Iterable[str] | None = None) -> Table:
+    """Table of every <stem>.txt in directory (or just the given stems)."""
+    if stems is None:
+        stems = [p.stem for p in directory.glob("*.txt")]
+    tables = []
+    for stem in stems:
+        try:
+            text = (directory / f"{stem}.txt").read_text()
+        except FileNotFoundError:
+            continue
+        tables.append(from_yolo(stem, text))
+    return concat(tables)
+
+
+def _write_text(path: Path, lines: list[str]) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text("\n".join(lines) + "\n" if lines else "")
+    os.replace(tmp_path, path)
+
+
+def write_yolo_dir(table: Table, directory: Path, stems: Iterable[str] | None = None) -> int:
+    """Write one YOLO label file per stem into directory; returns the number written.
+
+    stems lists every stem to write, including ones with no rows (written
+    as empty files); by default it is the stems that have rows in table.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    grouped = dict(by_stem(table))
+    stems = grouped if stems is None else stems
+    n = 0
+    for stem in stems:
+        rows = grouped.get(stem)
+        _write_text(directory / f"{stem}.txt", to_yolo_lines(rows) if rows is not None else [])
+        n += 1
+    return n
+
+
+def _read_snapshot() -> tuple[dict[str, tuple[str, int]], Table]:
+    """(stem → (annotator, mtime_ns), table) from ANNOTATION_TABLE_PATH, or empty.
+
+    The snapshot's stems are exactly the stems of its basis.
+    """
+    try:
+        with np.load(ANNOTATION_TABLE_PATH) as data:
+            stems = data["stems"]
+            basis = dict(zip(
+                stems.tolist(),
+                zip(data["annotators"].tolist(), data["mtimes"].tolist()),
+            ))
+            rows = data["rows"]
+        if rows.dtype != DTYPE:
+            return {}, empty()    # written by an older layout: rebuild it
+        return basis, (stems, rows)
+    except (OSError, KeyError, ValueError):
+        return {}, empty()
+
+
+def _write_snapshot(basis: dict[str, tuple[str, int]], table: Table) -> None:
+    stems, rows = table
+    tmp_path = ANNOTATION_TABLE_PATH.with_name(f".{ANNOTATION_TABLE_PATH.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            rows=rows,
+            stems=stems,
+            annotators=np.array([basis[s][0] for s in stems.tolist()], dtype=str),
+            mtimes=np.array([basis[s][1] for s in stems.tolist()], dtype=np.int64),
+        )
+    os.replace(tmp_path, ANNOTATION_TABLE_PATH)
+
+
+@traced("annotations.load_all")
+def load_all() -> Table:
+    """Every effective annotation as one read-only table, sorted by stem.
+
+    Saves still waiting in the write-behind journal are not included
+    (annotation_journal.flush() first if they matter).
+    """
+    global _cached
+    with _lock:
+        generation = annotation_index.generation()
+        if _cached is not None and _cached[0] == generation:
+            return _cached[1]
+        current = annotation_index.effective()
+        basis, table = _read_snapshot()
+        if basis != current:
+            kept = [s for s, key in current.items() if basis.get(s) == key]
+            fresh = []
+            for stem, (annotator, _) in current.items():
+                if basis.get(stem) != current[stem]:
+                    try:
+                        text = annotation_index.label_path(stem, annotator).read_text()
+                    except FileNotFoundError:
+                        continue
+                    fresh.append(from_yolo(stem, text))
+            # Every reviewed stem is in the table, even if its file has no boxes
+            reviewed = (_stem_array(current), np.empty(0, dtype=DTYPE))
+            table = concat([_select(table, kept), *fresh, reviewed])
+            _write_snapshot(current, table)
+        for array in table:
+            array.flags.writeable = False
+        _cached = (generation, table)
+        return table
+
+
+def save_many(table: Table, stems: Iterable[str] | None = None,
+              annotator: str = DEFAULT_ANNOTATOR) -> int:
+    """Write table as the annotator's annotations, one label file per stem; returns the count.
+
+    stems lists every stem to save, including reviewed ones with no boxes
+    (saved as empty files); by default it is the stems that have rows in table.
+    Each save bumps the annotation's version, so sessions editing one of
+    these images get a conflict instead of overwriting the import. The
+    annotator's unwritten saves of these stems (annotation_journal) are
+    dropped, so the write-behind writer cannot overwrite the import either.
+    """
+    grouped = dict(by_stem(table))
+    stems = list(grouped) if stems is None else list(stems)
+    out_dir = annotation_index.namespace_dir(annotator)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with annotation_journal.exclusive(discard_pending=True, annotator=annotator, stems=stems):
+        for stem in stems:
+            rows = grouped.get(stem)
+            boxes = to_boxes(rows) if rows is not None else []
+            out_path = out_dir / f"{stem}.txt"
+            annotation_index.next_version(stem, annotator)
+            write_yolo_labels(out_path, boxes)
+            annotation_index.record(stem, boxes, out_path.stat().st_mtime_ns, annotator)
+    return len(stems)
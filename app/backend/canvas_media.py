@@ -0,0 +1,87 @@
+"""Delivery of canvas background images to the browser.
+
+With CANVAS_IMAGE_TRANSPORT = "inline" the encoded image travels inside the
+component args as base64 (the original behaviour). With "static" it is
+written once, content-addressed, under CANVAS_STATIC_DIR and the component
+fetches it by URL from Streamlit's static file server, which sends ETags.
+Reruns then carry a short URL instead of a ~200 KB string, and revisits are
+browser cache hits. Either transport can use PNG, JPEG or WEBP.
+
+Payloads (base64 strings or URLs) go through backend.payload_cache, so each
+one is encoded once per process regardless of how many sessions need it.
+"""
+
+import base64
+import hashlib
+import os
+import threading
+from typing import Callable
+
+from PIL import Image
+
+from backend.config import (
+    CANVAS_IMAGE_FORMAT, CANVAS_IMAGE_QUALITY, CANVAS_IMAGE_TRANSPORT,
+    CANVAS_STATIC_DIR, CANVAS_STATIC_MAX_FILES,
+)
+from backend.image_service import encode_image
+from backend.payload_cache import get_or_encode
+
+_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+_EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+# Path under which Streamlit serves STATIC_DIR, relative to the server root
+_STATIC_URL_PREFIX = "app/static/canvas/"
+_PRUNE_EVERY = 100
+
+_publish_lock = threading.Lock()
+_publish_count = 0
+
+
+def _prune_static_dir() -> None:
+    """Delete the oldest published files beyond CANVAS_STATIC_MAX_FILES."""
+    files = sorted(CANVAS_STATIC_DIR.iterdir(), key=lambda p: p.stat().st_mtime_ns)
+    for path in files[:max(0, len(files) - CANVAS_STATIC_MAX_FILES)]:
+        path.unlink(missing_ok=True)
+
+
+def _publish(name: str, image: Image.Image, fmt: str, quality: int) -> str:
+    """Write an encoded image under CANVAS_STATIC_DIR (atomically) and return its URL."""
+    global _publish_count
+    CANVAS_STATIC_DIR.mkdir(parents=True, exist_ok=True)
+    path = CANVAS_STATIC_DIR / name
+    if not path.exists():
+        tmp = path.with_name(f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(encode_image(image, fmt, quality))
+        os.replace(tmp, path)
+        with _publish_lock:
+            _publish_count += 1
+            if _publish_count % _PRUNE_EVERY == 0:
+                _prune_static_dir()
+    return _STATIC_URL_PREFIX + name
+
+
+def build_payload(key: tuple, image_fn: Callable[[], Image.Image]) -> dict:
+    """Return the drawable_canvas background args for a display image.
+
+    key identifies the image content (see payload_cache.payload_key);
+    image_fn returns the display image and is only called on a cache miss.
+    The result has either ``image_url`` or ``image_b64`` plus ``image_mime``.
+    """
+    fmt = CANVAS_IMAGE_FORMAT.upper()
+    mime = _MIME_TYPES[fmt]
+    full_key = (*key, CANVAS_IMAGE_TRANSPORT, fmt, CANVAS_IMAGE_QUALITY)
+
+    if CANVAS_IMAGE_TRANSPORT == "static":
+        name = hashlib.sha1(repr(full_key).encode()).hexdigest()[:24] + _EXTENSIONS[fmt]
+        url = get_or_encode(
+            full_key, lambda: _publish(name, image_fn(), fmt, CANVAS_IMAGE_QUALITY),
+        )
+        if not (CANVAS_STATIC_DIR / name).exists():
+            # Pruned (or deleted by hand) while still cached — publish again.
+            url = _publish(name, image_fn(), fmt, CANVAS_IMAGE_QUALITY)
+        return {"image_url": url, "image_mime": mime}
+
+    image_b64 = get_or_encode(
+        full_key,
+        lambda: base64.b64encode(encode_image(image_fn(), fmt, CANVAS_IMAGE_QUALITY)).decode(),
+    )
+    return {"image_b64": image_b64, "image_mime": mime}
@@ -9,10 +9,49 @@ SOURCE_LABELS_DIR = PROJECT_DIR / "Test-Dataset-YOLO" / "obj_train_data"
 
 COLD_START_DIR = APP_DIR / "cold_start_annotations"
 COLD_START_DIR.mkdir(exist_ok=True)
+# Per-annotator namespaces: the default annotator's labels stay directly in
+# COLD_START_DIR; anyone else's go in ANNOTATORS_DIR/<name>/
+DEFAULT_ANNOTATOR = "default"
+ANNOTATORS_DIR = COLD_START_DIR / "annotators"
+
+# Model proposals written by models/prelabel.py (same YOLO format, not reviewed)
+PROPOSALS_DIR = APP_DIR / "proposals"
 
 DATASET_DIR = APP_DIR / "data"
 MODEL_DIR = APP_DIR / "models"
 BEST_MODEL_PATH = MODEL_DIR / "best.pt"
+# Exported from best.pt on demand (models/export_model.py or first load)
+ONNX_MODEL_PATH = MODEL_DIR / "best.onnx"
+ONNX_INT8_MODEL_PATH = MODEL_DIR / "best-int8.onnx"
+
+# Derived, rebuildable state (indexes, caches) — safe to delete
+CACHE_DIR = APP_DIR / "cache"
+CACHE_DIR.mkdir(exist_ok=True)
+ANNOTATION_INDEX_PATH = CACHE_DIR / "annotations.sqlite3"
+# Columnar snapshot of every annotation (backend/annotation_table.py)
+ANNOTATION_TABLE_PATH = CACHE_DIR / "annotations.npz"
+INFERENCE_CACHE_PATH = CACHE_DIR / "inference.sqlite3"
+# Write-behind journal for annotation saves (backend/annotation_journal.py)
+JOURNAL_DIR = CACHE_DIR / "journal"
+JOURNAL_FLUSH_INTERVAL = 0.05   # seconds a burst of saves waits to share one fsync
+# Work leases (backend/work_leases.py): reviewers claim disjoint batches
+LEASE_PATH = CACHE_DIR / "leases.sqlite3"
+LEASE_BATCH_SIZE = 20
+LEASE_TTL = 30 * 60             # seconds before an unfinished claim is released
+# Decoded-frame store (backend/frame_store.py): opt-in, created by
+# data/build_frame_store.py; raw RGB, ~1.9 MB of disk per 959x661 image
+FRAME_STORE_PATH = CACHE_DIR / "frames.u8"
+FRAME_INDEX_PATH = CACHE_DIR / "frames.sqlite3"
+FRAME_STORE_FILL_ON_MISS = True
+# Pre-scaled display/thumbnail renditions (backend/renditions.py)
+RENDITIONS_DIR = CACHE_DIR / "renditions"
+# Lossless format of the display tier: "PNG" (~10 ms to load, ~150 KB) or
+# "BMP" (uncompressed: ~1 ms to load, ~6x the disk)
+RENDITION_DISPLAY_FORMAT = "PNG"
+
+# Served by Streamlit at app/static/* (server.enableStaticServing)
+STATIC_DIR = APP_DIR / "static"
+CANVAS_STATIC_DIR = STATIC_DIR / "canvas"
 
 ASSETS_DIR = APP_DIR / "assets"
 CSS_PATH = ASSETS_DIR / "style.css"
@@ -21,6 +60,26 @@ CSS_PATH = ASSETS_DIR / "style.css"
 IMG_WIDTH = 959
 IMG_HEIGHT = 661
 
+# ── Canvas display ────────────────────────────────────────────────────
+CANVAS_MAX_WIDTH = 680
+THUMBNAIL_WIDTH = 160                # gallery tier of backend/renditions.py
+# How the background reaches the browser:
+#   "inline" — base64 in the component args (travels over the websocket)
+#   "static" — written under CANVAS_STATIC_DIR and fetched by URL (ETag'd,
+#              browser-cacheable; keeps reruns small on slow networks)
+CANVAS_IMAGE_TRANSPORT = "inline"
+CANVAS_IMAGE_FORMAT = "PNG"         # PNG | JPEG | WEBP
+CANVAS_IMAGE_QUALITY = 85           # JPEG/WEBP only
+CANVAS_STATIC_MAX_FILES = 2000      # oldest published files pruned beyond this
+
+# ── Look-ahead prefetch ───────────────────────────────────────────────
+PREFETCH_AHEAD = 3          # upcoming images prepared while the user draws
+PREFETCH_WORKERS = 2
+PREFETCH_CACHE_SIZE = 8     # prepared frames kept in memory (LRU)
+
+# ── Shared canvas payload cache (process-wide, all sessions) ──────────
+PAYLOAD_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
 # ── Class mapping ─────────────────────────────────────────────────────
 # Source obj.names: 0=Brain, 1=CSP, 2=LV
 # Model detects CSP only; Thalamus is user-drawn in Co-Pilot mode
@@ -50,6 +109,48 @@ OVERLAY_FONT_SIZE = 14
 
 # ── Training threshold ────────────────────────────────────────────────
 TRAINING_THRESHOLD = 50
+# Start a background fine-tuning round (backend/training_job.py) every
+# TRAINING_THRESHOLD new reviews; False = train manually (models/train_model.py)
+TRAINING_AUTO_FINETUNE = True
+FINETUNE_EPOCHS = 10
+FINETUNE_PROFILE = "cpu-fast"   # models/train_model.py PROFILES
+TRAINING_JOB_PATH = CACHE_DIR / "training_job.json"
+TRAINING_LOG_PATH = CACHE_DIR / "training_job.log"
 
 # ── Model inference ───────────────────────────────────────────────────
 CONFIDENCE_THRESHOLD = 0.25
+# Unreviewed images whose best CSP proposal is below this go in the
+# "Low-confidence proposals" work queue (backend/work_queue.py). Proposals
+# under CONFIDENCE_THRESHOLD are dropped at inference, so the queue covers
+# CONFIDENCE_THRESHOLD <= confidence < QUEUE_LOW_CONFIDENCE; images with no
+# proposal at all are only in "Unreviewed".
+QUEUE_LOW_CONFIDENCE = 0.5
+# Images per forward pass when pre-computing detections in the background
+INFERENCE_BATCH_SIZE = 8
+# Inference backend:
+#   "torch"     — ultralytics YOLO on best.pt (default)
+#   "onnx"      — onnxruntime on best.onnx, no torch import (CPU workstations)
+#   "onnx-int8" — as "onnx", dynamically INT8-quantized weights
+#   "openvino"  — as "onnx" via the OpenVINO execution provider
+INFERENCE_BACKEND = "torch"
+ONNX_IMGSZ = 640
+ONNX_THREADS = 0            # 0 = onnxruntime default (all physical cores)
+# Load the model on a background thread as soon as the app process starts
+# (otherwise on first visit to éo-Assisted)
+MODEL_WARMUP_ON_LAUNCH = True
+
+# Shared inference server (python -m backend.inference_server, run from app/).
+# Set the URL to have every app process send detections to one model that
+# micro-batches requests across annotators; None = in-process model only.
+INFERENCE_SERVER_URL = None          # e.g. "http://127.0.0.1:8765"
+INFERENCE_SERVER_HOST = "127.0.0.1"
+INFERENCE_SERVER_PORT = 8765
+INFERENCE_SERVER_BATCH_WINDOW_MS = 10   # wait this long for more requests
+INFERENCE_SERVER_TIMEOUT = 30.0         # seconds, client side
+INFERENCE_SERVER_RETRY_AFTER = 60.0     # seconds on the local model after a failed request
+
+# ── Hot-path tracing (backend/tracing.py) ─────────────────────────────
+# Also switchable at runtime from the admin panel (open the app with ?admin=1)
+TRACING_ENABLED = False
+TRACE_WINDOW = 1000          # recent samples kept per span for p50/p95
+TRACE_JSONL_PATH = None      # e.g. CACHE_DIR / "trace.jsonl" to log every span
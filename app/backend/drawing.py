@@ -1,5 +1,88 @@
+"""Box coordinate conversions.
+
+The array functions take and return (N, 4) NumPy arrays of boxes in one
+of three layouts:
+
+    xyxy     pixel corners (x1, y1, x2, y2)
+    yolo     normalized centre and size (cx, cy, w, h), YOLO label order
+    canvas   canvas pixel rects (left, top, width, height), as drawn
+
+canvas_rect_to_yolo() and yolo_to_pixel() are the one-box versions used by
+the UI; they go through the same array code.
+"""
+
+import numpy as np
+
 from backend.config import IMG_WIDTH, IMG_HEIGHT
 
+YOLO_KEYS = ("cx", "cy", "w", "h")
+
+
+def _boxes(a) -> np.ndarray:
+    """a as a float64 (N, 4) array (an empty input gives shape (0, 4))."""
+    return np.asarray(a, dtype=np.float64).reshape(-1, 4)
+
+
+def yolo_array(boxes: list[dict]) -> np.ndarray:
+    """(N, 4) yolo array from box dicts with cx, cy, w, h keys."""
+    return _boxes([[b["cx"], b["cy"], b["w"], b["h"]] for b in boxes])
+
+
+def normalize_xyxy(xyxy) -> np.ndarray:
+    """Reorder corners so x1 <= x2 and y1 <= y2 (boxes dragged up or left)."""
+    xyxy = _boxes(xyxy)
+    return np.concatenate([
+        np.minimum(xyxy[:, :2], xyxy[:, 2:]), np.maximum(xyxy[:, :2], xyxy[:, 2:]),
+    ], axis=1)
+
+
+def xyxy_to_cxcywh(xyxy) -> np.ndarray:
+    """Corners to centre and size, in the same units (negative sizes normalized)."""
+    xyxy = normalize_xyxy(xyxy)
+    return np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+
+def cxcywh_to_xyxy(cxcywh) -> np.ndarray:
+    """Centre and size to corners, in the same units."""
+    cxcywh = _boxes(cxcywh)
+    half = np.abs(cxcywh[:, 2:]) / 2
+    return np.concatenate([cxcywh[:, :2] - half, cxcywh[:, :2] + half], axis=1)
+
+
+def xyxy_to_yolo(xyxy, img_w: int, img_h: int) -> np.ndarray:
+    """Pixel corners to normalized yolo boxes, clipped to the image."""
+    xyxy = normalize_xyxy(xyxy)
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, img_w)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, img_h)
+    return xyxy_to_cxcywh(xyxy) / (img_w, img_h, img_w, img_h)
+
+
+def yolo_to_xyxy(yolo, img_w: int = IMG_WIDTH, img_h: int = IMG_HEIGHT) -> np.ndarray:
+    """Normalized yolo boxes to pixel corners (float)."""
+    return cxcywh_to_xyxy(yolo) * (img_w, img_h, img_w, img_h)
+
+
+def yolo_to_pixels(yolo, img_w: int = IMG_WIDTH, img_h: int = IMG_HEIGHT) -> np.ndarray:
+    """Normalized yolo boxes to integer pixel corners (truncated, like int())."""
+    yolo = _boxes(yolo)
+    half = yolo[:, 2:] / 2
+    xyxy = np.concatenate([yolo[:, :2] - half, yolo[:, :2] + half], axis=1)
+    return np.trunc(xyxy * (img_w, img_h, img_w, img_h)).astype(np.int64)
+
+
+def canvas_rects_to_yolo(rects, canvas_w: int, canvas_h: int) -> np.ndarray:
+    """Canvas rects (left, top, width, height) to normalized yolo boxes.
+
+    Negative widths/heights (drawn right-to-left or bottom-to-top) are
+    normalized, and every output value is clamped to [0, 1].
+    """
+    rects = _boxes(rects)
+    size = np.abs(rects[:, 2:])
+    top_left = np.where(rects[:, 2:] < 0, rects[:, :2] + rects[:, 2:], rects[:, :2])
+    canvas = (canvas_w, canvas_h)
+    yolo = np.concatenate([(top_left + size / 2) / canvas, size / canvas], axis=1)
+    return yolo.clip(0.0, 1.0)
+
 
 def canvas_rect_to_yolo(rect: dict, canvas_w: int, canvas_h: int) -> dict:
     """Convert a canvas rect object to YOLO normalized coordinates.
@@ -7,38 +90,10 @@ def canvas_rect_to_yolo(rect: dict, canvas_w: int, canvas_h: int) -> dict:
     Canvas rect has keys: left, top, width, height (in pixel coords of canvas).
     Returns dict with cx, cy, w, h normalized to [0, 1].
     """
-    left = rect["left"]
-    top = rect["top"]
-    w = rect["width"]
-    h = rect["height"]
-
-    # Handle negative width/height from drawing direction
-    if w < 0:
-        left = left + w
-        w = -w
-    if h < 0:
-        top = top + h
-        h = -h
-
-    cx = (left + w / 2) / canvas_w
-    cy = (top + h / 2) / canvas_h
-    nw = w / canvas_w
-    nh = h / canvas_h
-
-    # Clamp to [0, 1]
-    cx = max(0.0, min(1.0, cx))
-    cy = max(0.0, min(1.0, cy))
-    nw = max(0.0, min(1.0, nw))
-    nh = max(0.0, min(1.0, nh))
-
-    return {"cx": cx, "cy": cy, "w": nw, "h": nh}
+    ltwh = [rect["left"], rect["top"], rect["width"], rect["height"]]
+    return dict(zip(YOLO_KEYS, canvas_rects_to_yolo(ltwh, canvas_w, canvas_h)[0].tolist()))
 
 
 def yolo_to_pixel(box: dict, img_w: int = IMG_WIDTH, img_h: int = IMG_HEIGHT) -> tuple:
     """Convert YOLO normalized box to pixel (x1, y1, x2, y2)."""
-    cx, cy, w, h = box["cx"], box["cy"], box["w"], box["h"]
-    x1 = int((cx - w / 2) * img_w)
-    y1 = int((cy - h / 2) * img_h)
-    x2 = int((cx + w / 2) * img_w)
-    y2 = int((cy + h / 2) * img_h)
-    return (x1, y1, x2, y2)
+    return tuple(yolo_to_pixels(yolo_array([box]), img_w, img_h)[0].tolist())
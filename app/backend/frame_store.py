@@ -0,0 +1,265 @@
+"""Memory-mapped store of decoded RGB frames for the review corpus.
+
+Decoded frames are packed back to back as raw uint8 RGB in one flat file
+(FRAME_STORE_PATH). A SQLite index maps stem → (offset, width, height,
+source mtime, source size). Reading a frame is then a page-cache hit instead
+of a PNG inflate, and every app process on the box maps the same file, so
+they share the pages.
+
+The store is opt-in: it is used once data/build_frame_store.py has created
+it, and from then on images missing from it are added on first load. It
+holds only the review corpus (SOURCE_IMAGES_DIR), since frames are keyed
+by stem; images loaded from other folders always bypass it.
+Frames whose source file changed are treated as missing. They are rewritten
+in place when the new frame fits the old extent, and appended otherwise.
+
+The store file starts with a header holding a random generation, which the
+index also records. `build_frame_store.py --rebuild` replaces both files
+under running processes; each lookup checks the generation on disk and
+reopens the new pair on a change, so offsets from the old index are never
+applied to the new frames.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from backend.config import (
+    FRAME_INDEX_PATH, FRAME_STORE_FILL_ON_MISS, FRAME_STORE_PATH, SOURCE_IMAGES_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    stem     TEXT PRIMARY KEY,
+    offset   INTEGER NOT NULL,
+    width    INTEGER NOT NULL,
+    height   INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+_MAGIC = b"FRMSTOR1"
+HEADER_SIZE = len(_MAGIC) + 16
+
+_lock = threading.RLock()
+_conn: sqlite3.Connection | None = None
+# Generation of the store _conn, _index and _map belong to
+_generation: str | None = None
+_data_version: int | None = None
+# stem → (offset, width, height, mtime_ns, size)
+_index: dict[str, tuple[int, int, int, int, int]] = {}
+_map: np.memmap | None = None
+_map_bytes = 0
+
+
+def available() -> bool:
+    """True once the store has been created (data/build_frame_store.py)."""
+    return FRAME_STORE_PATH.exists()
+
+
+def _read_generation(f) -> str | None:
+    header = f.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE or not header.startswith(_MAGIC):
+        return None
+    return header[len(_MAGIC):].hex()
+
+
+def _store_generation() -> str | None:
+    """Generation in the header of the store on disk; None if absent or headerless."""
+    try:
+        with open(FRAME_STORE_PATH, "rb") as f:
+            return _read_generation(f)
+    except FileNotFoundError:
+        return None
+
+
+def create() -> None:
+    """Create an empty store (no-op if it exists; replaces one without a header)."""
+    if _store_generation() is not None:
+        return
+    tmp_path = FRAME_STORE_PATH.with_name(f".{FRAME_STORE_PATH.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(_MAGIC + uuid.uuid4().bytes)
+    os.replace(tmp_path, FRAME_STORE_PATH)
+
+
+def _close() -> None:
+    global _conn, _map, _map_bytes, _data_version, _generation
+    if _conn is not None:
+        _conn.close()
+    _conn, _map, _map_bytes, _data_version, _generation = None, None, 0, None, None
+    _index.clear()
+
+
+def destroy() -> None:
+    """Delete the store and its index."""
+    with _lock:
+        _close()
+        for path in (FRAME_STORE_PATH, FRAME_INDEX_PATH,
+                     FRAME_INDEX_PATH.with_name(FRAME_INDEX_PATH.name + "-wal"),
+                     FRAME_INDEX_PATH.with_name(FRAME_INDEX_PATH.name + "-shm")):
+            path.unlink(missing_ok=True)
+
+
+def _ensure() -> bool:
+    """Open the index of the store on disk; reload it when another process commits.
+
+    Reopens everything when the store was recreated since the last call.
+    Returns False if there is no usable store.
+    """
+    global _conn, _data_version, _generation
+    generation = _store_generation()
+    if generation is None:
+        _close()
+        return False
+    if generation != _generation:
+        _close()
+        _conn = sqlite3.connect(
+            FRAME_INDEX_PATH, check_same_thread=False, isolation_level=None, timeout=30,
+        )
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(_SCHEMA)
+        _conn.execute("BEGIN IMMEDIATE")
+        row = _conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        if _store_generation() != generation:
+            _conn.execute("ROLLBACK")
+            _close()
+            return False    # recreated while we were opening; the next call retries
+        if row is None or row[0] != generation:
+            # Left over from another store: its offsets mean nothing here
+            _conn.execute("DELETE FROM frames")
+            _conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (generation,),
+            )
+        _conn.execute("COMMIT")
+        _generation = generation
+    version = _conn.execute("PRAGMA data_version").fetchone()[0]
+    if version != _data_version:
+        _index.clear()
+        for stem, *entry in _conn.execute(
+                "SELECT stem, offset, width, height, mtime_ns, size FROM frames"):
+            _index[stem] = tuple(entry)
+        _data_version = version
+    return True
+
+
+def _view(offset: int, width: int, height: int) -> np.ndarray | None:
+    """Return the mapped (H, W, 3) array at offset, remapping if the file grew."""
+    global _map, _map_bytes
+    end = offset + width * height * 3
+    if end > _map_bytes:
+        size = FRAME_STORE_PATH.stat().st_size
+        if end > size:
+            return None
+        mapped = np.memmap(FRAME_STORE_PATH, dtype=np.uint8, mode="r", shape=(size,))
+        if bytes(mapped[:HEADER_SIZE]) != _MAGIC + bytes.fromhex(_generation):
+            return None    # recreated since _ensure(); the next call reopens
+        _map, _map_bytes = mapped, size
+    return _map[offset:end].reshape(height, width, 3)
+
+
+def _in_corpus(path: Path) -> bool:
+    """True for an image directly in SOURCE_IMAGES_DIR (the only ones stored)."""
+    # Catalog paths match as given; only other spellings need resolving
+    if path.parent == SOURCE_IMAGES_DIR:
+        return True
+    return path.parent.resolve() == SOURCE_IMAGES_DIR.resolve()
+
+
+def get_pixels(path: Path) -> np.ndarray | None:
+    """Zero-copy, read-only (H, W, 3) view of the decoded image, or None if not stored."""
+    if not available() or not _in_corpus(path):
+        return None
+    st = path.stat()
+    with _lock:
+        if not _ensure():
+            return None
+        entry = _index.get(path.stem)
+        if entry is None or entry[3:] != (st.st_mtime_ns, st.st_size):
+            return None
+        return _view(*entry[:3])
+
+
+def put(path: Path, pixels: np.ndarray) -> bool:
+    """Store decoded (H, W, 3) pixels for path; False if the store is absent.
+
+    Paths outside SOURCE_IMAGES_DIR are not stored (False): they would
+    replace the corpus frame with the same stem.
+    """
+    if not available() or not _in_corpus(path) or pixels.ndim != 3 or pixels.shape[2] != 3:
+        return False
+    height, width = pixels.shape[:2]
+    st = path.stat()
+    data = np.ascontiguousarray(pixels, dtype=np.uint8).tobytes()
+    with _lock:
+        if not _ensure():
+            return False
+        _conn.execute("BEGIN IMMEDIATE")
+        try:
+            with open(FRAME_STORE_PATH, "r+b") as f:
+                if _read_generation(f) != _generation:
+                    # Recreated since _ensure(): don't write old offsets into it
+                    _conn.execute("ROLLBACK")
+                    return False
+                row = _conn.execute(
+                    "SELECT offset, width * height * 3 FROM frames WHERE stem = ?", (path.stem,),
+                ).fetchone()
+                if row is not None and row[1] >= len(data):
+                    offset = row[0]
+                else:
+                    offset = f.seek(0, os.SEEK_END)
+                # Pixels first, index second: readers never see an extent before it's written
+                f.seek(offset)
+                f.write(data)
+            _conn.execute(
+                "INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?, ?, ?)",
+                (path.stem, offset, width, height, st.st_mtime_ns, st.st_size),
+            )
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
+        _index[path.stem] = (offset, width, height, st.st_mtime_ns, st.st_size)
+    return True
+
+
+def load(path: Path) -> Image.Image | None:
+    """Return the stored frame as an RGB image, or None on a miss.
+
+    PIL keeps RGB at 4 bytes/pixel internally, so this is one memcpy from
+    the mapped pages; use get_pixels() for a true zero-copy array.
+    """
+    pixels = get_pixels(path)
+    return None if pixels is None else Image.fromarray(pixels, "RGB")
+
+
+def fill(path: Path, image: Image.Image) -> None:
+    """Add a freshly decoded image on a miss (if the store exists and filling is on).
+
+    Best effort: the image is already loaded, so a busy index or a full
+    disk is logged and otherwise ignored.
+    """
+    if FRAME_STORE_FILL_ON_MISS and available():
+        try:
+            put(path, np.asarray(image))
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("could not add %s to the frame store: %s", path.name, exc)
+
+
+def stats() -> dict:
+    """Frames indexed and bytes on disk."""
+    with _lock:
+        if not _ensure():
+            return {"frames": 0, "bytes": 0}
+        return {"frames": len(_index), "bytes": os.path.getsize(FRAME_STORE_PATH)}
@@ -0,0 +1,103 @@
+"""Cached, sorted catalog of the source images.
+
+The catalog keeps the sorted listing of SOURCE_IMAGES_DIR in memory and
+rescans only when the directory's mtime changes, i.e. when an image is
+added, removed or renamed. Lookups are O(1) from index to path and from
+stem to index.
+
+It also keeps the position of the first unreviewed image. A save only
+adds an annotation, so that pointer moves forward past newly saved images
+on the next lookup. A full rescan from the start happens only when
+annotations disappear (see annotation_index.removals()) or the listing
+changes.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+from backend import annotation_index
+from backend.config import SOURCE_IMAGES_DIR
+
+_lock = threading.Lock()
+_dir_mtime_ns: int | None = None
+_paths: list[Path] = []
+_stems: list[str] = []
+_positions: dict[str, int] = {}
+_first_new = 0
+# (dir mtime, annotation removals) the pointer was computed against
+_first_new_basis: tuple[int, int] | None = None
+
+
+def _refresh() -> None:
+    """Rescan the directory if its mtime changed since the last listing."""
+    global _dir_mtime_ns, _paths, _stems, _positions
+    try:
+        mtime_ns = SOURCE_IMAGES_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = -1
+    if mtime_ns == _dir_mtime_ns:
+        return
+    names = []
+    if mtime_ns != -1:
+        with os.scandir(SOURCE_IMAGES_DIR) as it:
+            names = sorted(e.name for e in it if e.name.endswith(".png") and e.is_file())
+    # Swap in new objects so callers holding the old list keep a consistent one
+    _paths = [SOURCE_IMAGES_DIR / name for name in names]
+    _stems = [name[:-4] for name in names]
+    _positions = {stem: i for i, stem in enumerate(_stems)}
+    _dir_mtime_ns = mtime_ns
+
+
+def paths() -> list[Path]:
+    """All image paths sorted by filename (a shared list: don't mutate it)."""
+    with _lock:
+        _refresh()
+        return _paths
+
+
+def count() -> int:
+    """Number of images in the catalog."""
+    with _lock:
+        _refresh()
+        return len(_paths)
+
+
+def path_at(index: int) -> Path:
+    """Path of the image at position index (IndexError if out of range)."""
+    with _lock:
+        _refresh()
+        return _paths[index]
+
+
+def index_of(stem: str) -> int | None:
+    """Position of the image with this stem, or None if it isn't in the catalog."""
+    with _lock:
+        _refresh()
+        return _positions.get(stem)
+
+
+def page(start: int, size: int) -> list[Path]:
+    """Up to size paths starting at position start."""
+    with _lock:
+        _refresh()
+        return _paths[max(0, start):max(0, start) + size]
+
+
+def snapshot() -> tuple[int | None, list[str]]:
+    """Return (listing version, stems in catalog order); the list is shared, don't mutate it."""
+    with _lock:
+        _refresh()
+        return _dir_mtime_ns, _stems
+
+
+def first_unannotated() -> int | None:
+    """Position of the first image without an annotation, or None if all are done."""
+    global _first_new, _first_new_basis
+    with _lock:
+        _refresh()
+        basis = (_dir_mtime_ns, annotation_index.removals())
+        if basis != _first_new_basis:
+            _first_new, _first_new_basis = 0, basis
+        _first_new = annotation_index.first_missing(_stems, _first_new)
+        return _first_new if _first_new < len(_stems) else None
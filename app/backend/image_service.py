@@ -1,22 +1,54 @@
+import hashlib
+from io import BytesIO
 from pathlib import Path
 from PIL import Image
-from backend.config import SOURCE_IMAGES_DIR, SOURCE_LABELS_DIR
+from backend import frame_store, image_catalog
+from backend.config import SOURCE_LABELS_DIR, CANVAS_MAX_WIDTH
+from backend.tracing import span
 
 
 def list_image_paths() -> list[Path]:
-    """Return all PNG image paths sorted by filename."""
-    return sorted(SOURCE_IMAGES_DIR.glob("*.png"))
+    """Return all PNG image paths sorted by filename (cached; don't mutate)."""
+    with span("images.list"):
+        return image_catalog.paths()
 
 
 def load_image(path: Path) -> Image.Image:
     """Load an image as RGB PIL Image.
 
+    Served from the decoded-frame store when it has been built.
     Raises ValueError with filename if the image is corrupt or unreadable.
     """
     try:
-        return Image.open(path).convert("RGB")
+        with span("image.frame_store"):
+            image = frame_store.load(path)
+        if image is not None:
+            return image
+        with span("image.decode"):
+            image = Image.open(path).convert("RGB")
     except Exception as exc:
         raise ValueError(f"Cannot open image {path.name}: {exc}") from exc
+    frame_store.fill(path, image)
+    return image
+
+
+# (path, size, mtime_ns) → sha1; avoids re-reading unchanged files
+_digest_memo: dict[tuple[str, int, int], str] = {}
+
+
+def image_digest(path: Path) -> str:
+    """Return the SHA-1 content hash of an image file (memoized by size and mtime)."""
+    st = path.stat()
+    memo_key = (str(path), st.st_size, st.st_mtime_ns)
+    digest = _digest_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _digest_memo[memo_key] = digest
+    return digest
 
 
 def get_annotation_path(image_path: Path) -> Path:
@@ -27,3 +59,21 @@ def get_annotation_path(image_path: Path) -> Path:
 def get_image_stem(image_path: Path) -> str:
     """Return the filename stem (e.g. '480_HC')."""
     return image_path.stem
+
+
+def canvas_size(img_w: int, img_h: int, max_width: int = CANVAS_MAX_WIDTH) -> tuple[int, int]:
+    """Return the (width, height) the canvas displays an image at."""
+    canvas_width = min(img_w, max_width)
+    scale = canvas_width / img_w
+    return canvas_width, int(img_h * scale)
+
+
+def encode_image(image: Image.Image, fmt: str = "PNG", quality: int = 85) -> bytes:
+    """Encode an image as PNG, JPEG or WEBP bytes (quality ignored for PNG)."""
+    buf = BytesIO()
+    with span("image.encode"):
+        if fmt == "PNG":
+            image.save(buf, format="PNG")
+        else:
+            image.save(buf, format=fmt, quality=quality)
+    return buf.getvalue()
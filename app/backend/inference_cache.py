@@ -0,0 +1,292 @@
+"""Persistent cache of landmark detections, shared by every session and process.
+
+Each entry holds every proposed box for an image, CSP and Thalamus.
+
+Entries are keyed by the image's content hash plus a fingerprint of
+BEST_MODEL_PATH, so a retrained model never serves stale detections and a
+renamed or re-exported image still hits. A background job fills the cache
+for the whole image folder in batches so navigation becomes a lookup.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+from backend import image_catalog
+from backend.config import (
+    BEST_MODEL_PATH, CONFIDENCE_THRESHOLD, INFERENCE_BATCH_SIZE, INFERENCE_CACHE_PATH,
+)
+from backend.image_service import get_image_stem, image_digest, load_image
+from backend.inference_service import detect_landmarks_batch_keyed, loaded_backend
+from backend.tracing import traced
+
+# 2: entries hold every annotation class, not just CSP
+# 3: entries carry their best CSP confidence and a change sequence number
+_SCHEMA_VERSION = 3
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    image_hash TEXT NOT NULL,
+    model_key  TEXT NOT NULL,
+    stem       TEXT NOT NULL,
+    boxes      TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    seq        INTEGER NOT NULL,
+    PRIMARY KEY (image_hash, model_key)
+);
+CREATE INDEX IF NOT EXISTS detections_stem ON detections (stem, model_key);
+CREATE INDEX IF NOT EXISTS detections_seq ON detections (seq);
+"""
+
+_lock = threading.RLock()
+_conn: sqlite3.Connection | None = None
+_purged_model_key: str | None = None
+
+_model_key_memo: dict[tuple[int, int], str] = {}
+
+# stem → best proposal confidence under the current model (see proposal_confidences())
+_confidences: dict[str, float] = {}
+_confidences_basis: tuple[str, int] | None = None    # (model_key, data_version)
+_confidences_seq = 0    # highest seq read into _confidences
+_writes = 0
+
+_batch_thread: threading.Thread | None = None
+_batch_status = {
+    "model_key": None, "listing": None, "done": 0, "total": 0, "running": False, "error": None,
+}
+
+
+def _file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def model_fingerprint() -> str | None:
+    """Return a fingerprint of the weights, backend and threshold, or None if there is no model.
+
+    The backend is part of the key because exported/quantized models can
+    produce slightly different detections from the same weights. It is the
+    backend the model really runs on (see inference_service.loaded_backend()).
+    CONFIDENCE_THRESHOLD decides which boxes are kept, so changing it
+    invalidates the cache as well.
+    """
+    try:
+        st = BEST_MODEL_PATH.stat()
+    except FileNotFoundError:
+        return None
+    memo_key = (st.st_size, st.st_mtime_ns)
+    digest = _model_key_memo.get(memo_key)
+    if digest is None:
+        digest = _file_sha1(BEST_MODEL_PATH)[:16]
+        _model_key_memo.clear()
+        _model_key_memo[memo_key] = digest
+    return f"{digest}-{loaded_backend()}-{CONFIDENCE_THRESHOLD:g}"
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(
+            INFERENCE_CACHE_PATH, check_same_thread=False, isolation_level=None, timeout=30,
+        )
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        if _conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            # Older entries lack columns (or hide Thalamus proposals): start over
+            _conn.execute("DROP TABLE IF EXISTS detections")
+            _conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+
+def _purge_stale(model_key: str) -> None:
+    """Drop entries produced by any other model (once per model change)."""
+    global _purged_model_key
+    if _purged_model_key == model_key:
+        return
+    _db().execute("DELETE FROM detections WHERE model_key != ?", (model_key,))
+    _purged_model_key = model_key
+
+
+@traced("inference.cache_lookup")
+def get_cached(image_path: Path) -> list[dict] | None:
+    """Return cached detections for an image, or None on a miss."""
+    model_key = model_fingerprint()
+    if model_key is None:
+        return None
+    digest = image_digest(image_path)
+    with _lock:
+        _purge_stale(model_key)
+        row = _db().execute(
+            "SELECT boxes FROM detections WHERE image_hash = ? AND model_key = ?",
+            (digest, model_key),
+        ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def put(image_path: Path, boxes: list[dict], model_key: str | None = None) -> None:
+    """Store detections for an image under the current (or given) model."""
+    global _writes
+    model_key = model_key or model_fingerprint()
+    if model_key is None:
+        return
+    digest = image_digest(image_path)
+    stem = get_image_stem(image_path)
+    confidence = _best_confidence(boxes)
+    with _lock:
+        _purge_stale(model_key)
+        # seq orders writes across processes (a write is one serialized transaction)
+        _db().execute(
+            "INSERT OR REPLACE INTO detections VALUES "
+            "(?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM detections))",
+            (digest, model_key, stem, json.dumps(boxes), confidence),
+        )
+        # Our own commits don't change data_version; keep the mirror current
+        if _confidences_basis is not None and _confidences_basis[0] == model_key:
+            _confidences[stem] = confidence
+            _writes += 1
+
+
+def _best_confidence(boxes: list[dict]) -> float:
+    """Best CSP proposal confidence (the work queues rank images by CSP)."""
+    return max((b.get("confidence", 0.0) for b in boxes if b["class_id"] == 0), default=0.0)
+
+
+def _sync_confidences() -> tuple:
+    """Update the confidence mirror if the model or the table changed; returns its version.
+
+    After a commit by another process only the entries written since the
+    last sync are read; a new model reloads them all.
+    """
+    global _confidences, _confidences_basis, _confidences_seq
+    model_key = model_fingerprint()
+    if model_key is None:
+        _confidences, _confidences_basis, _confidences_seq = {}, None, 0
+        return (None,)
+    data_version = _db().execute("PRAGMA data_version").fetchone()[0]
+    if _confidences_basis != (model_key, data_version):
+        _purge_stale(model_key)
+        if _confidences_basis is None or _confidences_basis[0] != model_key:
+            _confidences, _confidences_seq = {}, 0
+        rows = _db().execute(
+            "SELECT stem, confidence, seq FROM detections WHERE model_key = ? AND seq > ?",
+            (model_key, _confidences_seq),
+        )
+        for stem, confidence, seq in rows:
+            _confidences[stem] = confidence
+            _confidences_seq = max(_confidences_seq, seq)
+        _confidences_basis = (model_key, data_version)
+    return (*_confidences_basis, _writes)
+
+
+def proposals_version() -> tuple:
+    """Changes whenever proposal_confidences() may have."""
+    with _lock:
+        return _sync_confidences()
+
+
+def proposal_confidences() -> tuple[tuple, dict[str, float]]:
+    """Return (version, stem → best CSP proposal confidence) under the current model.
+
+    Stems without an entry haven't been inferred yet; 0.0 means the model
+    proposed nothing.
+    """
+    with _lock:
+        return _sync_confidences(), dict(_confidences)
+
+
+def detect_landmarks_cached(model, image_path: Path, image: Image.Image | None = None) -> list[dict]:
+    """Return CSP and Thalamus detections for an image, running the model only on a miss."""
+    cached = get_cached(image_path)
+    if cached is not None:
+        return cached
+    model_key = model_fingerprint()
+    if image is None:
+        image = load_image(image_path)
+    (boxes,), served_by = detect_landmarks_batch_keyed(model, [image])
+    if served_by in (None, model_key):
+        put(image_path, boxes, model_key)
+    return boxes
+
+
+def run_batch(model, image_paths: list[Path], batch_size: int = INFERENCE_BATCH_SIZE,
+              status: dict | None = None) -> int:
+    """Run detect_landmarks over every uncached image in batches.
+
+    Returns the number of images that were inferred (cache hits are skipped).
+    Unreadable images are skipped so one bad file can't stall the job.
+    """
+    model_key = model_fingerprint()
+    if model_key is None:
+        return 0
+    pending = [p for p in image_paths if get_cached(p) is None]
+    if status is not None:
+        status["total"] = len(pending)
+        status["done"] = 0
+
+    inferred = 0
+    for start in range(0, len(pending), batch_size):
+        if model_fingerprint() != model_key:
+            # Weights were swapped mid-run; results would be keyed wrongly.
+            break
+        chunk, images = [], []
+        for p in pending[start:start + batch_size]:
+            try:
+                images.append(load_image(p))
+                chunk.append(p)
+            except ValueError:
+                continue
+        results, served_by = detect_landmarks_batch_keyed(model, images)
+        if served_by not in (None, model_key):
+            # The inference server runs another model; nothing here could be cached.
+            break
+        for p, boxes in zip(chunk, results):
+            put(p, boxes, model_key)
+        inferred += len(chunk)
+        if status is not None:
+            status["done"] = min(start + batch_size, len(pending))
+    return inferred
+
+
+def start_background_batch(model, image_paths: list[Path]) -> None:
+    """Start pre-computing detections on a daemon thread.
+
+    It runs once per model and image listing: images added to the folder
+    are picked up by the next call after the listing changes (only
+    uncached images are inferred).
+    """
+    global _batch_thread
+    model_key = model_fingerprint()
+    if model is None or model_key is None:
+        return
+    listing, _ = image_catalog.snapshot()
+    with _lock:
+        if _batch_thread is not None and _batch_thread.is_alive():
+            return
+        ran = (_batch_status["model_key"], _batch_status["listing"]) == (model_key, listing)
+        if ran and _batch_status["error"] is None:
+            return
+        _batch_status.update(model_key=model_key, listing=listing, done=0, total=0,
+                             running=True, error=None)
+
+        def _run():
+            try:
+                run_batch(model, list(image_paths), status=_batch_status)
+            except Exception as exc:
+                _batch_status["error"] = str(exc)
+            finally:
+                _batch_status["running"] = False
+
+        _batch_thread = threading.Thread(target=_run, name="landmark-batch-inference", daemon=True)
+        _batch_thread.start()
+
+
+def batch_status() -> dict:
+    """Return a snapshot of the background job: running, done, total, error."""
+    return dict(_batch_status)
@@ -0,0 +1,75 @@
+"""Client for the local inference server (backend/inference_server.py).
+
+A RemoteDetector stands in for a model: inference_service dispatches to it
+like any other backend. Images are sent as raw RGB bytes (no re-encoding
+on localhost), and the server batches them with other annotators' requests.
+If the server can't be reached, detect() returns None and the caller
+falls back to a lazily loaded local model. After a failure the server is
+left alone for retry_after seconds, so a hung server costs one timeout
+rather than one per image.
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib.request
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteDetector:
+    """HTTP client for /detect with a lazily loaded local fallback model."""
+
+    def __init__(self, url: str, timeout: float, local_loader, retry_after: float = 0.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._retry_at = 0.0    # time.monotonic() before which detect() skips the server
+        self._local_loader = local_loader
+        self._local = None
+        self._local_lock = threading.Lock()
+
+    def health(self) -> dict | None:
+        """Return the server's /health payload, or None if unreachable."""
+        try:
+            with urllib.request.urlopen(f"{self.url}/health", timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except (OSError, ValueError):
+            return None
+
+    def detect(self, images: list[Image.Image], conf: float) -> tuple[list, str | None] | None:
+        """Return (one (xyxy, conf, cls) triple of lists per image, server's model key).
+
+        Returns None on failure, and straight away while cooling down from one.
+        """
+        if time.monotonic() < self._retry_at:
+            return None
+        rgb = [np.asarray(im.convert("RGB")) for im in images]
+        body = b"".join(a.tobytes() for a in rgb)
+        sizes = ",".join(f"{a.shape[1]}x{a.shape[0]}" for a in rgb)
+        request = urllib.request.Request(
+            f"{self.url}/detect?conf={conf}",
+            data=body,
+            headers={"Content-Type": "application/octet-stream", "X-Image-Sizes": sizes},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                payload = json.loads(resp.read())
+        except (OSError, ValueError) as exc:
+            self._retry_at = time.monotonic() + self.retry_after
+            logger.warning("inference server at %s failed (%s); using local model for %gs",
+                           self.url, exc, self.retry_after)
+            return None
+        return [tuple(d) for d in payload["detections"]], payload.get("model_key")
+
+    def local_model(self):
+        """Load (once) and return the local fallback model, or None."""
+        with self._local_lock:
+            if self._local is None:
+                self._local = self._local_loader()
+            return self._local
@@ -0,0 +1,199 @@
+"""Shared inference server with dynamic micro-batching.
+
+One process holds the model; every app process (one per annotator session
+host) points INFERENCE_SERVER_URL at it instead of loading its own copy.
+Requests that arrive within a short window are run as one batched forward
+pass, so N annotators pressing Next together cost roughly one inference.
+
+    cd app && python -m backend.inference_server [--port 8765] [--max-batch 8]
+
+Endpoints:
+    GET  /health  → {"status", "model_key", "batches", "images"}
+    POST /detect  raw RGB bytes for one or more images, sizes in the
+                  X-Image-Sizes header ("959x661,959x661"); optional ?conf=
+                  → {"detections": [[xyxy, conf, cls], ...], "model_key"}
+
+The model follows best.pt: when the weights change on disk it is reloaded
+between batches.
+"""
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from PIL import Image
+
+from backend.config import (
+    CONFIDENCE_THRESHOLD, IMG_HEIGHT, IMG_WIDTH, INFERENCE_BATCH_SIZE,
+    INFERENCE_SERVER_BATCH_WINDOW_MS, INFERENCE_SERVER_HOST, INFERENCE_SERVER_PORT,
+    INFERENCE_SERVER_TIMEOUT,
+)
+from backend.inference_cache import model_fingerprint
+from backend.inference_service import load_model_raw, raw_detections
+
+
+class MicroBatcher:
+    """Collects single-image requests and runs them in batched forward passes."""
+
+    def __init__(self, max_batch: int, window_ms: float):
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._model = None
+        self.model_key: str | None = None
+        self.batches = 0
+        self.images = 0
+
+    def load(self) -> bool:
+        """(Re)load best.pt and run one dummy pass; False if no model is available."""
+        model = load_model_raw()
+        if model is None:
+            return False
+        key = model_fingerprint()    # after loading: it names the backend actually used
+        raw_detections(model, [Image.new("RGB", (IMG_WIDTH, IMG_HEIGHT))])
+        self._model, self.model_key = model, key
+        return True
+
+    def start(self) -> None:
+        threading.Thread(target=self._loop, name="micro-batcher", daemon=True).start()
+
+    def submit(self, image: Image.Image, conf: float) -> Future:
+        future: Future = Future()
+        self._queue.put((image, conf, future))
+        return future
+
+    def _collect(self) -> list[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                if model_fingerprint() not in (None, self.model_key):
+                    self.load()
+                # One pass at the loosest threshold, then filter per request.
+                raws = raw_detections(self._model, [b[0] for b in batch], min(b[1] for b in batch))
+            except Exception as exc:
+                for _, _, future in batch:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            for (_, conf, future), (xyxy, scores, classes) in zip(batch, raws):
+                kept = np.asarray(scores) >= conf
+                future.set_result((
+                    np.asarray(xyxy).reshape(-1, 4)[kept].tolist(),
+                    np.asarray(scores)[kept].tolist(),
+                    np.asarray(classes)[kept].tolist(),
+                ))
+
+
+def _decode_images(body: bytes, sizes_header: str) -> list[Image.Image]:
+    """Split a raw RGB request body into images according to X-Image-Sizes."""
+    images, offset = [], 0
+    for size in filter(None, sizes_header.split(",")):
+        w, h = (int(v) for v in size.lower().split("x"))
+        n = w * h * 3
+        if offset + n > len(body):
+            raise ValueError("request body shorter than X-Image-Sizes")
+        pixels = np.frombuffer(body, dtype=np.uint8, count=n, offset=offset).reshape(h, w, 3)
+        images.append(Image.fromarray(pixels, "RGB"))
+        offset += n
+    if not images or offset != len(body):
+        raise ValueError("request body does not match X-Image-Sizes")
+    return images
+
+
+def make_handler(batcher: MicroBatcher):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if urlparse(self.path).path != "/health":
+                self._reply(404, {"error": "not found"})
+                return
+            self._reply(200, {
+                "status": "ready" if batcher.model_key else "loading",
+                "model_key": batcher.model_key,
+                "batches": batcher.batches,
+                "images": batcher.images,
+            })
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/detect":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                images = _decode_images(body, self.headers.get("X-Image-Sizes", ""))
+                conf = float(parse_qs(url.query).get("conf", [CONFIDENCE_THRESHOLD])[0])
+            except ValueError as exc:
+                self._reply(400, {"error": str(exc)})
+                return
+            futures = [batcher.submit(image, conf) for image in images]
+            try:
+                detections = [f.result(timeout=INFERENCE_SERVER_TIMEOUT) for f in futures]
+            except Exception as exc:
+                self._reply(503, {"error": str(exc)})
+                return
+            self._reply(200, {"detections": detections, "model_key": batcher.model_key})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default=INFERENCE_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=INFERENCE_SERVER_PORT)
+    parser.add_argument("--max-batch", type=int, default=INFERENCE_BATCH_SIZE)
+    parser.add_argument("--window-ms", type=float, default=INFERENCE_SERVER_BATCH_WINDOW_MS)
+    args = parser.parse_args()
+
+    batcher = MicroBatcher(args.max_batch, args.window_ms)
+    print("Loading model...")
+    if not batcher.load():
+        print("ERROR: no model available. Train a model first.")
+        sys.exit(1)
+    batcher.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher))
+    server.daemon_threads = True
+    print(f"Serving éo inference on http://{args.host}:{args.port} "
+          f"(batches of ≤{args.max_batch}, {args.window_ms:g} ms window)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
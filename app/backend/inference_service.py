@@ -1,14 +1,90 @@
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
 from PIL import Image
-from backend.config import BEST_MODEL_PATH, CONFIDENCE_THRESHOLD
+from backend.config import (
+    ANNOTATION_CLASS_MAP, BEST_MODEL_PATH, CONFIDENCE_THRESHOLD, INFERENCE_BACKEND,
+    INFERENCE_SERVER_RETRY_AFTER, INFERENCE_SERVER_TIMEOUT, INFERENCE_SERVER_URL,
+    ONNX_IMGSZ, ONNX_INT8_MODEL_PATH, ONNX_MODEL_PATH, ONNX_THREADS,
+)
+from backend.drawing import xyxy_to_yolo
+from backend.inference_client import RemoteDetector
+from backend.onnx_backend import OnnxDetector
+from backend.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Ultralytics predictors are not thread-safe; the background batch job and
+# the script thread share one model, so every forward pass goes through this.
+_predict_lock = threading.Lock()
+
+_ONNX_PROVIDERS = {
+    "onnx": "CPUExecutionProvider",
+    "onnx-int8": "CPUExecutionProvider",
+    "openvino": "OpenVINOExecutionProvider",
+}
+
+# What load_model_raw() last ran INFERENCE_BACKEND on ("torch" after a fallback)
+_loaded_backend = INFERENCE_BACKEND
+
+
+def _is_stale(path: Path, source: Path = BEST_MODEL_PATH) -> bool:
+    """True if a derived model file is missing or older than its source."""
+    return not path.exists() or path.stat().st_mtime_ns < source.stat().st_mtime_ns
+
+
+def export_onnx(imgsz: int = ONNX_IMGSZ) -> Path:
+    """Export best.pt to ONNX (dynamic batch) next to it. Requires ultralytics."""
+    from ultralytics import YOLO
+
+    exported = YOLO(str(BEST_MODEL_PATH)).export(
+        format="onnx", imgsz=imgsz, dynamic=True, simplify=True,
+    )
+    Path(exported).replace(ONNX_MODEL_PATH)
+    return ONNX_MODEL_PATH
+
+
+def quantize_onnx_int8() -> Path:
+    """Write a dynamically INT8-quantized copy of best.onnx. Requires onnxruntime."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
 
+    quantize_dynamic(str(ONNX_MODEL_PATH), str(ONNX_INT8_MODEL_PATH), weight_type=QuantType.QUInt8)
+    return ONNX_INT8_MODEL_PATH
 
-def load_model_raw():
+
+def _onnx_model_path(backend: str) -> Path:
+    """Return the ONNX file for a backend, (re-)exporting from best.pt if stale."""
+    if _is_stale(ONNX_MODEL_PATH):
+        export_onnx()
+    if backend == "onnx-int8":
+        if _is_stale(ONNX_INT8_MODEL_PATH, ONNX_MODEL_PATH):
+            quantize_onnx_int8()
+        return ONNX_INT8_MODEL_PATH
+    return ONNX_MODEL_PATH
+
+
+def load_model_raw(backend: str = INFERENCE_BACKEND):
     """Load the fine-tuned YOLO model (no Streamlit caching).
 
-    Returns the YOLO model instance, or None if not available.
+    With an ONNX backend this returns an OnnxDetector (no torch import);
+    if that backend can't be set up it falls back to the PyTorch model.
+    Returns None if no model is available.
     """
+    global _loaded_backend
     if not BEST_MODEL_PATH.exists():
         return None
+    if backend in _ONNX_PROVIDERS:
+        try:
+            model = OnnxDetector(_onnx_model_path(backend), _ONNX_PROVIDERS[backend], ONNX_THREADS)
+            if backend == INFERENCE_BACKEND:
+                _loaded_backend = backend
+            return model
+        except Exception as exc:
+            logger.warning("%s backend unavailable (%s); using PyTorch", backend, exc)
+            if backend == INFERENCE_BACKEND:
+                _loaded_backend = "torch"
     try:
         from ultralytics import YOLO
         return YOLO(str(BEST_MODEL_PATH))
@@ -16,31 +92,122 @@ def load_model_raw():
         return None
 
 
+def loaded_backend() -> str:
+    """The backend INFERENCE_BACKEND actually runs on in this process.
+
+    "torch" once load_model_raw() had to fall back, so detections from the
+    fallback aren't cached as if the configured backend produced them.
+    """
+    return _loaded_backend
+
+
+def load_detector(server_url: str | None = INFERENCE_SERVER_URL):
+    """Return the model the app should use.
+
+    If an inference server is configured and answering, this is a
+    RemoteDetector (which loads the local model only if the server later
+    becomes unreachable); otherwise the local model from load_model_raw().
+    """
+    if server_url:
+        remote = RemoteDetector(
+            server_url, INFERENCE_SERVER_TIMEOUT, load_model_raw, INFERENCE_SERVER_RETRY_AFTER,
+        )
+        health = remote.health()
+        if health and health.get("status") == "ready":
+            return remote
+        logger.warning("inference server at %s not ready; using local model", server_url)
+    return load_model_raw()
+
+
+def raw_detections(model, images: list[Image.Image], conf: float = CONFIDENCE_THRESHOLD) -> list[tuple]:
+    """Run any supported model; return one (xyxy, conf, cls) triple per image.
+
+    Local models give (N, 4), (N,) and (N,) NumPy arrays; a RemoteDetector
+    gives the same as lists.
+    """
+    return raw_detections_keyed(model, images, conf)[0]
+
+
+@traced("inference.detect")
+def raw_detections_keyed(
+    model, images: list[Image.Image], conf: float = CONFIDENCE_THRESHOLD,
+) -> tuple[list[tuple], str | None]:
+    """Like raw_detections(), plus the model key of the inference server that answered.
+
+    The key is None when a local model produced the detections.
+    """
+    if isinstance(model, RemoteDetector):
+        remote = model.detect(images, conf)
+        if remote is not None:
+            return remote
+        model = model.local_model()
+        if model is None:
+            raise RuntimeError("Inference server unreachable and no local model available")
+    with _predict_lock:
+        if isinstance(model, OnnxDetector):
+            return model.detect(images, conf), None
+        results = model(images, conf=conf, verbose=False)
+        # boxes.data is (N, 6) [x1, y1, x2, y2, conf, cls]: one device-to-host copy per image
+        detections = [r.boxes.data.cpu().numpy() for r in results]
+        return [(d[:, :4], d[:, 4], d[:, 5]) for d in detections], None
+
+
+def _to_boxes(xyxy, confs, classes, img_w: int, img_h: int, class_ids) -> list[dict]:
+    """Convert pixel xyxy detections of the given classes into normalized boxes."""
+    classes = np.asarray(classes).astype(np.int64)
+    keep = np.isin(classes, list(class_ids))
+    yolo = xyxy_to_yolo(np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)[keep], img_w, img_h)
+    confs = np.asarray(confs, dtype=np.float64)[keep]
+    return [
+        {"class_id": cls_id, "cx": cx, "cy": cy, "w": w, "h": h, "confidence": conf}
+        for cls_id, (cx, cy, w, h), conf in zip(classes[keep].tolist(), yolo.tolist(), confs.tolist())
+    ]
+
+
+def detect_landmarks_batch(
+    model, images: list[Image.Image], class_ids=tuple(ANNOTATION_CLASS_MAP),
+) -> list[list[dict]]:
+    """Run one batched forward pass and return CSP and Thalamus detections per image.
+
+    Output order matches ``images``; each entry has the detect_csp schema.
+    A model trained before Thalamus labels existed simply returns no
+    class-1 boxes.
+    """
+    return detect_landmarks_batch_keyed(model, images, class_ids)[0]
+
+
+def detect_landmarks_batch_keyed(
+    model, images: list[Image.Image], class_ids=tuple(ANNOTATION_CLASS_MAP),
+) -> tuple[list[list[dict]], str | None]:
+    """Like detect_landmarks_batch(), plus the server's model key (None if run locally).
+
+    inference_cache uses the key to avoid caching a server's detections
+    under a model the server isn't running.
+    """
+    if not images:
+        return [], None
+    raws, model_key = raw_detections_keyed(model, images)
+    return [
+        _to_boxes(*raw, *image.size, class_ids) for image, raw in zip(images, raws)
+    ], model_key
+
+
+def detect_landmarks(model, image: Image.Image) -> list[dict]:
+    """Run inference and return CSP and Thalamus detections as normalized YOLO boxes."""
+    return detect_landmarks_batch(model, [image])[0]
+
+
 def detect_csp(model, image: Image.Image) -> list[dict]:
     """Run inference and return CSP detections as normalized YOLO boxes.
 
     Each returned dict has keys: class_id, cx, cy, w, h, confidence.
     """
-    results = model(image, conf=CONFIDENCE_THRESHOLD, verbose=False)
-
-    csp_boxes = []
-    if results and len(results) > 0:
-        result = results[0]
-        for det in result.boxes:
-            cls_id = int(det.cls.item())
-            if cls_id != 0:
-                continue
-            conf = float(det.conf.item())
-            x1, y1, x2, y2 = det.xyxy[0].tolist()
-            img_w, img_h = image.size
-            cx = ((x1 + x2) / 2) / img_w
-            cy = ((y1 + y2) / 2) / img_h
-            w = (x2 - x1) / img_w
-            h = (y2 - y1) / img_h
-            csp_boxes.append({
-                "class_id": cls_id,
-                "cx": cx, "cy": cy, "w": w, "h": h,
-                "confidence": conf,
-            })
-
-    return csp_boxes
+    return detect_csp_batch(model, [image])[0]
+
+
+def detect_csp_batch(model, images: list[Image.Image]) -> list[list[dict]]:
+    """Run one batched forward pass and return CSP detections per image.
+
+    Output order matches ``images``; each entry has the detect_csp schema.
+    """
+    return detect_landmarks_batch(model, images, class_ids=(0,))
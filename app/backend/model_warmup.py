@@ -0,0 +1,94 @@
+"""Process-wide model loading on a background thread.
+
+start_warmup() is called when the app process starts. It imports the model
+stack, builds the model and runs one dummy inference (so lazy allocations
+and JIT work happen off the request path). The UI polls warmup_status() and
+only asks for the model once it is "ready"; no request ever blocks on the
+torch/ultralytics import.
+
+The loaded model tracks best.pt: when the weights change on disk (e.g. after
+a training round), get_model() keeps serving the old model while the new
+one warms up, then swaps it in.
+"""
+
+import threading
+
+from PIL import Image
+
+from backend.config import IMG_HEIGHT, IMG_WIDTH
+from backend.inference_cache import model_fingerprint
+from backend.inference_service import detect_csp, load_detector
+
+_lock = threading.Lock()
+_thread: threading.Thread | None = None
+_model = None
+_model_key: str | None = None
+_attempted_key: str | None = None
+# idle → loading → ready | unavailable (no weights) | failed
+_state = {"status": "idle", "error": None}
+
+
+def _warm() -> None:
+    global _model, _model_key
+    try:
+        model = load_detector()
+        if model is None:
+            with _lock:
+                if _model is None:
+                    _state.update(status="unavailable", error=None)
+            return
+        detect_csp(model, Image.new("RGB", (IMG_WIDTH, IMG_HEIGHT)))
+        # Taken after the load: a backend fallback changes the fingerprint
+        key = model_fingerprint()
+        with _lock:
+            _model, _model_key = model, key
+            _state.update(status="ready", error=None)
+    except Exception as exc:
+        with _lock:
+            if _model is None:
+                _state.update(status="failed", error=str(exc))
+
+
+def _start(target_key: str | None) -> None:
+    """Start a (re)load of target_key unless one is running; caller holds _lock."""
+    global _thread, _attempted_key
+    if _thread is not None and _thread.is_alive():
+        return
+    _attempted_key = target_key
+    if _model is None:
+        _state.update(status="loading", error=None)
+    _thread = threading.Thread(target=_warm, name="model-warmup", daemon=True)
+    _thread.start()
+
+
+def start_warmup() -> None:
+    """Start loading the model in the background.
+
+    No-op while a load is running, once ready, or after a failed/unavailable
+    attempt until the weights on disk change.
+    """
+    target_key = model_fingerprint()
+    with _lock:
+        if _state["status"] in ("loading", "ready"):
+            return
+        if _state["status"] in ("unavailable", "failed") and target_key == _attempted_key:
+            return
+        _start(target_key)
+
+
+def warmup_status() -> dict:
+    """Return {"status", "error"}; status is idle, loading, ready, unavailable or failed."""
+    start_warmup()
+    return dict(_state)
+
+
+def get_model():
+    """Return the warm model, or None if it isn't ready (see warmup_status)."""
+    if _state["status"] != "ready":
+        start_warmup()
+        return None
+    current_key = model_fingerprint()
+    with _lock:
+        if current_key not in (None, _model_key, _attempted_key):
+            _start(current_key)
+    return _model
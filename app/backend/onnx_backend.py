@@ -0,0 +1,112 @@
+"""Torch-free YOLOv8 detector running an exported ONNX model on onnxruntime.
+
+Mirrors the ultralytics predict pipeline (letterbox → forward → NMS → scale
+back) in NumPy so CPU-only workstations never import torch. Requires the
+optional ``onnxruntime`` package; with ``onnxruntime-openvino`` installed the
+OpenVINO execution provider can be selected instead of the default CPU one.
+"""
+
+import ast
+
+import numpy as np
+from PIL import Image
+
+_PAD_VALUE = 114
+_IOU_THRESHOLD = 0.7     # ultralytics predict default
+_MAX_DETECTIONS = 300
+_MAX_WH = 7680           # class offset for batched NMS
+
+
+class OnnxDetector:
+    """An onnxruntime session for a YOLOv8 detect model, with YOLO pre/post-processing."""
+
+    def __init__(self, model_path, provider: str = "CPUExecutionProvider", threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        providers = [provider] if provider in ort.get_available_providers() else []
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=providers + ["CPUExecutionProvider"],
+        )
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        _, _, h, w = inp.shape
+        self.imgsz = (h if isinstance(h, int) else 640, w if isinstance(w, int) else 640)
+        self.dynamic_batch = not isinstance(inp.shape[0], int)
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        # ultralytics stores names as a dict literal, e.g. "{0: 'CSP'}"
+        self.names = ast.literal_eval(meta["names"]) if "names" in meta else {}
+
+    def _letterbox(self, image: Image.Image) -> tuple[np.ndarray, float, tuple[float, float]]:
+        """Resize keeping aspect ratio and pad to imgsz, as ultralytics LetterBox does."""
+        th, tw = self.imgsz
+        w, h = image.size
+        r = min(th / h, tw / w)
+        new_w, new_h = round(w * r), round(h * r)
+        dw, dh = (tw - new_w) / 2, (th - new_h) / 2
+        left, top = round(dw - 0.1), round(dh - 0.1)
+        canvas = np.full((th, tw, 3), _PAD_VALUE, dtype=np.uint8)
+        resized = image.convert("RGB").resize((new_w, new_h), Image.BILINEAR)
+        canvas[top:top + new_h, left:left + new_w] = np.asarray(resized)
+        return canvas, r, (left, top)
+
+    @staticmethod
+    def _nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+        """Greedy NMS over xyxy boxes; returns kept indices by descending score."""
+        order = scores.argsort()[::-1]
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        keep = []
+        while order.size and len(keep) < _MAX_DETECTIONS:
+            i = order[0]
+            keep.append(i)
+            rest = order[1:]
+            xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+            yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+            xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+            yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+            inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+            iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+            order = rest[iou <= iou_threshold]
+        return np.asarray(keep, dtype=np.int64)
+
+    def _postprocess(self, pred: np.ndarray, conf: float, ratio: float, pad, size):
+        """Decode one (4 + nc, anchors) prediction into (xyxy, conf, cls) arrays."""
+        pred = pred.T
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        best = scores[np.arange(len(cls)), cls]
+        mask = best > conf
+        pred, cls, best = pred[mask], cls[mask], best[mask]
+        cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+        xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+        keep = self._nms(xyxy + cls[:, None] * _MAX_WH, best, _IOU_THRESHOLD)
+        xyxy, best, cls = xyxy[keep], best[keep], cls[keep]
+
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad[0]) / ratio
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad[1]) / ratio
+        img_w, img_h = size
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, img_w)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, img_h)
+        return xyxy, best, cls
+
+    def detect(self, images: list[Image.Image], conf: float) -> list[tuple]:
+        """Run detection; returns one (xyxy, conf, cls) array triple per image."""
+        prepared = [self._letterbox(im) for im in images]
+        batch = np.stack([p[0] for p in prepared]).transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+        if self.dynamic_batch:
+            preds = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            preds = np.concatenate([
+                self.session.run(None, {self.input_name: batch[i:i + 1]})[0]
+                for i in range(len(batch))
+            ])
+        return [
+            self._postprocess(pred, conf, ratio, pad, image.size)
+            for pred, (_, ratio, pad), image in zip(preds, prepared, images)
+        ]
@@ -1,11 +1,25 @@
+from functools import lru_cache
+
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 from backend.config import (
     ANNOTATION_CLASS_MAP, CLASS_COLORS,
     OVERLAY_FONT_CANDIDATES, OVERLAY_FONT_SIZE,
 )
-from backend.drawing import yolo_to_pixel
+from backend.drawing import yolo_array, yolo_to_pixels
+from backend.tracing import traced
+
+# Geometry at full resolution; scaled with the output when drawing at display size
+_FILL_ALPHA = 30
+_OUTLINE_ALPHA = 220
+_OUTLINE_WIDTH = 2
+_LABEL_ALPHA = 180
+_LABEL_OFFSET = (4, -22)
+_LABEL_PAD = 4
+_LABEL_RADIUS = 4
 
 
+@lru_cache(maxsize=None)
 def _load_font(size: int) -> ImageFont.FreeTypeFont:
     """Try platform font candidates, falling back to Pillow's built-in default."""
     for path in OVERLAY_FONT_CANDIDATES:
@@ -16,47 +30,113 @@ def _load_font(size: int) -> ImageFont.FreeTypeFont:
     return ImageFont.load_default(size=size)
 
 
+@lru_cache(maxsize=256)
+def _label_bitmap(label: str, color: tuple, font_size: int, pad: int, radius: int):
+    """Render a label pill once and return (rgb, alpha, dx, dy).
+
+    rgb is uint16 HxWx3 and alpha uint16 HxWx1 (0-255), ready for blending;
+    (dx, dy) is the pill's offset from the text anchor.
+    """
+    font = _load_font(font_size)
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    bx0, by0, bx1, by1 = probe.textbbox((0, 0), label, font=font)
+    w = bx1 - bx0 + 2 * pad
+    h = by1 - by0 + 2 * pad
+    tile = Image.new("RGBA", (w + 1, h + 1), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(tile)
+    draw.rounded_rectangle([0, 0, w, h], radius=radius, fill=(*color, _LABEL_ALPHA))
+    draw.text((pad, pad), label, fill=(255, 255, 255, 255), font=font)
+    arr = np.asarray(tile, dtype=np.uint16)
+    return arr[..., :3], arr[..., 3:], bx0 - pad, by0 - pad
+
+
+def _blend(dst: np.ndarray, covered: np.ndarray, x0: int, y0: int, x1: int, y1: int,
+           rgb, alpha) -> None:
+    """Alpha-blend a solid colour (or an RGB tile) into dst[y0:y1, x0:x1] in place.
+
+    Shapes are blended topmost first. covered marks pixels a shape above
+    already blended; they are left alone and this shape's pixels are added
+    to it, so each pixel gets only its topmost shape, as when ImageDraw
+    painted every shape into one overlay layer. Tile pixels with zero alpha
+    cover nothing. The region is clipped to dst; tiles are cropped to match.
+    """
+    h, w = dst.shape[:2]
+    cx0, cy0, cx1, cy1 = max(x0, 0), max(y0, 0), min(x1, w), min(y1, h)
+    if cx0 >= cx1 or cy0 >= cy1:
+        return
+    mine = ~covered[cy0:cy1, cx0:cx1]
+    if isinstance(rgb, np.ndarray):
+        rgb = rgb[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]
+        alpha = alpha[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]
+        mine &= alpha[..., 0] > 0
+    region = dst[cy0:cy1, cx0:cx1]
+    blended = (region.astype(np.uint16) * (255 - alpha)
+               + np.asarray(rgb, dtype=np.uint16) * alpha + 127) // 255
+    np.copyto(region, blended, where=mine[..., None], casting="unsafe")
+    covered[cy0:cy1, cx0:cx1] |= mine
+
+
+@traced("overlay.draw")
 def draw_boxes_on_image(
     image: Image.Image,
     boxes: list[dict],
     show_confidence: bool = False,
+    size: tuple[int, int] | None = None,
+    source_size: tuple[int, int] | None = None,
 ) -> Image.Image:
-    """Draw refined bounding boxes with semi-transparent label backgrounds."""
-    img = image.convert("RGBA")
-    overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
+    """Draw refined bounding boxes with semi-transparent label backgrounds.
+
+    All boxes are drawn in one pass and only the pixels they cover are
+    blended; where boxes overlap, the later one covers the earlier. Pass
+    ``size`` to get the result at display size directly: the image is
+    resized first and the overlay drawn at that scale, so the
+    full-resolution composite is never built. When ``image`` is already a
+    downscaled rendition, pass the original's ``source_size`` so labels and
+    outlines come out at the same scale.
+    """
+    img = image.convert("RGB")
+    if size is not None and tuple(size) != img.size:
+        img = img.resize(size)
+    scale = img.size[0] / (source_size or image.size)[0]
     img_w, img_h = img.size
+    canvas = np.array(img)
 
-    font = _load_font(OVERLAY_FONT_SIZE)
+    font_size = max(8, round(OVERLAY_FONT_SIZE * scale))
+    line = max(1, round(_OUTLINE_WIDTH * scale))
+    pad = max(2, round(_LABEL_PAD * scale))
+    radius = max(2, round(_LABEL_RADIUS * scale))
+    off_x, off_y = round(_LABEL_OFFSET[0] * scale), round(_LABEL_OFFSET[1] * scale)
 
-    for box in boxes:
+    # Shapes in drawing order: (x0, y0, x1, y1, rgb, alpha), pixel bounds exclusive
+    shapes = []
+    corners = yolo_to_pixels(yolo_array(boxes), img_w, img_h).tolist()
+    for box, (x1, y1, x2, y2) in zip(boxes, corners):
         cls_id = box["class_id"]
-        r, g, b = CLASS_COLORS.get(cls_id, (255, 255, 255))
-        x1, y1, x2, y2 = yolo_to_pixel(box, img_w, img_h)
+        color = CLASS_COLORS.get(cls_id, (255, 255, 255))
+        # Pixel bounds are inclusive, matching ImageDraw.rectangle
+        x2 += 1
+        y2 += 1
 
-        # Semi-transparent fill
-        draw.rectangle([x1, y1, x2, y2], fill=(r, g, b, 30))
-        # Thin outline
-        draw.rectangle([x1, y1, x2, y2], outline=(r, g, b, 220), width=2)
+        # Semi-transparent fill inside the outline
+        shapes.append((x1 + line, y1 + line, x2 - line, y2 - line, color, _FILL_ALPHA))
+        # Thin outline — four strips so corners are blended once
+        shapes.append((x1, y1, x2, y1 + line, color, _OUTLINE_ALPHA))
+        shapes.append((x1, y2 - line, x2, y2, color, _OUTLINE_ALPHA))
+        shapes.append((x1, y1 + line, x1 + line, y2 - line, color, _OUTLINE_ALPHA))
+        shapes.append((x2 - line, y1 + line, x2, y2 - line, color, _OUTLINE_ALPHA))
 
-        # Label text
+        # Label pill (cached bitmap per label/colour/size)
         label = ANNOTATION_CLASS_MAP.get(cls_id, f"cls_{cls_id}")
         if show_confidence and "confidence" in box:
             label += f"  {box['confidence']:.0%}"
+        rgb, alpha, dx, dy = _label_bitmap(label, color, font_size, pad, radius)
+        lx0 = x1 + off_x + dx
+        ly0 = y1 + off_y + dy
+        shapes.append((lx0, ly0, lx0 + rgb.shape[1], ly0 + rgb.shape[0], rgb, alpha))
+
+    # Topmost (last drawn) first; see _blend()
+    covered = np.zeros(canvas.shape[:2], dtype=bool)
+    for x0, y0, x1, y1, rgb, alpha in reversed(shapes):
+        _blend(canvas, covered, x0, y0, x1, y1, rgb, alpha)
 
-        # Label background — semi-transparent rounded rectangle
-        bbox = draw.textbbox((x1 + 4, y1 - 22), label, font=font)
-        pad = 4
-        lx0 = bbox[0] - pad
-        ly0 = bbox[1] - pad
-        lx1 = bbox[2] + pad
-        ly1 = bbox[3] + pad
-        draw.rounded_rectangle(
-            [lx0, ly0, lx1, ly1],
-            radius=4,
-            fill=(r, g, b, 180),
-        )
-        draw.text((bbox[0], bbox[1]), label, fill=(255, 255, 255, 255), font=font)
-
-    composited = Image.alpha_composite(img, overlay)
-    return composited.convert("RGB")
+    return Image.fromarray(canvas, "RGB")
@@ -0,0 +1,87 @@
+"""Process-wide, content-addressed cache of encoded canvas payloads.
+
+Every Streamlit session in the process shares this cache, so N annotators
+browsing the same dataset hold one encoded copy of each display image and
+pay the encode once. Keys describe the content, not the session:
+(image hash, display size, overlay boxes). Eviction is LRU and bounded by
+the total payload size in bytes (PAYLOAD_CACHE_MAX_BYTES).
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
+
+from PIL import Image
+
+from backend.config import PAYLOAD_CACHE_MAX_BYTES
+
+_lock = threading.Lock()
+_entries: OrderedDict[tuple, str] = OrderedDict()
+_in_flight: dict[tuple, Future] = {}
+_total_bytes = 0
+_stats = {"hits": 0, "misses": 0}
+
+
+def pixel_digest(image: Image.Image) -> str:
+    """Return a content hash of an in-memory image's pixels."""
+    h = hashlib.sha1(image.mode.encode())
+    h.update(repr(image.size).encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def payload_key(image_hash: str, size: tuple[int, int], overlay: tuple = ()) -> tuple:
+    """Build a cache key from an image hash, display size and overlay boxes key."""
+    return (image_hash, tuple(size), overlay)
+
+
+def _insert(key: tuple, payload: str) -> None:
+    global _total_bytes
+    _entries[key] = payload
+    _total_bytes += len(payload)
+    while _total_bytes > PAYLOAD_CACHE_MAX_BYTES and len(_entries) > 1:
+        _, evicted = _entries.popitem(last=False)
+        _total_bytes -= len(evicted)
+
+
+def get_or_encode(key: tuple, encode: Callable[[], str]) -> str:
+    """Return the payload for key, calling encode() at most once per key.
+
+    Concurrent callers for the same key wait on the first encode rather
+    than repeating it.
+    """
+    with _lock:
+        payload = _entries.get(key)
+        if payload is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return payload
+        fut = _in_flight.get(key)
+        owner = fut is None
+        if owner:
+            fut = Future()
+            _in_flight[key] = fut
+            _stats["misses"] += 1
+    if not owner:
+        return fut.result()
+
+    try:
+        payload = encode()
+    except Exception as exc:
+        with _lock:
+            del _in_flight[key]
+        fut.set_exception(exc)
+        raise
+    with _lock:
+        _insert(key, payload)
+        del _in_flight[key]
+    fut.set_result(payload)
+    return payload
+
+
+def stats() -> dict:
+    """Return entry count, total bytes, hits and misses."""
+    with _lock:
+        return {"entries": len(_entries), "bytes": _total_bytes, **_stats}
@@ -0,0 +1,146 @@
+"""Look-ahead preparation of canvas frames on a background thread pool.
+
+A "frame" is everything the canvas needs for one image: the display-sized
+rendition with overlay boxes drawn in, and its encoded canvas payload (see
+backend.canvas_media). The rendition comes pre-scaled from
+backend.renditions, so building a frame never decodes or resizes the
+full-resolution source. While the annotator works on image N, the next
+PREFETCH_AHEAD frames are prepared (and, in Mode B, the images run through
+the model) so that clicking Next is a cache hit.
+
+Both caches are bounded LRUs of futures keyed by file path/mtime, so memory
+stays fixed and a frame that is still being prepared is simply awaited.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from PIL import Image
+
+from backend.config import PREFETCH_CACHE_SIZE, PREFETCH_WORKERS
+from backend.canvas_media import build_payload
+from backend.image_service import image_digest, load_image
+from backend.overlay import draw_boxes_on_image
+from backend.payload_cache import payload_key
+from backend.renditions import load_rendition, source_size
+from backend.tracing import traced
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_lock = threading.Lock()
+_images: OrderedDict[tuple, Future] = OrderedDict()
+_frames: OrderedDict[tuple, Future] = OrderedDict()
+
+
+def boxes_key(boxes: list[dict]) -> tuple:
+    """Return a hashable, order-preserving key for a list of overlay boxes."""
+    return tuple(
+        (b["class_id"], round(b["cx"], 6), round(b["cy"], 6),
+         round(b["w"], 6), round(b["h"], 6),
+         round(b["confidence"], 4) if "confidence" in b else None)
+        for b in boxes
+    )
+
+
+def _file_key(path: Path) -> tuple:
+    st = path.stat()
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+def _cached(cache: OrderedDict, key: tuple, build: Callable, *args):
+    """Return the LRU entry for key, building it on the calling thread if absent."""
+    with _lock:
+        fut = cache.get(key)
+        if fut is not None:
+            cache.move_to_end(key)
+            owner = False
+        else:
+            fut = Future()
+            cache[key] = fut
+            while len(cache) > PREFETCH_CACHE_SIZE:
+                cache.popitem(last=False)
+            owner = True
+    if owner:
+        try:
+            fut.set_result(build(*args))
+        except Exception as exc:
+            fut.set_exception(exc)
+    try:
+        return fut.result()
+    except Exception:
+        # Never keep failures around — a fixed file should load next time.
+        with _lock:
+            if cache.get(key) is fut:
+                del cache[key]
+        raise
+
+
+@traced("frame.image")
+def get_image(path: Path) -> Image.Image:
+    """Return the decoded RGB image, from the prefetch cache when available.
+
+    Raises ValueError (from load_image) if the image is unreadable.
+    """
+    try:
+        key = _file_key(path)
+    except OSError as exc:
+        raise ValueError(f"Cannot open image {path.name}: {exc}") from exc
+    return _cached(_images, key, load_image, path)
+
+
+def _get_display(path: Path) -> Image.Image:
+    """Return the display rendition, from the prefetch cache when available."""
+    return _cached(_images, (*_file_key(path), "display"), load_rendition, path)
+
+
+def _build_frame(path: Path, boxes: list[dict]) -> dict:
+    display = _get_display(path)
+    width, height = display.size
+    if boxes:
+        display = draw_boxes_on_image(display, boxes, show_confidence=True,
+                                      source_size=source_size(path))
+    # The encoded payload lives in the process-wide cache; the frame only
+    # references it, so sessions preparing the same image share one copy.
+    key = payload_key(image_digest(path), (width, height), boxes_key(boxes))
+    return {
+        "display": display,
+        "payload": build_payload(key, lambda: display),
+        "width": width,
+        "height": height,
+    }
+
+
+@traced("frame.get")
+def get_frame(path: Path, boxes: list[dict]) -> dict:
+    """Return the prepared canvas frame for an image with the given overlay.
+
+    Keys: display, payload, width, height.
+    Boxes carrying a "confidence" key are labelled with it.
+    Raises ValueError if the image is unreadable.
+    """
+    try:
+        key = (*_file_key(path), boxes_key(boxes))
+    except OSError as exc:
+        raise ValueError(f"Cannot open image {path.name}: {exc}") from exc
+    return _cached(_frames, key, _build_frame, path, boxes)
+
+
+def _prefetch_one(path: Path, boxes_fn: Callable[[Path], list[dict]]) -> None:
+    try:
+        get_frame(path, boxes_fn(path))
+    except Exception:
+        # Prefetch is best effort; the foreground path reports real errors.
+        pass
+
+
+def prefetch(window: list[Path], boxes_fn: Callable[[Path], list[dict]]) -> None:
+    """Queue frame preparation for the images the user is likely to open next.
+
+    window is typically work_queue.neighbours(queue, idx, PREFETCH_AHEAD).
+    boxes_fn(path) returns the overlay boxes for an image; it runs on a
+    worker thread, so Mode B can do its inference there too.
+    """
+    for path in window:
+        _executor.submit(_prefetch_one, path, boxes_fn)
@@ -0,0 +1,131 @@
+"""Pre-scaled renditions of the source images (a derived-asset store).
+
+Two tiers are kept per image under RENDITIONS_DIR/<tier>/:
+
+- "display": the canvas rendition, CANVAS_MAX_WIDTH wide (the same resize
+  the canvas did on every rerun), stored lossless (RENDITION_DISPLAY_FORMAT);
+- "thumb":   a THUMBNAIL_WIDTH-wide JPEG tile for galleries.
+
+File names carry the source's mtime and size (<stem>-<mtime_ns>-<size>),
+so an edited or replaced source simply misses and is re-rendered; the old
+files are removed when the new ones are written. A miss renders every tier
+from a single decode and writes them atomically, so any process can fill
+the store. data/build_renditions.py fills it up front.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+from backend.config import (
+    CANVAS_MAX_WIDTH, RENDITION_DISPLAY_FORMAT, RENDITIONS_DIR, THUMBNAIL_WIDTH,
+)
+from backend.image_service import canvas_size, load_image
+from backend.tracing import span
+
+# tier → (max width, format, save options)
+TIERS = {
+    "display": (CANVAS_MAX_WIDTH, RENDITION_DISPLAY_FORMAT, {}),
+    "thumb": (THUMBNAIL_WIDTH, "JPEG", {"quality": 85}),
+}
+
+
+def _source_key(path: Path) -> str:
+    st = path.stat()
+    return f"{path.stem}-{st.st_mtime_ns}-{st.st_size}"
+
+
+def rendition_path(path: Path, tier: str) -> Path:
+    """Where the current rendition of path for tier lives (it may not exist yet)."""
+    return RENDITIONS_DIR / tier / f"{_source_key(path)}.{TIERS[tier][1].lower()}"
+
+
+def _is_rendition_of(name: str, stem: str) -> bool:
+    return name.rsplit("-", 2)[0] == stem
+
+
+def render(image: Image.Image, tier: str) -> Image.Image:
+    """Scale a decoded source image down to the tier's width."""
+    size = canvas_size(*image.size, max_width=TIERS[tier][0])
+    return image if size == image.size else image.resize(size)
+
+
+def _write(target: Path, rendition: Image.Image, tier: str) -> None:
+    _, fmt, options = TIERS[tier]
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    rendition.save(tmp, format=fmt, **options)
+    os.replace(tmp, target)
+    stem = target.stem.rsplit("-", 2)[0]
+    for old in target.parent.glob(f"{stem}-*"):
+        if old != target and _is_rendition_of(old.stem, stem):
+            old.unlink(missing_ok=True)
+
+
+def ensure_renditions(path: Path, image: Image.Image | None = None) -> dict[str, Image.Image]:
+    """Render and store every missing tier of path.
+
+    Returns tier → rendition for the tiers that were rendered (the source is
+    decoded at most once, and only if something was missing).
+    Raises ValueError if the source is unreadable.
+    """
+    rendered = {}
+    for tier in TIERS:
+        target = rendition_path(path, tier)
+        if target.exists():
+            continue
+        if image is None:
+            image = load_image(path)
+        rendered[tier] = render(image, tier)
+        _write(target, rendered[tier], tier)
+    return rendered
+
+
+def load_rendition(path: Path, tier: str = "display") -> Image.Image:
+    """Return the tier's rendition of path as RGB, rendering it on a miss.
+
+    Raises ValueError if the source is unreadable.
+    """
+    target = rendition_path(path, tier)
+    try:
+        with span("rendition.load"):
+            return Image.open(target).convert("RGB")
+    except FileNotFoundError:
+        pass
+    except OSError:
+        target.unlink(missing_ok=True)    # torn or corrupt; re-render below
+    with span("rendition.render"):
+        rendered = ensure_renditions(path)
+    if tier in rendered:
+        return rendered[tier]
+    # Another process wrote it in the meantime
+    return Image.open(target).convert("RGB")
+
+
+def source_size(path: Path) -> tuple[int, int]:
+    """Full-resolution (width, height) of the source, read from its header."""
+    try:
+        with Image.open(path) as im:
+            return im.size
+    except Exception as exc:
+        raise ValueError(f"Cannot open image {path.name}: {exc}") from exc
+
+
+def prune(paths: list[Path]) -> int:
+    """Delete renditions that don't belong to the current version of any path."""
+    keep = set()
+    for path in paths:
+        try:
+            keep.update(rendition_path(path, tier).name for tier in TIERS)
+        except OSError:
+            continue
+    removed = 0
+    for tier in TIERS:
+        for f in (RENDITIONS_DIR / tier).glob("*"):
+            # Dotfiles are another writer's in-flight temp files
+            if f.name not in keep and not f.name.startswith("."):
+                f.unlink(missing_ok=True)
+                removed += 1
+    return removed
@@ -0,0 +1,173 @@
+"""Timing spans for the rerun hot path.
+
+    from backend.tracing import span, traced
+
+    with span("image.decode"):
+        ...
+
+    @traced("overlay.draw")
+    def draw_boxes_on_image(...): ...
+
+Tracing is off unless TRACING_ENABLED is set or an admin turns it on from
+the sidebar panel (?admin=1). While off, span() returns one shared no-op
+context manager, so instrumented code pays a function call and a flag
+check. While on, each span's duration goes into a bounded per-name window
+(for p50/p95) and cumulative count/sum totals (for Prometheus). Each span
+is also appended to TRACE_JSONL_PATH when that is set.
+
+Spans are process-wide: they aggregate across sessions and include the
+prefetch and batch-inference threads.
+"""
+
+import cProfile
+import contextlib
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+from collections import deque
+
+from backend.config import TRACE_JSONL_PATH, TRACE_WINDOW, TRACING_ENABLED
+
+_enabled = TRACING_ENABLED
+_lock = threading.Lock()
+_windows: dict[str, deque] = {}
+_totals: dict[str, list] = {}     # name → [count, sum_seconds]
+_NOOP = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def _record(name: str, seconds: float) -> None:
+    with _lock:
+        window = _windows.get(name)
+        if window is None:
+            window = _windows[name] = deque(maxlen=TRACE_WINDOW)
+            _totals[name] = [0, 0.0]
+        window.append(seconds)
+        totals = _totals[name]
+        totals[0] += 1
+        totals[1] += seconds
+    if TRACE_JSONL_PATH is not None:
+        line = json.dumps({
+            "ts": round(time.time(), 3), "span": name, "ms": round(seconds * 1000, 3),
+            "thread": threading.current_thread().name,
+        })
+        with _lock, open(TRACE_JSONL_PATH, "a") as f:
+            f.write(line + "\n")
+
+
+def span(name: str):
+    """Context manager timing the enclosed block under `name` (no-op when disabled)."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name)
+
+
+def traced(name: str):
+    """Decorator form of span() for a whole function."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enabled() -> bool:
+    """Return True if spans are being recorded."""
+    return _enabled
+
+
+def set_enabled(on: bool) -> None:
+    """Turn span recording on or off for the whole process."""
+    global _enabled
+    _enabled = on
+
+
+def reset() -> None:
+    """Forget all recorded spans."""
+    with _lock:
+        _windows.clear()
+        _totals.clear()
+
+
+def _quantile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def stats() -> list[dict]:
+    """Per-span summary over the recent window, slowest p95 first."""
+    with _lock:
+        snapshot = {name: sorted(window) for name, window in _windows.items()}
+        totals = {name: list(t) for name, t in _totals.items()}
+    rows = [
+        {
+            "span": name,
+            "count": totals[name][0],
+            "p50_ms": round(_quantile(values, 0.50) * 1000, 2),
+            "p95_ms": round(_quantile(values, 0.95) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+            "total_s": round(totals[name][1], 3),
+        }
+        for name, values in snapshot.items() if values
+    ]
+    return sorted(rows, key=lambda r: -r["p95_ms"])
+
+
+def export_jsonl() -> str:
+    """The current stats() summary, one JSON object per line."""
+    stamp = round(time.time(), 3)
+    return "".join(json.dumps({"ts": stamp, **row}) + "\n" for row in stats())
+
+
+def export_prometheus() -> str:
+    """The current spans in Prometheus text exposition format (a summary metric)."""
+    lines = [
+        "# HELP eo_span_seconds Duration of instrumented hot-path spans.",
+        "# TYPE eo_span_seconds summary",
+    ]
+    with _lock:
+        snapshot = {name: sorted(window) for name, window in _windows.items()}
+        totals = {name: list(t) for name, t in _totals.items()}
+    for name, values in sorted(snapshot.items()):
+        if not values:
+            continue
+        for q in (0.5, 0.95):
+            lines.append(f'eo_span_seconds{{span="{name}",quantile="{q}"}} {_quantile(values, q):.6f}')
+        lines.append(f'eo_span_seconds_sum{{span="{name}"}} {totals[name][1]:.6f}')
+        lines.append(f'eo_span_seconds_count{{span="{name}"}} {totals[name][0]}')
+    return "\n".join(lines) + "\n"
+
+
+def start_profile() -> cProfile.Profile:
+    """Start a cProfile run on the calling thread (e.g. for one rerun)."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profile(profiler: cProfile.Profile, limit: int = 40) -> str:
+    """Stop the profiler and return the top entries by cumulative time."""
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
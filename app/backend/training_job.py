@@ -0,0 +1,216 @@
+"""Background fine-tuning rounds, triggered from the review loop.
+
+maybe_start_finetune(count) is called after each save. Once
+TRAINING_THRESHOLD new reviews have accumulated since the last round, it
+spawns ``python -m backend.training_job`` as a detached process, which:
+
+1. exports cold-start annotations into the dataset (data/export_cold_start.py),
+2. fine-tunes from the current best.pt on the training images reviewed since
+   the last successful round (validating on the full val split) — or, for
+   the very first model, trains from yolov8n.pt on the whole dataset,
+3. atomically replaces best.pt.
+
+Running apps pick up the new weights by themselves: model_warmup hot-reloads
+when best.pt's fingerprint changes and the inference cache is keyed on it.
+If the process dies mid-round, the next trigger resumes the run from its
+last.pt checkpoint. Job state lives in TRAINING_JOB_PATH so every app
+process sees the same round; updates to it hold an flock on a lock file
+beside it, so two processes can't both start a round.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from backend import annotation_index
+from backend.config import (
+    APP_DIR, BEST_MODEL_PATH, DATASET_DIR, MODEL_DIR, ANNOTATION_CLASS_MAP,
+    FINETUNE_EPOCHS, FINETUNE_PROFILE, TRAINING_JOB_PATH, TRAINING_LOG_PATH, TRAINING_THRESHOLD,
+)
+
+_lock = threading.Lock()
+_DEFAULT_STATE = {"status": "idle", "trained_count": 0, "watermark_ns": 0}
+
+
+def _read_state() -> dict:
+    try:
+        return {**_DEFAULT_STATE, **json.loads(TRAINING_JOB_PATH.read_text())}
+    except (OSError, ValueError):
+        return dict(_DEFAULT_STATE)
+
+
+def _write_state(state: dict) -> None:
+    tmp = TRAINING_JOB_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, TRAINING_JOB_PATH)
+
+
+@contextmanager
+def _locked():
+    """Hold the job state for a read-modify-write, across threads and processes."""
+    with _lock, open(TRAINING_JOB_PATH.with_suffix(".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _alive(pid: int | None) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def training_status() -> dict:
+    """Return the job state; status is idle, running, interrupted, succeeded, failed or skipped."""
+    state = _read_state()
+    if state["status"] == "running" and not _alive(state.get("pid")):
+        state["status"] = "interrupted"
+    return state
+
+
+def _spawn(args: list[str]) -> int:
+    log = open(TRAINING_LOG_PATH, "ab")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "backend.training_job", *args],
+        cwd=APP_DIR, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    log.close()
+    return proc.pid
+
+
+def maybe_start_finetune(count: int) -> bool:
+    """Start (or resume) a fine-tuning round if one is due; True if one was started.
+
+    A round is due when `count` reviews exceed the last trained count by
+    TRAINING_THRESHOLD. After a failed round, the next attempt waits for
+    another TRAINING_THRESHOLD reviews. If `count` drops below those counts
+    (reviews were reset), they are lowered to it.
+    """
+    with _locked():
+        state = training_status()
+        if state["status"] == "running":
+            return False
+        if state["status"] == "interrupted":
+            args = ["--count", str(state["attempt_count"]), "--run", state["run"]]
+            if (MODEL_DIR / "runs" / state["run"] / "weights" / "last.pt").exists():
+                args.append("--resume")
+        else:
+            baseline = state.get("attempt_count", 0) if state["status"] == "failed" else state["trained_count"]
+            if count < baseline:
+                # Otherwise nothing would start until count got back past the old baseline
+                state["trained_count"] = min(state["trained_count"], count)
+                if "attempt_count" in state:
+                    state["attempt_count"] = min(state["attempt_count"], count)
+                _write_state(state)
+                return False
+            if count - baseline < TRAINING_THRESHOLD:
+                return False
+            run = time.strftime("round-%Y%m%d-%H%M%S")
+            args = ["--count", str(count), "--run", run]
+            state.update(run=run, attempt_count=count, started=time.time(), error=None)
+        state.update(status="running", pid=_spawn(args))
+        _write_state(state)
+        return True
+
+
+# ── Job process ───────────────────────────────────────────────────────
+
+def _new_train_images(watermark_ns: int) -> tuple[list[str], int]:
+    """Training-split images whose (effective) annotation changed after watermark_ns."""
+    images, newest = [], watermark_ns
+    for stem, (_, mtime_ns) in annotation_index.effective().items():
+        if mtime_ns <= watermark_ns:
+            continue
+        newest = max(newest, mtime_ns)
+        image = DATASET_DIR / "images" / "train" / f"{stem}.png"
+        if image.exists():
+            images.append(str(image))
+    return sorted(images), newest
+
+
+def _write_round_yaml(run: str, images: list[str]):
+    """Dataset yaml whose train set is just this round's images."""
+    runs_dir = MODEL_DIR / "runs"
+    runs_dir.mkdir(parents=True, exist_ok=True)
+    train_list = runs_dir / f"{run}-train.txt"
+    train_list.write_text("\n".join(images) + "\n")
+    names_block = "\n".join(f"  {cls_id}: {name}" for cls_id, name in sorted(ANNOTATION_CLASS_MAP.items()))
+    yaml_path = runs_dir / f"{run}.yaml"
+    yaml_path.write_text(f"""path: {DATASET_DIR.resolve()}
+train: {train_list}
+val: images/val
+
+names:
+{names_block}
+""")
+    return yaml_path
+
+
+def _run_round(args, state: dict) -> dict:
+    from data.export_cold_start import export_cold_start
+    from models.train_model import install_weights, train
+
+    if args.resume:
+        best = train(None, name=args.run, resume=True)
+    else:
+        export_cold_start()
+        if BEST_MODEL_PATH.exists():
+            images, watermark_ns = _new_train_images(state["watermark_ns"])
+            if not images:
+                return {"status": "skipped", "trained_count": args.count}
+            data_yaml = _write_round_yaml(args.run, images)
+            weights, epochs = str(BEST_MODEL_PATH), FINETUNE_EPOCHS
+            print(f"Fine-tuning {args.run} on {len(images)} new images")
+        else:
+            _, watermark_ns = _new_train_images(0)
+            data_yaml, weights, epochs = DATASET_DIR / "dataset.yaml", "yolov8n.pt", None
+            print(f"Training {args.run} from {weights} on the full dataset")
+        # Remembered so a resumed run advances the watermark too
+        with _locked():
+            _write_state({**_read_state(), "round_watermark_ns": watermark_ns})
+        best = train(data_yaml, weights=weights, name=args.run,
+                     profile=FINETUNE_PROFILE, epochs=epochs)
+
+    if best is None:
+        raise RuntimeError("training produced no best.pt")
+    install_weights(best)
+    return {
+        "status": "succeeded",
+        "trained_count": args.count,
+        "watermark_ns": _read_state().get("round_watermark_ns", state["watermark_ns"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one background fine-tuning round.")
+    parser.add_argument("--count", type=int, required=True, help="reviews at trigger time")
+    parser.add_argument("--run", required=True)
+    parser.add_argument("--resume", action="store_true")
+    args = parser.parse_args()
+
+    print(f"=== {time.strftime('%Y-%m-%d %H:%M:%S')} {args.run}"
+          f"{' (resuming)' if args.resume else ''} ===", flush=True)
+    try:
+        result = _run_round(args, _read_state())
+    except Exception as exc:
+        print(f"ERROR: {exc}")
+        result = {"status": "failed", "error": str(exc)}
+    with _locked():
+        _write_state({**_read_state(), **result, "finished": time.time()})
+    print(f"=== {args.run}: {result['status']} ===")
+
+
+if __name__ == "__main__":
+    main()
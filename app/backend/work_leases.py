@@ -0,0 +1,117 @@
+"""Lease-based work claiming, so several reviewers pull disjoint batches.
+
+claim() hands an annotator up to LEASE_BATCH_SIZE images that nobody has
+reviewed and nobody else holds. Leases expire after LEASE_TTL seconds, so
+a reviewer who walks away doesn't block their batch forever. Claiming again
+renews the annotator's unfinished leases, drops the ones they have
+finished and tops the batch up.
+
+Each claim is one short SQLite write transaction (BEGIN IMMEDIATE), which
+is what keeps batches disjoint across sessions and processes. The walk for
+free images starts at image_catalog.first_unannotated(), so its cost
+depends on the batch size and the number of held leases, not on how much
+of the corpus is already done.
+"""
+
+import sqlite3
+import threading
+import time
+
+from backend import annotation_index, image_catalog
+from backend.config import LEASE_BATCH_SIZE, LEASE_PATH, LEASE_TTL
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    stem       TEXT PRIMARY KEY,
+    annotator  TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leases_annotator ON leases (annotator);
+"""
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(
+            LEASE_PATH, check_same_thread=False, isolation_level=None, timeout=30,
+        )
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+
+def _in_catalog_order(stems) -> list[str]:
+    positions = {stem: image_catalog.index_of(stem) for stem in stems}
+    return sorted((s for s in stems if positions[s] is not None), key=positions.get)
+
+
+def claim(annotator: str, n: int = LEASE_BATCH_SIZE, ttl: float = LEASE_TTL) -> list[str]:
+    """Lease up to n unreviewed images to annotator; returns their whole batch in catalog order."""
+    with _lock:
+        conn = _db()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+            held = dict(conn.execute("SELECT stem, annotator FROM leases"))
+            mine = [stem for stem, owner in held.items() if owner == annotator]
+            done = [stem for stem in mine if annotation_index.contains(stem)]
+            conn.executemany("DELETE FROM leases WHERE stem = ?", [(stem,) for stem in done])
+            conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE annotator = ?", (now + ttl, annotator),
+            )
+            batch = [stem for stem in mine if stem not in done]
+
+            _, stems = image_catalog.snapshot()
+            i = image_catalog.first_unannotated()
+            i = len(stems) if i is None else i
+            new = []
+            while len(batch) + len(new) < n and i < len(stems):
+                i = annotation_index.first_missing(stems, i)
+                if i < len(stems) and stems[i] not in held:
+                    new.append(stems[i])
+                i += 1
+            conn.executemany(
+                "INSERT INTO leases VALUES (?, ?, ?)",
+                [(stem, annotator, now + ttl) for stem in new],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return _in_catalog_order(batch + new)
+
+
+def mine(annotator: str) -> list[str]:
+    """Stems currently leased to annotator, in catalog order."""
+    with _lock:
+        rows = _db().execute(
+            "SELECT stem FROM leases WHERE annotator = ? AND expires_at > ?",
+            (annotator, time.time()),
+        ).fetchall()
+    return _in_catalog_order([stem for (stem,) in rows])
+
+
+def holder(stem: str) -> str | None:
+    """Annotator currently holding a lease on stem, or None."""
+    with _lock:
+        row = _db().execute(
+            "SELECT annotator FROM leases WHERE stem = ? AND expires_at > ?", (stem, time.time()),
+        ).fetchone()
+    return row[0] if row else None
+
+
+def release(stem: str, annotator: str) -> None:
+    """Give up annotator's lease on stem (no-op if they don't hold it)."""
+    with _lock:
+        _db().execute("DELETE FROM leases WHERE stem = ? AND annotator = ?", (stem, annotator))
+
+
+def release_all(annotator: str) -> None:
+    """Give up every lease annotator holds."""
+    with _lock:
+        _db().execute("DELETE FROM leases WHERE annotator = ?", (annotator,))
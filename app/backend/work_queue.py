@@ -0,0 +1,141 @@
+"""Filtered work queues over the image catalog.
+
+A queue is the sorted list of catalog positions that match a filter. The
+lists are rebuilt only when one of their inputs changes: the catalog
+listing, the annotation index or the inference cache. A rebuild is one
+pass over mappings those modules already hold in memory. Moving through a
+queue is then a bisect, O(log N), instead of stepping image by image
+through cases that are already done.
+
+Queues are per annotator. "Reviewed by others" holds images someone else
+has saved but the annotator hasn't, and "My batch" holds the images
+leased to the annotator (see backend.work_leases). The other queues
+reflect the team's effective annotations (see backend.annotation_index).
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from backend import annotation_index, image_catalog, inference_cache, work_leases
+from backend.config import DEFAULT_ANNOTATOR, QUEUE_LOW_CONFIDENCE
+
+# queue key → label shown in the sidebar
+QUEUES = {
+    "all": "All images",
+    "unreviewed": "Unreviewed",
+    "low_confidence": "Low-confidence proposals",
+    "csp_found": "CSP found",
+    "no_csp": "No CSP",
+    "others": "Reviewed by others",
+    "my_batch": "My batch",
+}
+
+_lock = threading.Lock()
+# annotator → (basis, queue lists) for the queues derived from the index
+_cache: dict[str, tuple[tuple, dict[str, list[int]]]] = {}
+
+
+def _build(
+    stems: list[str],
+    reviewed: dict[str, tuple[bool, frozenset[str]]],
+    confidences: dict[str, float],
+    annotator: str,
+) -> dict:
+    members = {key: [] for key in QUEUES if key != "my_batch"}
+    for i, stem in enumerate(stems):
+        members["all"].append(i)
+        csp_found, annotators = reviewed.get(stem, (None, frozenset()))
+        if annotators and annotator not in annotators:
+            members["others"].append(i)
+        if csp_found is None:
+            members["unreviewed"].append(i)
+            # Unreviewed images whose best CSP proposal is weak. Proposals
+            # under CONFIDENCE_THRESHOLD are never cached (0.0 = none), so
+            # this is CONFIDENCE_THRESHOLD <= conf < QUEUE_LOW_CONFIDENCE.
+            if 0.0 < confidences.get(stem, 0.0) < QUEUE_LOW_CONFIDENCE:
+                members["low_confidence"].append(i)
+        elif csp_found:
+            members["csp_found"].append(i)
+        else:
+            members["no_csp"].append(i)
+    return members
+
+
+def _current(annotator: str) -> dict[str, list[int]]:
+    """Return the annotator's queue lists, rebuilding them if any input changed."""
+    with _lock:
+        listing, stems = image_catalog.snapshot()
+        basis = (listing, annotation_index.generation(), inference_cache.proposals_version())
+        cached = _cache.get(annotator)
+        if cached is None or cached[0] != basis:
+            generation, reviewed = annotation_index.snapshot()
+            proposals, confidences = inference_cache.proposal_confidences()
+            # Versions of what was actually read; a change in between rebuilds again
+            cached = _cache[annotator] = (
+                (listing, generation, proposals),
+                _build(stems, reviewed, confidences, annotator),
+            )
+        return cached[1]
+
+
+def _batch(annotator: str) -> list[int]:
+    """Catalog positions of the annotator's leased images (leases change too often to cache)."""
+    positions = (image_catalog.index_of(stem) for stem in work_leases.mine(annotator))
+    return sorted(p for p in positions if p is not None)
+
+
+def members(queue: str, annotator: str = DEFAULT_ANNOTATOR) -> list[int]:
+    """Sorted catalog positions in the queue (shared list: don't mutate it)."""
+    if queue == "my_batch":
+        return _batch(annotator)
+    return _current(annotator)[queue]
+
+
+def sizes(annotator: str = DEFAULT_ANNOTATOR) -> dict[str, int]:
+    """Number of images in each queue."""
+    result = {key: len(positions) for key, positions in _current(annotator).items()}
+    result["my_batch"] = len(_batch(annotator))
+    return result
+
+
+def next_in(queue: str, idx: int, annotator: str = DEFAULT_ANNOTATOR) -> int | None:
+    """The first position in the queue after idx, or None."""
+    positions = members(queue, annotator)
+    i = bisect_right(positions, idx)
+    return positions[i] if i < len(positions) else None
+
+
+def prev_in(queue: str, idx: int, annotator: str = DEFAULT_ANNOTATOR) -> int | None:
+    """The last position in the queue before idx, or None."""
+    positions = members(queue, annotator)
+    i = bisect_left(positions, idx)
+    return positions[i - 1] if i > 0 else None
+
+
+def seek(queue: str, idx: int, annotator: str = DEFAULT_ANNOTATOR) -> int | None:
+    """idx if it is in the queue, else the next member, else the first; None if empty."""
+    positions = members(queue, annotator)
+    i = bisect_left(positions, idx)
+    if i < len(positions):
+        return positions[i]
+    return positions[0] if positions else None
+
+
+def rank(queue: str, idx: int, annotator: str = DEFAULT_ANNOTATOR) -> int | None:
+    """Zero-based rank of idx within the queue, or None if it isn't a member."""
+    positions = members(queue, annotator)
+    i = bisect_left(positions, idx)
+    return i if i < len(positions) and positions[i] == idx else None
+
+
+def neighbours(queue: str, idx: int, ahead: int, annotator: str = DEFAULT_ANNOTATOR) -> list[Path]:
+    """Paths of the next `ahead` queue members after idx, plus the one before it."""
+    positions = members(queue, annotator)
+    paths = image_catalog.paths()
+    i = bisect_right(positions, idx)
+    window = [paths[p] for p in positions[i:i + ahead] if p < len(paths)]
+    before = bisect_left(positions, idx)
+    if before > 0 and positions[before - 1] < len(paths):
+        window.append(paths[positions[before - 1]])
+    return window
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""Benchmark the review hot path on synthetic data.
+
+Builds a sandbox copy of the app (code only) in a temp directory, fills it
+with synthetic 959x661 ultrasound-like PNGs and YOLO label files, then times:
+
+    load_image             PNG decode
+    overlay_full           draw_boxes_on_image at full resolution
+    overlay_display        draw_boxes_on_image straight at canvas size
+    canvas_encode          resize + PNG encode + base64 (drawable_canvas payload)
+    detect_csp             one forward pass (skipped without best.pt)
+    count_csp_breakdown    cold (index rebuild) and warm, at 100/1k/10k annotations
+    load_all               columnar annotation table, cold (no snapshot) and from the snapshot
+    next_manual            full rerun after clicking Next in Manual mode
+    next_assisted          same in éo-Assisted (skipped without best.pt)
+
+Results are written to benchmarks/results/<timestamp>.json. With a baseline
+(benchmarks/baseline.json, or --baseline), medians are compared and the run
+exits with status 1 if any benchmark slowed down by more than --tolerance.
+
+    python benchmarks/run_benchmarks.py --quick
+    python benchmarks/run_benchmarks.py --save-baseline
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+APP_DIR = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+# Copied into the sandbox; everything else (images, annotations, models,
+# caches) is synthetic or absent there
+APP_CODE = ["app.py", "backend", "frontend", "assets", ".streamlit"]
+IMG_WIDTH, IMG_HEIGHT = 959, 661
+SEED = 0
+
+
+# ── Synthetic data ────────────────────────────────────────────────────
+
+def _synthetic_image(rng: np.random.Generator) -> Image.Image:
+    """Speckle inside an ultrasound-style fan on black, so PNGs compress realistically."""
+    yy, xx = np.mgrid[0:IMG_HEIGHT, 0:IMG_WIDTH]
+    cx, r = IMG_WIDTH / 2, np.hypot(xx - IMG_WIDTH / 2, yy)
+    angle = np.abs(np.arctan2(xx - cx, yy + 1e-9))
+    fan = (r < IMG_HEIGHT * 0.95) & (angle < 0.75)
+    speckle = rng.rayleigh(35, (IMG_HEIGHT, IMG_WIDTH)) * (1 - r / (IMG_HEIGHT * 1.4))
+    gray = np.where(fan, speckle, 0).clip(0, 255).astype(np.uint8)
+    return Image.fromarray(gray, "L").convert("RGB")
+
+
+def _synthetic_boxes(rng: np.random.Generator) -> list[dict]:
+    boxes = []
+    for class_id in (0, 1):
+        if rng.random() < 0.7:
+            w, h = rng.uniform(0.05, 0.2), rng.uniform(0.05, 0.2)
+            boxes.append({
+                "class_id": class_id,
+                "cx": rng.uniform(w / 2, 1 - w / 2), "cy": rng.uniform(h / 2, 1 - h / 2),
+                "w": w, "h": h, "confidence": rng.uniform(0.3, 0.99),
+            })
+    return boxes
+
+
+def _label_text(boxes: list[dict]) -> str:
+    return "".join(
+        f"{b['class_id']} {b['cx']:.6f} {b['cy']:.6f} {b['w']:.6f} {b['h']:.6f}\n" for b in boxes
+    )
+
+
+def make_sandbox(n_images: int) -> Path:
+    """Create a temp app root with copied code and synthetic images."""
+    root = Path(tempfile.mkdtemp(prefix="eo-bench-")) / "app"
+    root.mkdir()
+    for name in APP_CODE:
+        src = APP_DIR / name
+        if src.is_dir():
+            shutil.copytree(src, root / name, ignore=shutil.ignore_patterns("__pycache__"))
+        elif src.exists():
+            shutil.copy2(src, root / name)
+    if (APP_DIR / "models" / "best.pt").exists():
+        (root / "models").mkdir()
+        shutil.copy2(APP_DIR / "models" / "best.pt", root / "models" / "best.pt")
+
+    rng = np.random.default_rng(SEED)
+    (root / "images").mkdir()
+    for i in range(n_images):
+        _synthetic_image(rng).save(root / "images" / f"{i:05d}_BENCH.png")
+    return root
+
+
+def write_annotations(cold_start_dir: Path, n: int) -> None:
+    """Ensure cold_start_dir holds n synthetic label files (adds only missing ones)."""
+    rng = np.random.default_rng(SEED + n)
+    existing = len(list(cold_start_dir.glob("*.txt")))
+    for i in range(existing, n):
+        boxes = _synthetic_boxes(rng) if rng.random() < 0.8 else []
+        (cold_start_dir / f"{i:05d}_ANN.txt").write_text(_label_text(boxes))
+
+
+# ── Timing ────────────────────────────────────────────────────────────
+
+def summarize(samples: list[float]) -> dict:
+    """Median/p95/min/mean of millisecond samples."""
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_ms": round(samples[0], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def timeit(fn, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ── Benchmarks (run with the sandbox's backend on sys.path) ───────────
+
+def bench_components(root: Path, repeat: int) -> dict:
+    from backend.config import CANVAS_IMAGE_FORMAT
+    from backend.image_service import canvas_size, encode_image, load_image
+    from backend.inference_service import detect_csp, load_detector
+    from backend.overlay import draw_boxes_on_image
+
+    rng = np.random.default_rng(SEED)
+    path = sorted((root / "images").glob("*.png"))[0]
+    image = load_image(path)
+    boxes = _synthetic_boxes(rng) or [{"class_id": 0, "cx": 0.5, "cy": 0.5, "w": 0.1, "h": 0.1}]
+    display = canvas_size(*image.size)
+
+    def canvas_encode():
+        frame = image.resize(display)
+        base64.b64encode(encode_image(frame, CANVAS_IMAGE_FORMAT)).decode()
+
+    results = {
+        "load_image": timeit(lambda: load_image(path), repeat),
+        "overlay_full": timeit(lambda: draw_boxes_on_image(image, boxes, show_confidence=True), repeat),
+        "overlay_display": timeit(
+            lambda: draw_boxes_on_image(image, boxes, show_confidence=True, size=display), repeat),
+        "canvas_encode": timeit(canvas_encode, repeat),
+    }
+    model = load_detector()
+    if model is None:
+        print("  detect_csp: skipped (no models/best.pt)")
+    else:
+        results["detect_csp"] = timeit(lambda: detect_csp(model, image), max(3, repeat // 4))
+    return results
+
+
+def bench_counts(root: Path, sizes: list[int], repeat: int) -> dict:
+    from backend import annotation_index, annotation_table
+    from backend.annotation_service import count_csp_breakdown
+    from backend.config import ANNOTATION_TABLE_PATH
+
+    def load_all(cold: bool):
+        annotation_table._cached = None
+        if cold:
+            ANNOTATION_TABLE_PATH.unlink(missing_ok=True)
+        annotation_table.load_all()
+
+    results = {}
+    for n in sizes:
+        write_annotations(root / "cold_start_annotations", n)
+        results[f"count_csp_breakdown_cold_{n}"] = timeit(annotation_index.rebuild, 3, warmup=0)
+        results[f"count_csp_breakdown_warm_{n}"] = timeit(count_csp_breakdown, repeat)
+        results[f"load_all_cold_{n}"] = timeit(lambda: load_all(cold=True), 3, warmup=0)
+        results[f"load_all_snapshot_{n}"] = timeit(lambda: load_all(cold=False), repeat)
+    return results
+
+
+def _wait_for_model(timeout: float = 300) -> bool:
+    from backend.model_warmup import warmup_status
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = warmup_status()["status"]
+        if status == "ready":
+            return True
+        if status in ("unavailable", "failed"):
+            return False
+        time.sleep(0.2)
+    return False
+
+
+def bench_next(root: Path, mode: str, steps: int, think_time: float) -> dict | None:
+    """Time full script reruns after clicking Next, pausing `think_time` between steps."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(root / "app.py"), default_timeout=300)
+    at.run()
+    if mode != "Manual":
+        if not _wait_for_model():
+            return None
+        at.sidebar.radio[0].set_value(mode).run()
+    samples = []
+    for _ in range(steps):
+        time.sleep(think_time)
+        next_btn = next(b for b in at.button if b.label == "Next")
+        start = time.perf_counter()
+        next_btn.click().run()
+        samples.append((time.perf_counter() - start) * 1000)
+        if at.exception:
+            raise RuntimeError(f"{mode} rerun failed: {at.exception[0].value}")
+    return summarize(samples)
+
+
+# ── Reporting ─────────────────────────────────────────────────────────
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print a comparison table; return the names that regressed."""
+    regressions = []
+    print(f"\n{'benchmark':38} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, now in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:38} {'—':>10} {now['median_ms']:>9.2f}ms {'new':>8}")
+            continue
+        change = now["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:38} {base['median_ms']:>8.2f}ms {now['median_ms']:>8.2f}ms {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="fewer repeats, up to 1k annotations")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--sizes", default="100,1000,10000", help="annotation counts")
+    parser.add_argument("--steps", type=int, default=10, help="Next clicks per mode")
+    parser.add_argument("--think-time", type=float, default=0.5,
+                        help="seconds between Next clicks (lets prefetch run, as a user would)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed median slowdown vs baseline (default 15%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the baseline")
+    parser.add_argument("--keep-sandbox", action="store_true")
+    args = parser.parse_args()
+
+    repeat = 5 if args.quick else args.repeat
+    steps = 3 if args.quick else args.steps
+    sizes = [int(s) for s in args.sizes.split(",")]
+    if args.quick:
+        sizes = [n for n in sizes if n <= 1000]
+
+    print("Building sandbox...")
+    root = make_sandbox(n_images=max(steps + 2, 8))
+    sys.path.insert(0, str(root))
+    os.chdir(root)
+
+    results = {}
+    try:
+        print("Components...")
+        results.update(bench_components(root, repeat))
+        print("Annotation counts...")
+        results.update(bench_counts(root, sizes, repeat))
+        print("Manual Next...")
+        results["next_manual"] = bench_next(root, "Manual", steps, args.think_time)
+        print("éo-Assisted Next...")
+        assisted = bench_next(root, "éo-Assisted", steps, args.think_time)
+        if assisted is None:
+            print("  next_assisted: skipped (no model)")
+        else:
+            results["next_assisted"] = assisted
+    finally:
+        os.chdir(APP_DIR)
+        if args.keep_sandbox:
+            print(f"Sandbox kept at {root}")
+        else:
+            shutil.rmtree(root.parent, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out_path = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out_path.write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {out_path}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Saved baseline {args.baseline}")
+        return
+    if not args.baseline.exists():
+        for name, r in results.items():
+            print(f"{name:38} {r['median_ms']:>9.2f}ms (p95 {r['p95_ms']:.2f}ms)")
+        print("No baseline to compare against (use --save-baseline).")
+        return
+
+    regressions = compare(results, json.loads(args.baseline.read_text())["results"], args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Incremental dataset builder shared by the data/ preparation scripts.
+
+A build is described as a plan, {path relative to DATASET_DIR: output},
+where an output is either a label file (its text) or a symlink to a source
+image. Each named build keeps a manifest of output hashes in DATASET_DIR,
+so a rebuild only writes outputs whose content changed, deletes outputs
+that dropped out of the plan, and leaves everything else alone. A path is
+in at most one manifest: the build that last wrote it owns it.
+
+The train/val split is derived from a hash of each stem rather than a
+seeded shuffle: adding cases never moves existing ones between splits, so
+new data only touches its own files.
+"""
+
+import hashlib
+import json
+import os
+import zipfile
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from backend.config import ANNOTATION_CLASS_MAP, DATASET_DIR
+
+TRAIN_RATIO = 0.8
+WORKERS = 8
+
+
+def label(lines: list[str]) -> tuple[str, str]:
+    """A label-file output with the given YOLO lines (empty = negative example)."""
+    return ("label", "\n".join(lines) + "\n" if lines else "")
+
+
+def link(src: Path) -> tuple[str, str]:
+    """A symlink output pointing at a source image."""
+    return ("link", str(src.resolve()))
+
+
+def _rank(stem: str, salt: str = "split") -> int:
+    return int(hashlib.sha1(f"{salt}:{stem}".encode()).hexdigest()[:8], 16)
+
+
+def is_train(stem: str, ratio: float = TRAIN_RATIO) -> bool:
+    """Stable train/val assignment: depends only on the stem."""
+    return _rank(stem) < ratio * 0x100000000
+
+
+def stable_sample(stems, k: int) -> list[str]:
+    """Pick k stems by hash rank, so the choice survives new candidates appearing."""
+    # Salted differently from the split, so the sample isn't all-train
+    return sorted(stems, key=lambda stem: _rank(stem, "sample"))[:k]
+
+
+def split_paths(stem: str, image_name: str) -> tuple[str, str]:
+    """Relative (image, label) output paths for a stem in its split."""
+    split = "train" if is_train(stem) else "val"
+    return f"images/{split}/{image_name}", f"labels/{split}/{stem}.txt"
+
+
+def remap_labels(text: str, class_map: dict[int, int]) -> list[str]:
+    """Keep lines whose source class is in class_map, renumbered; drop the rest."""
+    lines = []
+    for line in text.strip().splitlines():
+        parts = line.split()
+        if len(parts) != 5:
+            continue
+        dst = class_map.get(int(parts[0]))
+        if dst is not None:
+            lines.append(f"{dst} {' '.join(parts[1:])}")
+    return lines
+
+
+def iter_zip_labels(zip_path: Path, prefix: str) -> Iterator[tuple[str, str]]:
+    """Yield (stem, text) for each .txt member under prefix, one member at a time."""
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for info in zf.infolist():
+            name = info.filename
+            if info.is_dir() or not name.startswith(prefix) or not name.endswith(".txt"):
+                continue
+            yield Path(name).stem, zf.read(info).decode("utf-8")
+
+
+def _digest(output: tuple[str, str]) -> str:
+    kind, value = output
+    return hashlib.sha1(f"{kind}\0{value}".encode()).hexdigest()
+
+
+def _manifest_path(out_dir: Path, name: str) -> Path:
+    return out_dir / f".build-{name}.json"
+
+
+def _load_manifest(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _save_manifest(path: Path, hashes: dict[str, str]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(hashes, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def _write(path: Path, output: tuple[str, str]) -> None:
+    kind, value = output
+    if kind == "link":
+        if os.path.lexists(path):
+            path.unlink()
+        os.symlink(value, path)
+    else:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(value)
+        os.replace(tmp, path)
+
+
+def _claimed_by_others(out_dir: Path, name: str) -> set[str]:
+    """Outputs owned by the other builds sharing out_dir."""
+    claimed = set()
+    for other in out_dir.glob(".build-*.json"):
+        if other != _manifest_path(out_dir, name):
+            claimed.update(_load_manifest(other) or {})
+    return claimed
+
+
+def _take_over(out_dir: Path, name: str, paths: set[str]) -> None:
+    """Drop paths this build just wrote from the other builds' manifests.
+
+    Their manifests would otherwise still say the file holds their output:
+    they would skip rewriting it, and this build could never delete it.
+    """
+    for other in out_dir.glob(".build-*.json"):
+        if other == _manifest_path(out_dir, name):
+            continue
+        manifest = _load_manifest(other) or {}
+        if not paths.isdisjoint(manifest):
+            _save_manifest(other, {rel: d for rel, d in manifest.items() if rel not in paths})
+
+
+def _unclaimed(out_dir: Path, plan: dict, others: set[str]) -> list[str]:
+    """Files in the plan's directories that no build manifest owns.
+
+    Used on a build's first run to clear outputs left by older,
+    manifest-less versions of the scripts.
+    """
+    claimed = set(plan) | others
+    found = []
+    for rel_dir in {str(Path(rel).parent) for rel in plan}:
+        directory = out_dir / rel_dir
+        if directory.is_dir():
+            found.extend(
+                f"{rel_dir}/{entry.name}" for entry in os.scandir(directory)
+                if f"{rel_dir}/{entry.name}" not in claimed
+            )
+    return found
+
+
+def build(name: str, plan: dict[str, tuple[str, str]], out_dir: Path = DATASET_DIR,
+          workers: int = WORKERS, prune_unmanaged: bool = True) -> dict:
+    """Bring out_dir in line with plan, touching only what changed.
+
+    Several builds can share out_dir (e.g. "base" and "cold_start"). A path
+    another build owns is always rewritten and taken over, so a build that
+    drops it later deletes it, and the previous owner's next run writes
+    its own output back. An output dropped from this plan is not deleted
+    while another build's manifest claims the same path. With
+    prune_unmanaged, the first run also deletes files in the plan's
+    directories that no manifest owns.
+
+    Returns counts: {"written", "unchanged", "removed"}.
+    """
+    manifest_path = _manifest_path(out_dir, name)
+    old = _load_manifest(manifest_path)
+    others = _claimed_by_others(out_dir, name)
+    hashes = {rel: _digest(output) for rel, output in plan.items()}
+
+    stale = [rel for rel in (old or {}) if rel not in plan and rel not in others]
+    if old is None and prune_unmanaged:
+        stale += _unclaimed(out_dir, plan, others)
+    todo = [
+        rel for rel, digest in hashes.items()
+        if (old or {}).get(rel) != digest or rel in others or not os.path.lexists(out_dir / rel)
+    ]
+
+    for directory in {(out_dir / rel).parent for rel in todo}:
+        directory.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda rel: (out_dir / rel).unlink(missing_ok=True), stale))
+        list(pool.map(lambda rel: _write(out_dir / rel, plan[rel]), todo))
+
+    _take_over(out_dir, name, others.intersection(todo))
+    _save_manifest(manifest_path, hashes)
+    return {"written": len(todo), "unchanged": len(plan) - len(todo), "removed": len(stale)}
+
+
+def write_dataset_yaml(names: dict[int, str] = ANNOTATION_CLASS_MAP,
+                       out_dir: Path = DATASET_DIR) -> Path:
+    """Write dataset.yaml for out_dir (only if its content changed)."""
+    yaml_path = out_dir / "dataset.yaml"
+    names_block = "\n".join(f"  {cls_id}: {name}" for cls_id, name in sorted(names.items()))
+    yaml_content = f"""path: {out_dir.resolve()}
+train: images/train
+val: images/val
+
+names:
+{names_block}
+"""
+    if not yaml_path.exists() or yaml_path.read_text() != yaml_content:
+        yaml_path.write_text(yaml_content)
+    return yaml_path
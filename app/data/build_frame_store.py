@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Decode the review corpus into the memory-mapped frame store.
+
+Creating the store turns it on: from then on the app's load_image() reads
+decoded frames from CACHE_DIR instead of inflating PNGs, and adds any image
+it has not seen yet. The pass is incremental. Only images that are missing
+from the store, or whose file changed since they were stored, are decoded.
+Use --rebuild to reclaim the space of images that were removed or replaced.
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Allow importing from app root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from PIL import Image
+
+from backend import frame_store
+from backend.config import CACHE_DIR, SOURCE_IMAGES_DIR
+
+WORKERS = 8
+
+
+def _decode(path: Path) -> np.ndarray | None:
+    try:
+        return np.asarray(Image.open(path).convert("RGB"))
+    except Exception as exc:
+        print(f"  skipped {path.name}: {exc}")
+        return None
+
+
+def build_frame_store(workers: int = WORKERS, rebuild: bool = False) -> dict:
+    """Bring the store up to date with SOURCE_IMAGES_DIR; returns counts."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if rebuild:
+        frame_store.destroy()
+    frame_store.create()
+    paths = sorted(SOURCE_IMAGES_DIR.glob("*.png"))
+    todo = [p for p in paths if frame_store.get_pixels(p) is None]
+    stored = skipped = 0
+    # PIL releases the GIL while inflating; writes are serialized by the store
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, pixels in zip(todo, pool.map(_decode, todo)):
+            if pixels is not None and frame_store.put(path, pixels):
+                stored += 1
+            else:
+                skipped += 1
+    return {"stored": stored, "unchanged": len(paths) - len(todo), "skipped": skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="delete the store first (reclaims space of removed or replaced images)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = build_frame_store(args.workers, args.rebuild)
+    size = frame_store.stats()
+    print(f"Frame store: stored {stats['stored']}, unchanged {stats['unchanged']}, "
+          f"skipped {stats['skipped']} ({time.perf_counter() - start:.1f}s)")
+    print(f"  {size['frames']} frames, {size['bytes'] / 1e6:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Pre-render the display and thumbnail renditions of the review corpus.
+
+The app renders a missing rendition on first view, so this is optional.
+Running it up front means even the first visit to an image skips the
+full-resolution decode and resize. The pass is incremental: images whose
+renditions match the current source file are skipped. Renditions of
+removed or replaced images are pruned.
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Allow importing from app root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.config import SOURCE_IMAGES_DIR
+from backend.renditions import ensure_renditions, prune
+
+WORKERS = 8
+
+
+def _render(path: Path) -> bool | None:
+    """True if anything was rendered, False if up to date, None if unreadable."""
+    try:
+        return bool(ensure_renditions(path))
+    except ValueError as exc:
+        print(f"  skipped {path.name}: {exc}")
+        return None
+
+
+def build_renditions(workers: int = WORKERS) -> dict:
+    """Bring RENDITIONS_DIR up to date with SOURCE_IMAGES_DIR; returns counts."""
+    paths = sorted(SOURCE_IMAGES_DIR.glob("*.png"))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_render, paths))
+    return {
+        "rendered": results.count(True),
+        "unchanged": results.count(False),
+        "skipped": results.count(None),
+        "removed": prune(paths),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = build_renditions(args.workers)
+    print(f"Renditions: rendered {stats['rendered']}, unchanged {stats['unchanged']}, "
+          f"skipped {stats['skipped']}, removed {stats['removed']} "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
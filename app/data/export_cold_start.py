@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Export cold-start annotations from the app into the training dataset.
+
+Every stem reviewed in the app (CSP and Thalamus) becomes an image link
+plus label file in DATASET_DIR. When several annotators reviewed a stem,
+the most recent save is exported (see backend/annotation_index.py). A
+stem's train/val split comes from a hash of the stem, so it never changes.
+The export is incremental: only stems whose annotation changed since the
+last export are rewritten, and stems that were reset are removed. Reviewed
+labels take precedence over the source labels written by
+prepare_dataset.py / prepare_tt_dataset.py, which skip those stems.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Allow importing from app root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from backend import annotation_index, annotation_table
+from backend.config import ANNOTATION_CLASS_MAP, SOURCE_IMAGES_DIR
+from data.build_engine import build, label, link, split_paths, write_dataset_yaml
+
+
+def export_cold_start() -> dict:
+    """Sync DATASET_DIR with the effective annotations; returns build_engine.build() counts."""
+    stems, rows = annotation_table.load_all()
+    # Cold-start labels already use the app's class ids; drop anything else
+    rows = rows[np.isin(rows["class_id"], list(ANNOTATION_CLASS_MAP))]
+    grouped = dict(annotation_table.by_stem((stems, rows)))
+    plan = {}
+    for stem in annotation_index.effective():
+        img_path = SOURCE_IMAGES_DIR / f"{stem}.png"
+        if not img_path.exists():
+            continue
+        img_rel, lbl_rel = split_paths(stem, img_path.name)
+        plan[img_rel] = link(img_path)
+        boxes = grouped.get(stem)
+        plan[lbl_rel] = label(annotation_table.to_yolo_lines(boxes) if boxes is not None else [])
+    stats = build("cold_start", plan, prune_unmanaged=False)
+    write_dataset_yaml()
+    return stats
+
+
+def main():
+    start = time.perf_counter()
+    stats = export_cold_start()
+    print(f"Cold-start annotations: wrote {stats['written']}, unchanged {stats['unchanged']}, "
+          f"removed {stats['removed']} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+
+import streamlit as st
+
+from backend import tracing
+
+
+def admin_enabled() -> bool:
+    """The admin panel is hidden unless the app is opened with ?admin=1."""
+    return st.query_params.get("admin") == "1"
+
+
+@contextmanager
+def profile_if_requested():
+    """cProfile the enclosed block if "Profile next rerun" was clicked."""
+    if not st.session_state.pop("_profile_next_rerun", False):
+        yield
+        return
+    profiler = tracing.start_profile()
+    try:
+        yield
+    finally:
+        # Also runs when the script stops early for st.rerun()
+        st.session_state["_profile_report"] = tracing.stop_profile(profiler)
+
+
+def _toggle_tracing():
+    tracing.set_enabled(st.session_state["_admin_tracing"])
+
+
+def render_admin_panel():
+    """Sidebar latency panel: span p50/p95, exports, one-rerun profiling."""
+    with st.sidebar.expander("Latency", expanded=True):
+        st.toggle(
+            "Record spans", value=tracing.enabled(),
+            key="_admin_tracing", on_change=_toggle_tracing,
+        )
+        rows = tracing.stats()
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No spans recorded yet." if tracing.enabled() else "Tracing is off.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "JSONL", tracing.export_jsonl(), file_name="eo-spans.jsonl",
+                mime="application/x-ndjson", use_container_width=True,
+            )
+        with col2:
+            st.download_button(
+                "Prometheus", tracing.export_prometheus(), file_name="eo-spans.prom",
+                mime="text/plain", use_container_width=True,
+            )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Reset", key="_admin_reset_spans", use_container_width=True):
+                tracing.reset()
+                st.rerun()
+        with col2:
+            if st.button("Profile next rerun", key="_admin_profile", use_container_width=True):
+                st.session_state["_profile_next_rerun"] = True
+                st.session_state.pop("_profile_report", None)
+
+        if st.session_state.get("_profile_next_rerun"):
+            st.caption("Your next action will be profiled.")
+        report = st.session_state.get("_profile_report")
+        if report:
+            st.caption("Last profiled rerun (cumulative time)")
+            st.code(report, language=None)
@@ -1,11 +1,16 @@
 """Shared UI helpers used by both mode_a and mode_b."""
 
 import html
+import re
 
 import streamlit as st
 
-from backend.config import CLASS_COLORS
-from backend.annotation_service import count_cold_start_submissions
+from backend import work_queue
+from backend.config import CLASS_COLORS, DEFAULT_ANNOTATOR
+from backend.annotation_service import (
+    annotation_version, count_cold_start_submissions, is_annotated, load_annotation,
+)
+from backend.image_catalog import first_unannotated
 
 # ── Inline class-label HTML (color dot + name) ─────────────────────
 _R0, _G0, _B0 = CLASS_COLORS[0]
@@ -23,18 +28,72 @@ TH_TAG = (
 
 
 def render_save_flash():
-    """Pop and render the _just_saved flash message if present."""
+    """Pop and render the _just_saved flash message (or a rejected save) if present."""
     _flash = st.session_state.pop("_just_saved", None)
     if _flash:
         st.markdown(
             f'<div class="nyp-save-flash">{html.escape(_flash)}</div>',
             unsafe_allow_html=True,
         )
+    _conflict = st.session_state.pop("_save_conflict", None)
+    if _conflict:
+        st.warning(_conflict)
+
+
+def clean_annotator(name):
+    """Normalize an annotator name to a safe namespace key ("" → the default)."""
+    name = re.sub(r"[^a-z0-9_.-]+", "-", (name or "").strip().lower()).strip(".-")[:40]
+    return name or DEFAULT_ANNOTATOR
+
+
+def current_annotator():
+    """Annotator for this session: the sidebar field, else the ?annotator= query param."""
+    return clean_annotator(
+        st.session_state.get("annotator") or st.query_params.get("annotator", "")
+    )
+
+
+def review_state(stem):
+    """Return (saved, boxes) of the current annotator's annotation for stem.
+
+    The annotation's version is remembered the first time the stem is
+    shown, so a save from this view is rejected if someone else saved the
+    annotation in the meantime (see app.py).
+    """
+    annotator = current_annotator()
+    seen = st.session_state.get("_seen_version")
+    if seen is None or seen[:2] != (annotator, stem):
+        st.session_state["_seen_version"] = (annotator, stem, annotation_version(stem, annotator))
+    saved = is_annotated(stem, annotator)
+    return saved, load_annotation(stem, annotator) if saved else []
+
+
+def active_queue():
+    """Key of the work queue selected in the sidebar (backend.work_queue.QUEUES)."""
+    return st.session_state.get("queue_filter", "all")
+
+
+def initial_index():
+    """Index to open on a mode's first visit: the first unreviewed image, or
+    the start of the active queue when a narrower queue is selected."""
+    queue = active_queue()
+    if queue in ("all", "unreviewed"):
+        return first_unannotated() or 0
+    return work_queue.seek(queue, 0, current_annotator()) or 0
+
+
+def advance(index_key, idx):
+    """Move index_key to the next image in the active queue (stays put at the end)."""
+    nxt = work_queue.next_in(active_queue(), idx, current_annotator())
+    if nxt is not None:
+        st.session_state[index_key] = nxt
 
 
 def render_nav_bar(idx, total, safe_stem, saved, index_key, btn_prefix=""):
     """Render Previous / Image N of M / Next navigation row.
 
+    Previous and Next step through the active work queue.
+
     Args:
         idx: Current zero-based index.
         total: Total number of images.
@@ -43,27 +102,41 @@ def render_nav_bar(idx, total, safe_stem, saved, index_key, btn_prefix=""):
         index_key: session_state key to update on navigation.
         btn_prefix: Optional prefix for button keys to avoid collisions.
     """
+    queue = active_queue()
+    annotator = current_annotator()
+    prev_idx = work_queue.prev_in(queue, idx, annotator)
+    next_idx = work_queue.next_in(queue, idx, annotator)
     saved_badge = ' <span class="nyp-saved-badge">Saved</span>' if saved else ""
+    queue_pos = ""
+    if queue != "all":
+        rank = work_queue.rank(queue, idx, annotator)
+        label = html.escape(work_queue.QUEUES[queue])
+        queue_pos = (
+            f' <span class="nyp-queue-pos">'
+            f'{label}: {"–" if rank is None else rank + 1} of '
+            f'{len(work_queue.members(queue, annotator))}'
+            f'</span>'
+        )
     col_prev, col_info, col_next = st.columns([1, 4, 1])
     with col_prev:
-        if st.button("Previous", disabled=idx == 0,
+        if st.button("Previous", disabled=prev_idx is None,
                       key=f"{btn_prefix}prev" if btn_prefix else None,
                       use_container_width=True):
-            st.session_state[index_key] = idx - 1
+            st.session_state[index_key] = prev_idx
             st.rerun()
     with col_info:
         st.markdown(
             f'<div class="nyp-nav-info">'
             f'<span class="nyp-viewer-badge">{safe_stem}</span> '
-            f'{idx + 1} of {total}{saved_badge}'
+            f'{idx + 1} of {total}{saved_badge}{queue_pos}'
             f'</div>',
             unsafe_allow_html=True,
         )
     with col_next:
-        if st.button("Next", disabled=idx >= total - 1,
+        if st.button("Next", disabled=next_idx is None,
                       key=f"{btn_prefix}next" if btn_prefix else None,
                       use_container_width=True):
-            st.session_state[index_key] = idx + 1
+            st.session_state[index_key] = next_idx
             st.rerun()
 
 
@@ -71,6 +144,6 @@ def get_submission_count():
     """Return the current submission count, using sidebar cache when available."""
     cached = st.session_state.get("_counts_cache")
     ver = st.session_state.get("_counts_version", 0)
-    if cached is not None and cached[0] == ver:
+    if cached is not None and cached[0][0] == ver:
         return cached[1]
     return count_cold_start_submissions()
@@ -1,10 +1,10 @@
 import os
-import base64
-from io import BytesIO
 
-import streamlit as st
 import streamlit.components.v1 as components
 
+from backend.canvas_media import build_payload
+from backend.payload_cache import payload_key, pixel_digest
+
 _FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
 
 _component_func = components.declare_component(
@@ -25,6 +25,7 @@ def drawable_canvas(
     box_labels: list[str] | None = None,
     header_label: str = "",
     header_badge: str = "",
+    payload: dict | None = None,
     key=None,
 ):
     """Render an image with a drawable rectangle overlay.
@@ -41,28 +42,23 @@ def drawable_canvas(
         box_labels: Per-box label text (by drawing order). Falls back to box number.
         header_label: Optional label for header bar (e.g. "Image Viewer").
         header_badge: Optional badge text for header bar (e.g. image filename).
+        payload: Pre-built background args for ``image`` from
+            backend.canvas_media (e.g. a prefetched frame's). Skips hashing
+            and encoding on the request path when given.
         key: Streamlit component key.
 
     Returns:
         List of drawn rectangles, each dict with: left, top, width, height, type.
     """
-    cache_key = f"_b64_{key}"
-    cached = st.session_state.get(cache_key) if key else None
-    if cached is not None:
-        image_b64 = cached
-    else:
-        buf = BytesIO()
-        image.save(buf, format="PNG")
-        image_b64 = base64.b64encode(buf.getvalue()).decode()
-        if key:
-            # Evict all other _b64_ entries to prevent memory leak
-            for k in list(st.session_state):
-                if k.startswith("_b64_") and k != cache_key:
-                    del st.session_state[k]
-            st.session_state[cache_key] = image_b64
+    if payload is None:
+        # Shared across sessions and keyed by pixel content, so the same
+        # display image is encoded once per process.
+        payload = build_payload(payload_key(pixel_digest(image), image.size), lambda: image)
 
     result = _component_func(
-        image_b64=image_b64,
+        image_b64=payload.get("image_b64"),
+        image_url=payload.get("image_url"),
+        image_mime=payload["image_mime"],
         height=height,
         width=width,
         stroke_color=stroke_color,
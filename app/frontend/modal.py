@@ -1,5 +1,18 @@
 import streamlit as st
-from backend.config import TRAINING_THRESHOLD
+from backend.config import TRAINING_THRESHOLD, TRAINING_AUTO_FINETUNE
+
+
+def _milestone_desc() -> str:
+    """Dialog body — says whether training starts on its own."""
+    if TRAINING_AUTO_FINETUNE:
+        return (
+            'Your reviews are ready. éo is now training on them in the '
+            'background and will switch to the new model automatically.'
+        )
+    return (
+        'Your reviews are ready. The model can now be fine-tuned '
+        'on your Thalamus data for AI-assisted detection.'
+    )
 
 
 @st.dialog("Milestone Reached")
@@ -17,8 +30,7 @@ def show_threshold_dialog():
         '</div>'
         f'<div class="nyp-milestone-title">{TRAINING_THRESHOLD} Cases Reviewed</div>'
         '<div class="nyp-milestone-desc">'
-        'Your reviews are ready. The model can now be fine-tuned '
-        'on your Thalamus data for AI-assisted detection.'
+        f'{_milestone_desc()}'
         '</div>'
         '</div>',
         unsafe_allow_html=True,
@@ -1,20 +1,28 @@
 import html
+from functools import partial
 
 import streamlit as st
 
-from backend.config import ANNOTATION_CLASS_NAMES, CLASS_COLORS
-from backend.image_service import list_image_paths, load_image, get_image_stem
+from backend import work_queue
+from backend.config import ANNOTATION_CLASS_NAMES, CLASS_COLORS, PREFETCH_AHEAD
+from backend.image_service import list_image_paths, get_image_stem
 from backend.drawing import canvas_rect_to_yolo
-from backend.annotation_service import is_annotated, load_annotation, save_cold_start
-from backend.overlay import draw_boxes_on_image
+from backend.annotation_service import load_annotation
+from backend.prefetch import get_frame, prefetch
 from frontend.modal import show_threshold_dialog
 from frontend.drawable_canvas import drawable_canvas
 from frontend.components import (
     CSP_TAG as _CSP_TAG, TH_TAG as _TH_TAG,
-    render_save_flash, render_nav_bar,
+    render_save_flash, render_nav_bar, active_queue, advance, initial_index,
+    current_annotator, review_state,
 )
 
 
+def _saved_boxes(annotator, image_path):
+    """Overlay boxes for a prefetched Manual frame: the annotator's saved annotation."""
+    return load_annotation(get_image_stem(image_path), annotator)
+
+
 def render_mode_a():
     """Render the Cold Start annotation interface."""
     if st.session_state.pop("_show_threshold", False):
@@ -34,37 +42,29 @@ def render_mode_a():
         return
 
     if "current_index" not in st.session_state:
-        first_new = next(
-            (i for i, p in enumerate(all_images) if not is_annotated(get_image_stem(p))),
-            0,
-        )
-        st.session_state["current_index"] = first_new
+        st.session_state["current_index"] = initial_index()
 
     idx = st.session_state["current_index"]
     idx = max(0, min(idx, total - 1))
 
     image_path = all_images[idx]
     stem = get_image_stem(image_path)
-    saved = is_annotated(stem)
+    saved, existing_boxes = review_state(stem)
     safe_stem = html.escape(stem)
     render_nav_bar(idx, total, safe_stem, saved, "current_index")
 
-    # ── Load image ───────────────────────────────────────────────────
+    # ── Load image (prefetched frame when available) ─────────────────
     try:
-        image = load_image(image_path)
+        frame = get_frame(image_path, existing_boxes)
     except ValueError as exc:
         st.error(str(exc))
         return
-    if saved:
-        existing_boxes = load_annotation(stem)
-        if existing_boxes:
-            image = draw_boxes_on_image(image, existing_boxes)
+    canvas_width, canvas_height = frame["width"], frame["height"]
 
-    img_w, img_h = image.size
-    canvas_width = min(img_w, 680)
-    scale = canvas_width / img_w
-    canvas_height = int(img_h * scale)
-    display_image = image.resize((canvas_width, canvas_height))
+    # Prepare the next images while the user draws on this one
+    annotator = current_annotator()
+    prefetch(work_queue.neighbours(active_queue(), idx, PREFETCH_AHEAD, annotator),
+             partial(_saved_boxes, annotator))
 
     # ── Rec #2: Hint placeholder ABOVE canvas ────────────────────────
     hint_slot = st.empty()
@@ -84,7 +84,8 @@ def render_mode_a():
 
     # ── Canvas ───────────────────────────────────────────────────────
     rects = drawable_canvas(
-        image=display_image,
+        image=frame["display"],
+        payload=frame["payload"],
         height=canvas_height,
         width=canvas_width,
         stroke_color="#32ADE6",
@@ -98,13 +99,11 @@ def render_mode_a():
 
     # ── Helper: skip (empty annotation) ──────────────────────────────
     def _do_skip():
-        save_cold_start(stem, [])
         st.session_state["_pending_save"] = {
             "stem": stem, "boxes": [], "toast": f"Skipped {safe_stem}",
             "check_threshold": not st.session_state.get("threshold_dismissed"),
         }
-        if idx < total - 1:
-            st.session_state["current_index"] = idx + 1
+        advance("current_index", idx)
         st.rerun()
 
     # ── Rec #2: Fill hint based on state ─────────────────────────────
@@ -202,8 +201,7 @@ def render_mode_a():
                 "toast": f"Saved {safe_stem}",
                 "check_threshold": not st.session_state.get("threshold_dismissed"),
             }
-            if idx < total - 1:
-                st.session_state["current_index"] = idx + 1
+            advance("current_index", idx)
             st.rerun()
 
     with col_skip:
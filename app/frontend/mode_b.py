@@ -1,36 +1,81 @@
 import html
+from functools import partial
 
 import streamlit as st
 
+from backend import work_queue
 from backend.config import (
     CLASS_COLORS, THALAMUS_COLOR, ANNOTATION_CLASS_NAMES, TRAINING_THRESHOLD,
+    TRAINING_AUTO_FINETUNE, TRAINING_LOG_PATH, PREFETCH_AHEAD,
 )
-from backend.image_service import list_image_paths, load_image, get_image_stem
-from backend.overlay import draw_boxes_on_image
+from backend.image_service import list_image_paths, get_image_stem
 from backend.drawing import canvas_rect_to_yolo
-from backend.annotation_service import is_annotated, load_annotation, save_cold_start
-from backend.inference_service import load_model_raw, detect_csp
+from backend.annotation_service import load_annotation
+from backend.model_warmup import get_model, warmup_status
+from backend.inference_cache import (
+    get_cached, detect_landmarks_cached, start_background_batch, batch_status,
+)
+from backend.prefetch import get_image, get_frame, prefetch
+from backend.training_job import training_status
 from frontend.drawable_canvas import drawable_canvas
 from frontend.components import (
     CSP_TAG as _CSP_TAG, TH_TAG as _TH_TAG,
     render_save_flash, render_nav_bar, get_submission_count,
+    active_queue, advance, initial_index, current_annotator, review_state,
 )
 
 
-def _do_skip(stem, safe_stem, idx, total):
+def _do_skip(stem, safe_stem, idx):
     """Save empty annotation for stem, advance index, and rerun."""
     st.session_state["_pending_save"] = {
         "stem": stem, "boxes": [], "toast": f"Skipped {safe_stem}",
     }
-    if idx < total - 1:
-        st.session_state["copilot_index"] = idx + 1
+    advance("copilot_index", idx)
     st.rerun()
 
 
-@st.cache_resource
-def load_model():
-    """Load the fine-tuned YOLO model (cached by Streamlit)."""
-    return load_model_raw()
+@st.fragment(run_every=0.5)
+def _wait_for_model():
+    """Show the warm-up state and rerun the page once the model is loaded."""
+    if warmup_status()["status"] == "loading":
+        st.markdown(_model_loading_html(), unsafe_allow_html=True)
+    else:
+        st.rerun()
+
+
+@st.fragment(run_every=5)
+def _wait_for_training(reviewed: int):
+    """Show the no-model state and rerun the page once trained weights appear."""
+    if warmup_status()["status"] != "unavailable":
+        st.rerun()
+    st.markdown(_no_model_html(reviewed, TRAINING_THRESHOLD, training_status()), unsafe_allow_html=True)
+
+
+def _thalamus_box(proposals, existing):
+    """Thalamus that Confirm saves unless one is drawn: the saved one, else éo's best proposal."""
+    saved = [b for b in existing if b["class_id"] == 1]
+    if saved:
+        return saved[0]
+    proposed = [b for b in proposals if b["class_id"] == 1]
+    return max(proposed, key=lambda b: b["confidence"]) if proposed else None
+
+
+def _overlay_boxes(proposals, existing):
+    """Boxes drawn under the canvas: CSP proposals + the Thalamus to accept.
+
+    Without a CSP proposal: the saved annotation, else the Thalamus to accept.
+    """
+    csp_boxes = [b for b in proposals if b["class_id"] == 0]
+    thalamus = _thalamus_box(proposals, existing)
+    if csp_boxes:
+        return csp_boxes + ([thalamus] if thalamus else [])
+    return existing or ([thalamus] if thalamus else [])
+
+
+def _prefetch_boxes(model, annotator, image_path):
+    """Run (cached) inference for a prefetched frame and return its overlay boxes."""
+    proposals = detect_landmarks_cached(model, image_path)
+    return _overlay_boxes(proposals, load_annotation(get_image_stem(image_path), annotator))
 
 
 def _ai_thinking_html() -> str:
@@ -45,9 +90,33 @@ def _ai_thinking_html() -> str:
     )
 
 
-def _ai_prompt_html(csp_conf: float) -> str:
-    """AI prompt asking user to draw Thalamus."""
+def _model_loading_html() -> str:
+    """Model warm-up indicator (same orb as the thinking state)."""
+    return (
+        '<div class="nyp-ai-thinking">'
+        '<div class="nyp-ai-orb-container">'
+        '<div class="nyp-ai-orb"></div>'
+        '</div>'
+        '<span class="nyp-ai-thinking-text">Starting éo\u2026</span>'
+        '</div>'
+    )
+
+
+def _ai_prompt_html(csp_conf: float, thalamus: dict | None = None) -> str:
+    """AI prompt asking user to draw the Thalamus, or to accept the one shown."""
     conf_label = f"{csp_conf:.0%}" if csp_conf else ""
+    if thalamus is None:
+        ask = '— confirm the detection, then draw a box around the Thalamus.'
+    elif "confidence" in thalamus:
+        ask = (
+            f'and marked the Thalamus ({thalamus["confidence"]:.0%}) — confirm both, '
+            'or draw a box around the Thalamus to adjust it.'
+        )
+    else:
+        ask = (
+            '— confirm the detection and your saved Thalamus, '
+            'or draw a box around the Thalamus to replace it.'
+        )
     return (
         '<div class="nyp-ai-prompt">'
         '<div class="prompt-icon">'
@@ -58,15 +127,28 @@ def _ai_prompt_html(csp_conf: float) -> str:
         '</svg>'
         '</div>'
         '<div class="prompt-text">'
-        f'<strong>éo suggests a {conf_label} likelihood of CSP</strong> — '
-        'confirm the detection, then draw a box around the Thalamus.'
+        f'<strong>éo suggests a {conf_label} likelihood of CSP</strong> {ask}'
         '</div>'
         '</div>'
     )
 
 
-def _no_detect_html() -> str:
-    """No-detection empty state with SVG icon."""
+def _no_detect_html(thalamus: dict | None = None) -> str:
+    """No-detection empty state with SVG icon; offers the Thalamus shown, if any."""
+    if thalamus is None:
+        desc = (
+            'Mark the <strong>CSP</strong> and <strong>Thalamus</strong> below '
+            'to help éo learn, or skip to confirm no CSP and move to next image.'
+        )
+    else:
+        marked = (
+            f'éo marked the <strong>Thalamus</strong> ({thalamus["confidence"]:.0%})'
+            if "confidence" in thalamus else 'Your saved <strong>Thalamus</strong> is shown'
+        )
+        desc = (
+            f'{marked}. Mark the <strong>CSP</strong> below and confirm both, '
+            'or skip to confirm no CSP and move to next image.'
+        )
     return (
         '<div class="nyp-no-detect">'
         '<div class="no-detect-icon">'
@@ -78,15 +160,12 @@ def _no_detect_html() -> str:
         '</svg>'
         '</div>'
         '<div class="no-detect-title">éo did not detect CSP in this image</div>'
-        '<div class="no-detect-desc">'
-        'Mark the <strong>CSP</strong> and <strong>Thalamus</strong> below '
-        'to help éo learn, or skip to confirm no CSP and move to next image.'
-        '</div>'
+        f'<div class="no-detect-desc">{desc}</div>'
         '</div>'
     )
 
 
-def _no_model_html(reviewed: int, threshold: int) -> str:
+def _no_model_html(reviewed: int, threshold: int, training: dict) -> str:
     """No-model state — connects back to Manual mode progress."""
     remaining = max(0, threshold - reviewed)
     if remaining > 0:
@@ -95,6 +174,18 @@ def _no_model_html(reviewed: int, threshold: int) -> str:
             f'Finish <strong>{remaining} more</strong> in Manual mode, '
             f'then the model can be trained for AI-assisted detection.'
         )
+    elif TRAINING_AUTO_FINETUNE and training["status"] in ("running", "interrupted"):
+        desc = (
+            f'All {threshold} reviews complete! '
+            f'éo is training on them in the background. '
+            f'This page will update as soon as the model is ready.'
+        )
+    elif TRAINING_AUTO_FINETUNE and training["status"] == "failed":
+        desc = (
+            f'All {threshold} reviews complete, but training failed: '
+            f'{html.escape(training.get("error") or "unknown error")}. '
+            f'Details are in {html.escape(TRAINING_LOG_PATH.name)}.'
+        )
     else:
         desc = (
             f'All {threshold} reviews complete! '
@@ -126,10 +217,16 @@ def render_mode_b():
     render_save_flash()
 
     # ── Model check (Rec #1: improved no-model state) ────────────────
-    model = load_model()
+    model = get_model()
     if model is None:
-        reviewed = get_submission_count()
-        st.markdown(_no_model_html(reviewed, TRAINING_THRESHOLD), unsafe_allow_html=True)
+        warmup = warmup_status()
+        if warmup["status"] == "loading":
+            _wait_for_model()
+            return
+        if warmup["status"] == "failed":
+            st.error(f"éo could not start: {warmup['error']}")
+            return
+        _wait_for_training(get_submission_count())
         return
 
     # ── Image navigation ─────────────────────────────────────────────
@@ -141,72 +238,70 @@ def render_mode_b():
         return
 
     if "copilot_index" not in st.session_state:
-        first_new = next(
-            (i for i, p in enumerate(all_images) if not is_annotated(get_image_stem(p))),
-            0,
-        )
-        st.session_state["copilot_index"] = first_new
+        st.session_state["copilot_index"] = initial_index()
 
     idx = st.session_state["copilot_index"]
     idx = max(0, min(idx, total - 1))
 
     image_path = all_images[idx]
     stem = get_image_stem(image_path)
-    saved = is_annotated(stem)
+    saved, existing = review_state(stem)
     safe_stem = html.escape(stem)
     render_nav_bar(idx, total, safe_stem, saved, "copilot_index", btn_prefix="b_")
 
-    # ── Load image and run inference ─────────────────────────────────
-    try:
-        image = load_image(image_path)
-    except ValueError as exc:
-        st.error(str(exc))
-        return
-
-    # ── Cache inference per image (avoid re-running on every rerun) ──
-    csp_cache_key = f"_csp_cache_{stem}"
-    cached_csp = st.session_state.get(csp_cache_key)
-    if cached_csp is not None:
-        csp_boxes = cached_csp
-    else:
+    # ── Pre-compute detections for the whole folder in the background ──
+    start_background_batch(model, all_images[idx:] + all_images[:idx])
+    job = batch_status()
+    if job["running"] and job["total"]:
+        st.caption(f"éo is pre-analyzing images — {job['done']} of {job['total']}")
+    if TRAINING_AUTO_FINETUNE and training_status()["status"] == "running":
+        st.caption("éo is fine-tuning on the latest reviews — the new model loads automatically when ready.")
+
+    # ── Persistent inference cache (shared across sessions/restarts) ──
+    # (the full-resolution image is only decoded on a miss)
+    proposals = get_cached(image_path)
+    if proposals is None:
         ai_slot = st.empty()
         ai_slot.markdown(_ai_thinking_html(), unsafe_allow_html=True)
-        csp_boxes = detect_csp(model, image)
+        try:
+            proposals = detect_landmarks_cached(model, image_path, get_image(image_path))
+        except ValueError as exc:
+            ai_slot.empty()
+            st.error(str(exc))
+            return
         ai_slot.empty()
-        # Evict previous stem's cache entry
-        for k in list(st.session_state):
-            if k.startswith("_csp_cache_") and k != csp_cache_key:
-                del st.session_state[k]
-        st.session_state[csp_cache_key] = csp_boxes
 
+    csp_boxes = [b for b in proposals if b["class_id"] == 0]
     csp_detected = len(csp_boxes) > 0
 
-    # ── Draw CSP overlay + saved Thalamus ────────────────────────────
-    overlay = draw_boxes_on_image(image, csp_boxes, show_confidence=True)
-    if saved:
-        existing = load_annotation(stem)
-        thalamus_saved = [b for b in existing if b["class_id"] == 1]
-        if thalamus_saved:
-            overlay = draw_boxes_on_image(overlay, thalamus_saved)
+    # ── CSP + Thalamus overlay (prefetched frame when available) ──────
+    try:
+        frame = get_frame(image_path, _overlay_boxes(proposals, existing))
+    except ValueError as exc:
+        st.error(str(exc))
+        return
+    canvas_width, canvas_height = frame["width"], frame["height"]
 
-    canvas_width = min(image.size[0], 680)
-    scale = canvas_width / image.size[0]
-    canvas_height = int(image.size[1] * scale)
+    # Prepare (and run inference on) the next images while the user draws
+    annotator = current_annotator()
+    prefetch(work_queue.neighbours(active_queue(), idx, PREFETCH_AHEAD, annotator),
+             partial(_prefetch_boxes, model, annotator))
 
     # ═════════════════════════════════════════════════════════════════
-    # FLOW A: CSP detected — user draws Thalamus only
+    # FLOW A: CSP detected — user accepts or draws the Thalamus
     # ═════════════════════════════════════════════════════════════════
     if csp_detected:
         best_conf = max(b["confidence"] for b in csp_boxes)
-        st.markdown(_ai_prompt_html(best_conf), unsafe_allow_html=True)
+        thalamus = _thalamus_box(proposals, existing)
+        st.markdown(_ai_prompt_html(best_conf, thalamus), unsafe_allow_html=True)
 
         # Rec #2: Hint ABOVE canvas
         hint_slot = st.empty()
 
-        display_overlay = overlay.resize((canvas_width, canvas_height))
         tr, tg, tb = THALAMUS_COLOR
         thalamus_rects = drawable_canvas(
-            image=display_overlay,
+            image=frame["display"],
+            payload=frame["payload"],
             height=canvas_height,
             width=canvas_width,
             stroke_color=f"rgb({tr}, {tg}, {tb})",
@@ -221,7 +316,7 @@ def render_mode_b():
             hint_slot.markdown(
                 '<div class="nyp-step-hint">'
                 '<span class="step-num">2</span>'
-                'Thalamus marked — confirm to save.'
+                f'Thalamus {"adjusted" if thalamus else "marked"} — confirm to save.'
                 '</div>',
                 unsafe_allow_html=True,
             )
@@ -235,7 +330,8 @@ def render_mode_b():
         col_accept, col_skip = st.columns(2)
 
         with col_accept:
-            valid_thalamus = len(thalamus_rects) == 1
+            # No box drawn means accepting the Thalamus shown, if there is one
+            valid_thalamus = len(thalamus_rects) == 1 or (not thalamus_rects and thalamus is not None)
             if st.button("Confirm & Save", type="primary", disabled=not valid_thalamus,
                          use_container_width=True, key="b_confirm_detected"):
                 all_boxes = []
@@ -245,42 +341,36 @@ def render_mode_b():
                         "cx": box["cx"], "cy": box["cy"],
                         "w": box["w"], "h": box["h"],
                     })
-                yolo = canvas_rect_to_yolo(thalamus_rects[0], canvas_width, canvas_height)
+                if thalamus_rects:
+                    yolo = canvas_rect_to_yolo(thalamus_rects[0], canvas_width, canvas_height)
+                else:
+                    yolo = {k: thalamus[k] for k in ("cx", "cy", "w", "h")}
                 all_boxes.append({"class_id": 1, **yolo})
 
                 st.session_state["_pending_save"] = {
                     "stem": stem, "boxes": all_boxes, "toast": f"Saved {safe_stem}",
                 }
-                if idx < total - 1:
-                    st.session_state["copilot_index"] = idx + 1
+                advance("copilot_index", idx)
                 st.rerun()
 
         with col_skip:
             if st.button("Skip", use_container_width=True, key="b_skip_detected"):
                 csp_only = [{"class_id": 0, "cx": b["cx"], "cy": b["cy"],
                              "w": b["w"], "h": b["h"]} for b in csp_boxes]
-                save_cold_start(stem, csp_only)
                 st.session_state["_pending_save"] = {
                     "stem": stem, "boxes": csp_only,
                     "toast": f"Skipped {safe_stem}",
                 }
-                if idx < total - 1:
-                    st.session_state["copilot_index"] = idx + 1
+                advance("copilot_index", idx)
                 st.rerun()
 
     # ═════════════════════════════════════════════════════════════════
-    # FLOW B: No CSP detected — user draws both landmarks
+    # FLOW B: No CSP detected — user draws both landmarks, or just the
+    # CSP when a Thalamus is shown to accept
     # ═════════════════════════════════════════════════════════════════
     else:
-        st.markdown(_no_detect_html(), unsafe_allow_html=True)
-
-        preview = image
-        if saved:
-            existing = load_annotation(stem)
-            if existing:
-                preview = draw_boxes_on_image(image, existing)
-
-        display_img = preview.resize((canvas_width, canvas_height))
+        thalamus = _thalamus_box(proposals, existing)
+        st.markdown(_no_detect_html(thalamus), unsafe_allow_html=True)
 
         # Rec #2: Hint ABOVE canvas
         hint_slot = st.empty()
@@ -299,7 +389,8 @@ def render_mode_b():
             fill_colors.append(f"rgba({r},{g},{b},0.08)")
 
         manual_rects = drawable_canvas(
-            image=display_img,
+            image=frame["display"],
+            payload=frame["payload"],
             height=canvas_height,
             width=canvas_width,
             stroke_color="#32ADE6",
@@ -312,7 +403,16 @@ def render_mode_b():
         )
 
         # Fill hint (state 0 covered by no-detect card above)
-        if len(manual_rects) == 1:
+        if len(manual_rects) == 1 and thalamus is not None:
+            hint_slot.markdown(
+                '<div class="nyp-step-hint">'
+                '<span class="step-num">2</span>'
+                'CSP marked — confirm to save it with the Thalamus shown, '
+                'or draw the Thalamus to adjust it.'
+                '</div>',
+                unsafe_allow_html=True,
+            )
+        elif len(manual_rects) == 1:
             hint_slot.markdown(
                 '<div class="nyp-step-hint">'
                 '<span class="step-num">1</span>'
@@ -377,13 +477,32 @@ def render_mode_b():
                     st.session_state["_pending_save"] = {
                         "stem": stem, "boxes": boxes, "toast": f"Saved {safe_stem}",
                     }
-                    if idx < total - 1:
-                        st.session_state["copilot_index"] = idx + 1
+                    advance("copilot_index", idx)
                     st.rerun()
 
             with col_skip:
                 if st.button("Skip", use_container_width=True, key="b_skip_no_csp"):
-                    _do_skip(stem, safe_stem, idx, total)
+                    _do_skip(stem, safe_stem, idx)
+        elif len(manual_rects) == 1 and thalamus is not None:
+            col_submit, col_skip = st.columns(2)
+
+            with col_submit:
+                if st.button("Confirm & Save", type="primary",
+                             use_container_width=True, key="b_submit_csp"):
+                    csp = canvas_rect_to_yolo(manual_rects[0], canvas_width, canvas_height)
+                    boxes = [
+                        {"class_id": 0, **csp},
+                        {"class_id": 1, **{k: thalamus[k] for k in ("cx", "cy", "w", "h")}},
+                    ]
+                    st.session_state["_pending_save"] = {
+                        "stem": stem, "boxes": boxes, "toast": f"Saved {safe_stem}",
+                    }
+                    advance("copilot_index", idx)
+                    st.rerun()
+
+            with col_skip:
+                if st.button("Skip — No CSP", use_container_width=True, key="b_skip_no_csp"):
+                    _do_skip(stem, safe_stem, idx)
         else:
             if st.button("Skip — No CSP", key="b_skip_no_csp_empty", use_container_width=True):
-                _do_skip(stem, safe_stem, idx, total)
+                _do_skip(stem, safe_stem, idx)
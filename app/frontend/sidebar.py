@@ -1,18 +1,47 @@
 import streamlit as st
-from backend.config import ANNOTATION_CLASS_MAP, CLASS_COLORS, THALAMUS_COLOR, TRAINING_THRESHOLD, COLD_START_DIR
-from backend.annotation_service import count_cold_start_submissions, count_csp_breakdown
-
-
-def _get_counts():
-    """Return (count, csp_found, no_csp) cached per rerun via a version counter."""
-    ver = st.session_state.get("_counts_version", 0)
+from backend import work_leases, work_queue
+from backend.config import ANNOTATION_CLASS_MAP, CLASS_COLORS, THALAMUS_COLOR, TRAINING_THRESHOLD
+from backend.annotation_service import (
+    count_cold_start_submissions, count_csp_breakdown, reset_cold_start,
+)
+from backend.tracing import span
+from frontend.components import clean_annotator, current_annotator
+
+
+def _get_counts(annotator):
+    """Return (count, csp_found, no_csp, yours) cached per rerun via a version counter."""
+    ver = (st.session_state.get("_counts_version", 0), annotator)
     cached = st.session_state.get("_counts_cache")
     if cached is not None and cached[0] == ver:
-        return cached[1], cached[2], cached[3]
-    count = count_cold_start_submissions()
-    csp_found, no_csp = count_csp_breakdown()
-    st.session_state["_counts_cache"] = (ver, count, csp_found, no_csp)
-    return count, csp_found, no_csp
+        return cached[1:]
+    with span("annotations.counts"):
+        count = count_cold_start_submissions()
+        csp_found, no_csp = count_csp_breakdown()
+        yours = count_cold_start_submissions(annotator)
+    st.session_state["_counts_cache"] = (ver, count, csp_found, no_csp, yours)
+    return count, csp_found, no_csp, yours
+
+
+def _seek_queue():
+    """On a queue change, move each mode to the nearest image in the new queue."""
+    queue = st.session_state["queue_filter"]
+    annotator = current_annotator()
+    if queue == "my_batch" and not work_leases.mine(annotator):
+        work_leases.claim(annotator)
+    for index_key in ("current_index", "copilot_index"):
+        if index_key in st.session_state:
+            idx = work_queue.seek(queue, st.session_state[index_key], annotator)
+            if idx is not None:
+                st.session_state[index_key] = idx
+
+
+def _set_annotator():
+    """Normalize the annotator field and keep it in the URL so a reload keeps it."""
+    annotator = clean_annotator(st.session_state["annotator"])
+    st.session_state["annotator"] = annotator
+    st.query_params["annotator"] = annotator
+    st.session_state.pop("_seen_version", None)
+    _seek_queue()
 
 
 def render_sidebar():
@@ -71,6 +100,29 @@ def render_sidebar():
                 unsafe_allow_html=True,
             )
 
+        # Annotator — saves go to their own namespace
+        if "annotator" not in st.session_state:
+            st.session_state["annotator"] = current_annotator()
+        st.text_input("Annotator", key="annotator", on_change=_set_annotator)
+        annotator = current_annotator()
+
+        # Work queue — Previous/Next step through the selected subset
+        # (labels stay fixed: a label change would reset the widget's selection)
+        queue = st.selectbox(
+            "Queue",
+            list(work_queue.QUEUES),
+            format_func=work_queue.QUEUES.get,
+            key="queue_filter",
+            on_change=_seek_queue,
+        )
+        sizes = work_queue.sizes(annotator)
+        st.caption(f"{sizes[queue]} of {sizes['all']} images")
+        if queue == "my_batch":
+            if st.button("Claim next batch", key="claim_batch", use_container_width=True):
+                work_leases.claim(annotator)
+                _seek_queue()
+                st.rerun()
+
         st.markdown('<div class="nyp-sidebar-divider"></div>', unsafe_allow_html=True)
 
         # Class legend — pill-style items
@@ -89,7 +141,7 @@ def render_sidebar():
         st.markdown('<div class="nyp-sidebar-divider"></div>', unsafe_allow_html=True)
 
         # Submission counter — threshold-aware card
-        count, csp_found, no_csp = _get_counts()
+        count, csp_found, no_csp, yours = _get_counts(annotator)
         pct = min(count / TRAINING_THRESHOLD, 1.0)
 
         # Card state: near-threshold glow or reached celebration
@@ -123,15 +175,15 @@ def render_sidebar():
         )
 
         st.progress(pct)
+        st.caption(f"{yours} reviewed by you ({annotator})")
 
         if count >= TRAINING_THRESHOLD:
             st.success("Threshold reached — model ready to train")
 
-        # Reset button
-        if count > 0:
+        # Reset button — clears only this annotator's namespace
+        if yours > 0:
             if st.button("Reset Progress", key="reset_progress", use_container_width=True):
-                for f in COLD_START_DIR.glob("*.txt"):
-                    f.unlink()
+                reset_cold_start(annotator)
                 st.session_state["_counts_version"] = st.session_state.get("_counts_version", 0) + 1
                 st.session_state.pop("current_index", None)
                 st.session_state.pop("copilot_index", None)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Export best.pt for CPU inference and check parity with the PyTorch model.
+
+Writes best.onnx (dynamic batch) and, with --int8, best-int8.onnx. With
+--check N, runs both the PyTorch model and the chosen ONNX backend on the
+first N app images and compares their CSP detections box by box. Exits with
+status 1 if any image differs beyond the tolerances, so it can gate a
+switch of INFERENCE_BACKEND in config.py.
+
+    python models/export_model.py --int8 --check 50 --backend onnx-int8
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.config import BEST_MODEL_PATH, ONNX_IMGSZ, SOURCE_IMAGES_DIR
+from backend.image_service import load_image
+from backend.inference_service import (
+    detect_csp_batch, export_onnx, load_model_raw, quantize_onnx_int8,
+)
+from backend.onnx_backend import OnnxDetector
+
+IOU_TOLERANCE = 0.90
+CONF_TOLERANCE = 0.05
+
+
+def _iou(a: dict, b: dict) -> float:
+    ax1, ay1, ax2, ay2 = a["cx"] - a["w"] / 2, a["cy"] - a["h"] / 2, a["cx"] + a["w"] / 2, a["cy"] + a["h"] / 2
+    bx1, by1, bx2, by2 = b["cx"] - b["w"] / 2, b["cy"] - b["h"] / 2, b["cx"] + b["w"] / 2, b["cy"] + b["h"] / 2
+    iw = max(0.0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0.0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    union = a["w"] * a["h"] + b["w"] * b["h"] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _compare(ref: list[dict], cand: list[dict]) -> str | None:
+    """Return a description of the first mismatch, or None if within tolerance."""
+    if len(ref) != len(cand):
+        return f"{len(ref)} vs {len(cand)} boxes"
+    remaining = list(cand)
+    for box in sorted(ref, key=lambda b: -b["confidence"]):
+        best = max(remaining, key=lambda c: _iou(box, c))
+        iou = _iou(box, best)
+        dconf = abs(box["confidence"] - best["confidence"])
+        if iou < IOU_TOLERANCE or dconf > CONF_TOLERANCE:
+            return f"IoU {iou:.3f}, Δconf {dconf:.3f}"
+        remaining.remove(best)
+    return None
+
+
+def _timed(model, images: list) -> tuple[list[list[dict]], float]:
+    detect_csp_batch(model, images[:1])  # warm-up
+    start = time.perf_counter()
+    results = [detect_csp_batch(model, [im])[0] for im in images]
+    return results, (time.perf_counter() - start) / max(len(images), 1)
+
+
+def check_parity(backend: str, n: int) -> bool:
+    paths = sorted(SOURCE_IMAGES_DIR.glob("*.png"))[:n]
+    images = [load_image(p) for p in paths]
+    reference = load_model_raw("torch")
+    candidate = load_model_raw(backend)
+    if reference is None or candidate is None:
+        print("ERROR: could not load both models")
+        return False
+    if not isinstance(candidate, OnnxDetector):
+        # load_model_raw() fell back to PyTorch: that would compare torch with torch
+        print(f"ERROR: the {backend} backend could not be loaded")
+        return False
+    print(f"{backend} is running on {candidate.session.get_providers()[0]}")
+
+    ref_results, ref_latency = _timed(reference, images)
+    cand_results, cand_latency = _timed(candidate, images)
+
+    failures = 0
+    for path, ref, cand in zip(paths, ref_results, cand_results):
+        problem = _compare(ref, cand)
+        if problem:
+            failures += 1
+            print(f"  MISMATCH {path.stem}: {problem}")
+
+    print(f"torch:   {ref_latency * 1000:.1f} ms/image")
+    print(f"{backend}: {cand_latency * 1000:.1f} ms/image "
+          f"({ref_latency / max(cand_latency, 1e-9):.1f}x)")
+    print(f"Parity: {len(paths) - failures}/{len(paths)} images within "
+          f"IoU ≥ {IOU_TOLERANCE}, Δconf ≤ {CONF_TOLERANCE}")
+    return failures == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--imgsz", type=int, default=ONNX_IMGSZ)
+    parser.add_argument("--int8", action="store_true", help="also write best-int8.onnx")
+    parser.add_argument("--check", type=int, default=0, metavar="N",
+                        help="compare against PyTorch on the first N images")
+    parser.add_argument("--backend", default="onnx",
+                        choices=["onnx", "onnx-int8", "openvino"],
+                        help="backend to check (default: onnx)")
+    args = parser.parse_args()
+
+    if not BEST_MODEL_PATH.exists():
+        print(f"ERROR: {BEST_MODEL_PATH} not found. Train a model first.")
+        sys.exit(1)
+
+    print(f"Exported {export_onnx(args.imgsz)}")
+    if args.int8 or args.backend == "onnx-int8":
+        print(f"Quantized {quantize_onnx_int8()}")
+
+    if args.check and not check_parity(args.backend, args.check):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Pre-label the image folder with CSP and Thalamus proposals from the current model.
+
+Streams through the images in batches, writes one YOLO label file per image
+to PROPOSALS_DIR (same format as the cold-start labels; an empty file means
+"nothing found") and stores every detection, with confidence, in the
+inference cache so éo-Assisted mode shows it without running the model.
+
+Safe to interrupt: each proposal is written atomically, and a rerun skips
+images that already have one (use --overwrite after retraining).
+
+    python models/prelabel.py --batch-size 16 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.config import (
+    BEST_MODEL_PATH, INFERENCE_BATCH_SIZE, PROPOSALS_DIR, SOURCE_IMAGES_DIR,
+)
+from backend.annotation_service import write_yolo_labels
+from backend.image_service import get_image_stem, load_image
+from backend.inference_cache import model_fingerprint, put
+from backend.inference_service import detect_landmarks_batch, load_model_raw
+
+_model = None
+_model_key = None
+
+
+def _init_worker():
+    """Load one model per worker process, and the cache key for what it loaded."""
+    global _model, _model_key
+    _model = load_model_raw()
+    # After loading: the key names the backend actually used (torch after a fallback)
+    _model_key = model_fingerprint()
+
+
+def _write_proposal(out_dir: Path, stem: str, boxes: list[dict]) -> None:
+    """Write a proposal file via temp + rename so a crash never leaves half a file."""
+    out_path = out_dir / f"{stem}.txt"
+    tmp_path = out_dir / f".{stem}.{os.getpid()}.tmp"
+    write_yolo_labels(tmp_path, boxes)
+    os.replace(tmp_path, out_path)
+
+
+def _process_batch(args: tuple[list[Path], Path]) -> tuple[int, int, int]:
+    """Run one batched forward pass. Returns (labelled, with_csp, failed)."""
+    paths, out_dir = args
+    if _model is None:
+        raise RuntimeError(f"could not load model from {BEST_MODEL_PATH}")
+    images, ok_paths = [], []
+    failed = 0
+    for p in paths:
+        try:
+            images.append(load_image(p))
+            ok_paths.append(p)
+        except ValueError as exc:
+            print(f"  skip: {exc}")
+            failed += 1
+
+    with_csp = 0
+    for p, boxes in zip(ok_paths, detect_landmarks_batch(_model, images)):
+        put(p, boxes, _model_key)
+        _write_proposal(out_dir, get_image_stem(p), boxes)
+        with_csp += any(b["class_id"] == 0 for b in boxes)
+    return len(ok_paths), with_csp, failed
+
+
+def _batches(paths: list[Path], size: int):
+    for i in range(0, len(paths), size):
+        yield paths[i:i + size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--images", type=Path, default=SOURCE_IMAGES_DIR,
+                        help="folder of PNG images (default: app images)")
+    parser.add_argument("--out", type=Path, default=PROPOSALS_DIR,
+                        help="where proposal .txt files are written")
+    parser.add_argument("--batch-size", type=int, default=INFERENCE_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes, each with its own model")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="re-label images that already have a proposal")
+    args = parser.parse_args()
+
+    if not BEST_MODEL_PATH.exists():
+        print(f"ERROR: model not found at {BEST_MODEL_PATH}. Train a model first.")
+        sys.exit(1)
+    if not args.images.is_dir():
+        print(f"ERROR: image directory not found: {args.images}")
+        sys.exit(1)
+    args.out.mkdir(parents=True, exist_ok=True)
+
+    all_images = sorted(args.images.glob("*.png"))
+    if args.overwrite:
+        todo = all_images
+    else:
+        done = {p.stem for p in args.out.glob("*.txt")}
+        todo = [p for p in all_images if p.stem not in done]
+    print(f"Found {len(all_images)} images, {len(todo)} to label "
+          f"({len(all_images) - len(todo)} already done)")
+    if not todo:
+        return
+
+    jobs = ((batch, args.out) for batch in _batches(todo, args.batch_size))
+    labelled = with_csp = failed = 0
+    start = time.perf_counter()
+
+    if args.workers > 1:
+        pool = Pool(args.workers, initializer=_init_worker)
+        results = pool.imap_unordered(_process_batch, jobs)
+    else:
+        pool = None
+        _init_worker()
+        if _model is None:
+            print(f"ERROR: could not load model from {BEST_MODEL_PATH}")
+            sys.exit(1)
+        results = map(_process_batch, jobs)
+
+    try:
+        for n, n_csp, n_failed in results:
+            labelled += n
+            with_csp += n_csp
+            failed += n_failed
+            rate = labelled / max(time.perf_counter() - start, 1e-9)
+            print(f"  {labelled + failed}/{len(todo)}  ({rate:.1f} img/s)", flush=True)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print(f"Labelled {labelled} images: {with_csp} with CSP, "
+          f"{labelled - with_csp} without, {failed} unreadable")
+    print(f"Proposals written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()